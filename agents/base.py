@@ -2,8 +2,14 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
 import logging
-from typing import Any
+import time
+from typing import Any, Iterator
+
+from core import deadline
+from core.metrics import STAGE_SECONDS
+from core.tracing import tracer
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +23,28 @@ class BaseAgent(ABC):
         self.name = name
         self.logger = logger.getChild(name)
 
+    @contextmanager
+    def stage(self, stage: str) -> Iterator[None]:
+        """
+        Time a pipeline stage into the search_stage_seconds histogram and
+        record it as a span of the current trace:
+
+            with self.stage("route"):
+                plan = await self._route(...)
+
+        Entering a stage is also a cancellation point: it raises
+        DeadlineExceeded if the request's budget is already spent.
+        """
+        deadline.check(f"{self.name}.{stage}")
+        t0 = time.perf_counter()
+        try:
+            with tracer.span(f"{self.name}.{stage}", agent=self.name, budget_s=deadline.remaining()):
+                yield
+        finally:
+            elapsed = time.perf_counter() - t0
+            STAGE_SECONDS.observe(elapsed, agent=self.name, stage=stage)
+            self.logger.debug("stage %s took %.1fms", stage, elapsed * 1000)
+
     @abstractmethod
     async def run(self, **kwargs: Any) -> Any:  # pragma: no cover - interface only
         raise NotImplementedError
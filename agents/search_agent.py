@@ -1,7 +1,9 @@
 # agents/search_agent.py
 from __future__ import annotations
 
-from typing import Any, Dict
+import asyncio
+import json
+from typing import Any, Coroutine, Dict, Optional, Tuple
 
 from langchain_core.language_models import BaseChatModel
 from langchain_core.output_parsers import PydanticOutputParser
@@ -10,6 +12,13 @@ from langchain_core.prompts import ChatPromptTemplate
 from agents.base import BaseAgent
 from agents.users_agent import UsersAgent
 from agents.orders_agent import OrdersAgent
+import config
+from core.deadline import DeadlineExceeded, within_deadline
+from core.llm import GatewayRejected
+from core.metrics import ROUTES
+from core.personalization import AffinityStore
+from core.product_search import ProductSearchEngine
+from core.shared_cache import SharedCache, hash_key
 from core.planning import (
     GenericSearchIntent,
     OrdersIntent,
@@ -34,11 +43,20 @@ class SearchAgent(BaseAgent):
         llm: BaseChatModel,
         users_agent: UsersAgent,
         orders_agent: OrdersAgent,
+        plan_cache: Optional[SharedCache] = None,
+        product_search: Optional[ProductSearchEngine] = None,
+        affinity_store: Optional[AffinityStore] = None,
     ) -> None:
         super().__init__(name="search_agent")
         self.llm = llm
         self.users_agent = users_agent
         self.orders_agent = orders_agent
+        # Optional cross-worker SearchPlan cache keyed by (query, user_context).
+        self.plan_cache = plan_cache
+        # In-process catalog index for generic searches (no network call).
+        self.product_search = product_search
+        # Per-user affinity vectors for re-ranking generic results.
+        self.affinity_store = affinity_store
 
         self._router_parser = PydanticOutputParser(pydantic_object=SearchPlan)
 
@@ -52,7 +70,7 @@ class SearchAgent(BaseAgent):
                         "specialist agent should handle it: generic product search, user behavior "
                         "(event logs), or orders (purchases/usual items).\n\n"
                         "You MUST return JSON that matches this Pydantic schema:\n"
-                        f"{self._router_parser.get_format_instructions()}\n\n"
+                        "{format_instructions}\n\n"
                         "Routing guidance:\n"
                         "- If the query refers to 'I', 'my', 'last X minutes/hours/days', or behavior "
                         "  such as 'I viewed', 'I searched', 'things I looked at', choose route='user_behavior'.\n"
@@ -61,7 +79,7 @@ class SearchAgent(BaseAgent):
                         "When route='user_behavior':\n"
                         "- action should be one of 'view', 'search', 'add_to_cart', 'purchase', or 'unknown'.\n"
                         "- product_category should be a concise category like 'jeans', 'noodles', etc.\n"
-                        "- attributes can include filters like {'color': 'black', 'size': '32'}.\n"
+                        "- attributes can include filters like {{'color': 'black', 'size': '32'}}.\n"
                         "- time_window should be shorthand like '10m', '1h', '24h', '7d'.\n\n"
                         "Example:\n"
                         "Query: 'show me all the black jeans I searched for in the last 10 mins'\n"
@@ -69,7 +87,7 @@ class SearchAgent(BaseAgent):
                         "  route='user_behavior'\n"
                         "  user_behavior.action='search'\n"
                         "  user_behavior.product_category='jeans'\n"
-                        "  user_behavior.attributes={'color': 'black'}\n"
+                        "  user_behavior.attributes={{'color': 'black'}}\n"
                         "  user_behavior.time_window='10m'\n"
                     ),
                 ),
@@ -82,86 +100,162 @@ class SearchAgent(BaseAgent):
                     ),
                 ),
             ]
-        )
+        ).partial(format_instructions=self._router_parser.get_format_instructions())
 
         # Router chain: prompt -> LLM -> Pydantic parser
         self._router_chain = self._router_prompt | self.llm | self._router_parser
 
-    async def run(self, query: str, user_context: Dict[str, Any]) -> Dict[str, Any]:
+    async def run(
+        self, query: str, user_context: Dict[str, Any], *, degraded: bool = False
+    ) -> Dict[str, Any]:
         """
         Entry point used by FastAPI.
 
+        ``degraded=True`` (set by admission control under overload) skips
+        LLM routing: a cached SearchPlan is used if there is one, otherwise
+        the query goes to generic search.
+
+        Every stage runs within the request deadline (core.deadline). If
+        routing can't finish in time the query goes to generic search; if a
+        handler can't, it is cancelled and its items come back empty. Either
+        way the result has "partial": True.
+
         Returns a dict like:
         {
           "source": "user_events" | "orders" | "generic_search",
           "plan": <SearchPlan as dict>,
           "items": [...],
-          "ai_rewritten_query": <optional normalized query>
+          "ai_rewritten_query": <optional normalized query>,
+          "partial": <True if a stage was cut short by the deadline>
         }
         """
-        plan = await self._route(query=query, user_context=user_context)
+        partial = False
+        try:
+            with self.stage("route"):
+                plan = await self._route(query=query, user_context=user_context, degraded=degraded)
+        except (DeadlineExceeded, GatewayRejected) as exc:
+            # No budget left for LLM routing; the local index still answers.
+            self.logger.warning("Routing cut short (%s); using generic search", exc)
+            plan = self._generic_plan(query, rationale=f"deadline: {exc}")
+            partial = True
+        ROUTES.inc(route=plan.route)
         plan_dict = plan.dict()
         self.logger.debug("Search plan: %s", plan_dict)
 
         if plan.route == "user_behavior" and plan.user_behavior is not None:
-            events = await self._handle_user_behavior(plan.user_behavior, user_context)
+            events, cut = await self._within_budget(
+                "user_behavior", self._handle_user_behavior(plan.user_behavior, user_context)
+            )
             return {
                 "source": "user_events",
                 "plan": plan_dict,
                 "items": events,
                 "ai_rewritten_query": query,  # keep original for now
+                "partial": partial or cut,
             }
 
         if plan.route == "orders" and plan.orders is not None:
-            orders_result = await self._handle_orders(plan.orders, user_context)
+            orders_result, cut = await self._within_budget(
+                "orders", self._handle_orders(plan.orders, user_context)
+            )
             return {
                 "source": "orders",
                 "plan": plan_dict,
                 "items": orders_result,
                 "ai_rewritten_query": query,
+                "partial": partial or cut,
             }
 
         if plan.route == "generic_search" and plan.generic is not None:
-            generic_result = await self._handle_generic(plan.generic, user_context)
-            return {
-                "source": "generic_search",
-                "plan": plan_dict,
-                "items": generic_result,
-                "ai_rewritten_query": plan.generic.normalized_query,
-            }
+            generic = plan.generic
+        else:
+            # Fallback: shouldn't happen if LLM obeys the schema
+            self.logger.warning("Unexpected SearchPlan shape; defaulting to generic_search.")
+            generic = GenericSearchIntent(normalized_query=query)
 
-        # Fallback: shouldn't happen if LLM obeys the schema
-        self.logger.warning("Unexpected SearchPlan shape; defaulting to generic_search.")
-        fallback_generic = GenericSearchIntent(normalized_query=query)
-        generic_result = await self._handle_generic(fallback_generic, user_context)
+        generic_result, cut = await self._within_budget(
+            "generic_search", self._handle_generic(generic, user_context)
+        )
+        if not cut:
+            try:
+                with self.stage("rerank"):
+                    generic_result = self._rerank(generic_result, user_context)
+            except DeadlineExceeded as exc:
+                # Budget spent by the search itself: return its results unranked.
+                self.logger.warning("rerank skipped: %s", exc)
+                cut = True
         return {
             "source": "generic_search",
             "plan": plan_dict,
             "items": generic_result,
-            "ai_rewritten_query": fallback_generic.normalized_query,
+            "ai_rewritten_query": generic.normalized_query,
+            "partial": partial or cut,
         }
 
-    async def _route(self, query: str, user_context: Dict[str, Any]) -> SearchPlan:
-        return await self._router_chain.ainvoke(
-            {
-                "query": query,
-                "user_context": user_context,
-            }
+    async def _within_budget(self, stage: str, work: Coroutine[Any, Any, Any]) -> Tuple[Any, bool]:
+        """
+        Run a handler stage bounded by the remaining request budget. On expiry
+        the handler (and its downstream calls) is cancelled and ([], True)
+        returned.
+        """
+        try:
+            with self.stage(stage):
+                return await within_deadline(work, stage=stage), False
+        except DeadlineExceeded as exc:
+            work.close()  # no-op if it already ran
+            self.logger.warning("%s cut short: %s", stage, exc)
+            return [], True
+
+    @staticmethod
+    def _generic_plan(query: str, rationale: str) -> SearchPlan:
+        """SearchPlan that sends ``query`` straight to generic search (no LLM)."""
+        return SearchPlan(
+            route="generic_search",
+            generic=GenericSearchIntent(normalized_query=query),
+            rationale=rationale,
         )
 
+    async def _route(
+        self, query: str, user_context: Dict[str, Any], *, degraded: bool = False
+    ) -> SearchPlan:
+        key = None
+        if self.plan_cache is not None:
+            key = hash_key(" ".join(query.lower().split()), user_context)
+            raw = await asyncio.to_thread(self.plan_cache.get, key)
+            if raw is not None:
+                return SearchPlan(**json.loads(raw))
+
+        if degraded:
+            return self._generic_plan(query, rationale="degraded: LLM routing skipped under load")
+
+        plan = await within_deadline(
+            self._router_chain.ainvoke(
+                {
+                    "query": query,
+                    "user_context": user_context,
+                }
+            ),
+            stage="route",
+        )
+        if key is not None:
+            await asyncio.to_thread(self.plan_cache.set, key, json.dumps(plan.dict()))
+        return plan
+
     async def _handle_user_behavior(
         self,
         intent: UserBehaviorIntent,
         user_context: Dict[str, Any],
     ) -> Any:
-        structured_query = await self.users_agent.build_structured_query(
-            intent=intent,
-            user_context=user_context,
-        )
-        events = await self.users_agent.fetch_events(
-            structured_query=structured_query,
-            user_context=user_context,
-        )
+        with self.users_agent.stage("build_structured_query"):
+            structured_query = await self.users_agent.build_structured_query(
+                intent=intent,
+                user_context=user_context,
+            )
+        with self.users_agent.stage("fetch_events"):
+            events = await self.users_agent.fetch_events(
+                structured_query=structured_query,
+                user_context=user_context,
+            )
         return events
 
     async def _handle_orders(
@@ -169,7 +263,8 @@ class SearchAgent(BaseAgent):
         intent: OrdersIntent,
         user_context: Dict[str, Any],
     ) -> Any:
-        return await self.orders_agent.run(intent=intent, user_context=user_context)
+        with self.orders_agent.stage("run"):
+            return await self.orders_agent.run(intent=intent, user_context=user_context)
 
     async def _handle_generic(
         self,
@@ -177,11 +272,24 @@ class SearchAgent(BaseAgent):
         user_context: Dict[str, Any],
     ) -> Any:
         """
-        Generic product search path.
-
-        For now, this is a stub that returns an empty list.
-        Later, you'll add a ProductSearchTool that calls Next.js
-        (e.g. /api/internal/products/search) and return real products.
+        Generic product search path: BM25 + facet filters over the local
+        catalog index (core.product_search), a few milliseconds in-process.
+        Returns [] when no engine is configured.
         """
         self.logger.debug("Generic search for query=%s", intent.normalized_query)
-        return []
+        if self.product_search is None:
+            return []
+        return self.product_search.search_text(
+            intent.normalized_query, k=config.PRODUCT_SEARCH_TOP_K
+        )
+
+    def _rerank(self, items: Any, user_context: Dict[str, Any]) -> Any:
+        """
+        Personalize the order of product results: BM25 relevance blended with
+        the user's category/attribute affinity, item popularity and recency,
+        scored in one vectorized pass (~0.1 ms for 20 candidates).
+        """
+        if self.affinity_store is None or not isinstance(items, list):
+            return items
+        user_id = user_context.get("user_id") or user_context.get("id")
+        return self.affinity_store.rerank(items, user_id)
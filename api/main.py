@@ -1,33 +1,238 @@
 # model for the user_context need to create on later on for the personlaisation of the request done by the user.
-from typing import Optional, Dict
+import time
+
+_IMPORT_STARTED = time.perf_counter()
+
+import asyncio
+import contextlib
+import importlib
+import logging
+import threading
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import TYPE_CHECKING, Awaitable, Optional, Dict
 from typing import Any
 from datetime import datetime
-from fastapi import FastAPI, HTTPException
+
+import httpx
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
 
-from api.schemas import SearchRequest, SearchResponse
-from core.llm import get_default_chat_model
-from agents.search_agent import SearchAgent
-from agents.users_agent import UsersAgent
-from agents.orders_agent import OrdersAgent
+import config
+from api.schemas import SearchRequest, SearchResponse, SuggestResponse
+from core.admission import DEGRADED, AdmissionController, Overloaded
+from core.deadline import DeadlineExceeded, deadline_scope, request_budget
+from core.metrics import REGISTRY, SEARCH_REQUESTS, STAGE_SECONDS
+from core.tracing import tracer
+from core.typeahead import get_typeahead
 from tools.analytics_tool import AnalyticsServiceError
+from tools.http_client import close_http_client, open_http_client
 
+if TYPE_CHECKING:
+    from agents.search_agent import SearchAgent
 
-# 1. Create an instance of the FastAPI class (our main application object)
-app = FastAPI()
-
-# Instantiate core agents once per process (not per request).
-_llm = get_default_chat_model()
-_users_agent = UsersAgent()
-_orders_agent = OrdersAgent()
-_search_agent = SearchAgent(
-    llm=_llm,
-    users_agent=_users_agent,
-    orders_agent=_orders_agent,
+logger = logging.getLogger(__name__)
+
+# LangChain / Ollama and the agent tree are imported and built in the
+# lifespan (get_search_agent), not here, so importing this module stays cheap
+# for CLI tools, tests and worker processes.
+_IMPORT_SECONDS = time.perf_counter() - _IMPORT_STARTED
+
+
+@lru_cache()
+def get_search_agent() -> "SearchAgent":
+    """
+    Build the core agents once per process (not per request).
+    Called from the lifespan; lazily on first use otherwise.
+    """
+    from agents.orders_agent import OrdersAgent
+    from agents.search_agent import SearchAgent
+    from agents.users_agent import UsersAgent
+    from core.llm import get_chat_model
+    from core.personalization import get_affinity_store
+    from core.product_search import get_product_search
+    from core.shared_cache import SharedCache
+
+    plan_cache = None
+    if config.PLAN_CACHE_TTL_SECONDS > 0:
+        plan_cache = SharedCache("plan", ttl_seconds=config.PLAN_CACHE_TTL_SECONDS)
+
+    return SearchAgent(
+        llm=get_chat_model("router"),
+        users_agent=UsersAgent(),
+        orders_agent=OrdersAgent(),
+        plan_cache=plan_cache,
+        product_search=get_product_search(),
+        affinity_store=get_affinity_store(),
+    )
+
+# Per-worker admission control for /api/v1/search.
+admission = AdmissionController(
+    max_in_flight=config.ADMISSION_MAX_IN_FLIGHT,
+    max_queue=config.ADMISSION_MAX_QUEUE,
+    max_queue_delay=config.ADMISSION_MAX_QUEUE_DELAY_SECONDS,
+    degraded_max_in_flight=config.ADMISSION_DEGRADED_MAX_IN_FLIGHT,
 )
 
 
+class ClientDisconnected(Exception):
+    pass
+
+
+async def _cancel_on_disconnect(request: Request, coro: Awaitable[Any]) -> Any:
+    """
+    Await ``coro`` as a task, polling for client disconnect; on disconnect
+    the task (LLM gateway waits, downstream calls) is cancelled and
+    ClientDisconnected raised.
+    """
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=config.DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+
+# Startup state reported by /readyz.
+_readiness: Dict[str, Any] = {"ready": False}
+
+
+async def _warm_up(ollama: httpx.AsyncClient) -> Dict[str, Any]:
+    """
+    Preload every task model (with its keep_alive) and run one router call,
+    so the first real request doesn't pay model load or a cold prompt path.
+    Failures are logged; the service still becomes ready.
+    """
+    from core.llm import preload_models
+
+    timings: Dict[str, Any] = {}
+    t0 = time.perf_counter()
+    try:
+        timings["models"] = await preload_models(ollama)
+    except httpx.HTTPError:
+        logger.exception("Model preload failed")
+    timings["preload_seconds"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    try:
+        await get_search_agent()._route(query=config.WARMUP_QUERY, user_context={})
+    except Exception:
+        logger.exception("Warm-up router call failed")
+    timings["router_seconds"] = time.perf_counter() - t0
+    return timings
+
+
+def _start_feed(name: str, module: str, func: str, **kwargs: Any) -> Optional[threading.Event]:
+    """
+    Tail a Kafka feed in a daemon thread (no consumer group) so this
+    worker's in-memory index stays current between snapshots.
+    Returns the stop event.
+    """
+    try:
+        consume = getattr(importlib.import_module(module), func)
+    except ImportError:
+        logger.warning("kafka-python not installed; %s feed disabled", name)
+        return None
+
+    stop = threading.Event()
+
+    def run() -> None:
+        try:
+            consume(group_id=None, stop=stop, **kwargs)
+        except Exception:
+            logger.exception("%s feed consumer stopped", name)
+
+    threading.Thread(target=run, name=f"{name}-feed", daemon=True).start()
+    return stop
+
+
+async def _keep_models_loaded(ollama: httpx.AsyncClient) -> None:
+    """
+    Re-arm Ollama keep_alive periodically so quiet periods don't unload models.
+    """
+    from core.llm import preload_models
+
+    while True:
+        await asyncio.sleep(config.OLLAMA_KEEPALIVE_PING_SECONDS)
+        try:
+            await preload_models(ollama)
+        except httpx.HTTPError as exc:
+            logger.warning("Ollama keep-alive ping failed: %s", exc)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    await open_http_client()
+
+    # Heavy imports + agent construction, off the event loop.
+    t0 = time.perf_counter()
+    await asyncio.to_thread(get_search_agent)
+    agents_seconds = time.perf_counter() - t0
+    await asyncio.to_thread(get_typeahead)
+    feeds = []
+    if config.PRODUCT_FEED_ENABLED:
+        feeds.append(
+            _start_feed("product", "consumers.products_consumer", "consume_product_changes", snapshot_every=0)
+        )
+    if config.TYPEAHEAD_FEED_ENABLED:
+        feeds.append(
+            _start_feed("typeahead", "consumers.typeahead_consumer", "consume_search_suggestions", snapshot_every=0)
+        )
+    if config.PERSONALIZATION_FEED_ENABLED:
+        feeds.append(
+            _start_feed("affinity", "consumers.affinity_consumer", "consume_user_affinities", snapshot_every=0)
+        )
+    # Model loads can take tens of seconds; don't inherit the Next.js timeout.
+    ollama = httpx.AsyncClient(timeout=httpx.Timeout(300.0, connect=5.0))
+
+    warmup: Dict[str, Any] = {}
+    pinger: Optional[asyncio.Task] = None
+    if config.WARMUP_ON_STARTUP:
+        warmup = await _warm_up(ollama)
+        pinger = asyncio.create_task(_keep_models_loaded(ollama))
+
+    _readiness.update(
+        ready=True,
+        import_seconds=round(_IMPORT_SECONDS, 3),
+        agents_seconds=round(agents_seconds, 3),
+        startup_seconds=round(time.perf_counter() - started, 3),
+        warmup=warmup,
+    )
+    logger.info(
+        "Cold start: imports %.2fs, agents %.2fs, startup %.2fs (%s)",
+        _IMPORT_SECONDS,
+        agents_seconds,
+        time.perf_counter() - started,
+        warmup,
+    )
+    try:
+        yield
+    finally:
+        _readiness["ready"] = False
+        for stop in filter(None, feeds):
+            stop.set()
+        if pinger is not None:
+            pinger.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await pinger
+        await ollama.aclose()
+        await close_http_client()
+
+
+# 1. Create an instance of the FastAPI class (our main application object)
+app = FastAPI(lifespan=lifespan)
+
+
 origins = [
     "http://localhost:3000",
     "http://localhost:3001",
@@ -49,6 +254,10 @@ class EventMessage(BaseModel):
     categoryId: int
     categoryName: str
     timestamp: datetime
+    # Optional personalization fields (see core.personalization.event_fields).
+    userId: Optional[str] = None
+    productId: Optional[str] = None
+    attributes: Optional[Dict[str, Any]] = None
 
 
 class UserEvent(BaseModel):
@@ -61,22 +270,6 @@ class UserContext(BaseModel):
     metadata: Optional[Dict[str, Any]] = None
 
 
-# Models for the /search endpoint
-class SearchRequest(BaseModel):
-    query: str
-    user_context: Optional[UserContext] = None
-
-
-class ProductResult(BaseModel):
-    id: int
-    title: str
-    imageUrl: str
-
-
-class SearchResponse(BaseModel):
-    result: list[ProductResult]
-    ai_rewritten_query: str
-
 
 # 2. Define an endpoint for the root URL ("/")
 @app.get("/")
@@ -85,11 +278,50 @@ async def read_root():
     return {"message": "Welcome to the Agentic AI SDK!"}
 
 
+@app.get("/readyz")
+async def readyz():
+    """
+    Readiness probe: 200 once models are preloaded, the router is warm and
+    the HTTP pool is open.
+    """
+    if not _readiness["ready"]:
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    return {"status": "ready", **{k: v for k, v in _readiness.items() if k != "ready"}}
+
+
+@app.get("/metrics")
+async def metrics() -> PlainTextResponse:
+    """
+    Prometheus scrape endpoint: per-stage latency histograms, route mix,
+    LLM token counts / gateway queue time and downstream status codes.
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/v1/suggest", response_model=SuggestResponse)
+async def suggest(
+    q: str, k: Optional[int] = Query(None, ge=1, le=config.TYPEAHEAD_TOP_K)
+) -> SuggestResponse:
+    """
+    Typeahead: most searched (time-decayed) queries starting with ``q``,
+    from the in-memory prefix index (sub-millisecond, no I/O).
+    """
+    k = k or config.TYPEAHEAD_TOP_K
+    return SuggestResponse(prefix=q, suggestions=get_typeahead().suggest(q, k))
+
+
 @app.post("/api/v1/user-events")
 async def process_user_event(event: UserEvent):
     print(f"Received event for topic '{event.topic}'")
     print(f"     - Event Type '{event.message.eventType}'")
     print(f"     - Category '{event.message.categoryName}'")
+    from core.personalization import event_fields
+
+    # With the Kafka feed (PERSONALIZATION_FEED_ENABLED) every worker,
+    # this one included, records the event from the topic; recording it
+    # here as well would count it twice on this worker.
+    if not config.PERSONALIZATION_FEED_ENABLED:
+        get_search_agent().affinity_store.record_event(**event_fields(event.model_dump()))
     return {"status": "success", "event_received": event.message.eventType}
 
 
@@ -119,7 +351,11 @@ async def process_user_event(event: UserEvent):
 #     return SearchResponse(result=fake_products, ai_rewritten_query=ai_query)
 
 @app.post("/api/v1/search", response_model=SearchResponse)
-async def process_search(search_request: SearchRequest) -> SearchResponse:
+async def process_search(
+    search_request: SearchRequest,
+    request: Request,
+    http_response: Response,
+) -> SearchResponse:
     """
     Multi-agent search entrypoint.
 
@@ -129,20 +365,81 @@ async def process_search(search_request: SearchRequest) -> SearchResponse:
         * create a UserBehaviorIntent
         * UsersAgent produces a StructuredQuery
         * call Next.js /api/internal/analytics/query via tools.analytics_tool
+    - Runs inside a trace (continuing an incoming `traceparent`); the trace
+      id is returned in the X-Trace-Id header.
+    - Admission control: over capacity it either runs degraded (no LLM
+      routing; X-Degraded: 1) or answers 503 with Retry-After. If the
+      client disconnects, the in-flight work is cancelled.
+    - Deadline: the caller's X-Request-Timeout-Ms (or REQUEST_DEADLINE_SECONDS)
+      bounds admission, routing, the LLM and downstream calls; stages cut
+      short give a partial response (``partial: true``).
     """
-    try:
-        result: Dict[str, Any] = await _search_agent.run(
-            query=search_request.query,
-            user_context=search_request.user_context,
-        )
-    except AnalyticsServiceError as exc:
-        # Translate downstream service errors into a clean HTTP 502
-        raise HTTPException(status_code=502, detail=str(exc)) from exc
-
-    return SearchResponse(
-        items=result.get("items", []),
-        source=result.get("source", "unknown"),
-        plan=result.get("plan", {}),
-        ai_rewritten_query=result.get("ai_rewritten_query"),
-    )
-
+    with tracer.trace(
+        "POST /api/v1/search",
+        traceparent=request.headers.get("traceparent"),
+        query=search_request.query,
+    ) as root:
+        trace_headers = {"X-Trace-Id": root.trace_id} if root is not None else {}
+        http_response.headers.update(trace_headers)
+        budget = request_budget(request.headers.get(config.DEADLINE_HEADER))
+        try:
+            with deadline_scope(budget):
+                async with admission.admit() as mode:
+                    if mode == DEGRADED:
+                        http_response.headers["X-Degraded"] = "1"
+                    result: Dict[str, Any] = await _cancel_on_disconnect(
+                        request,
+                        get_search_agent().run(
+                            query=search_request.query,
+                            user_context=search_request.user_context,
+                            degraded=mode == DEGRADED,
+                        ),
+                    )
+        except Overloaded as exc:
+            # Shed before doing any work; clients back off for Retry-After.
+            SEARCH_REQUESTS.inc(status="503")
+            raise HTTPException(
+                status_code=503,
+                detail=str(exc),
+                headers={"Retry-After": str(int(exc.retry_after)), **trace_headers},
+            ) from exc
+        except DeadlineExceeded as exc:
+            # Only reached when no partial answer was possible.
+            SEARCH_REQUESTS.inc(status="504")
+            raise HTTPException(
+                status_code=504,
+                detail=str(exc),
+                headers=trace_headers or None,
+            ) from exc
+        except ClientDisconnected:
+            SEARCH_REQUESTS.inc(status="499")
+            if root is not None:
+                root.set(cancelled=True)
+            return Response(status_code=499)
+        except AnalyticsServiceError as exc:
+            # Translate downstream service errors into a clean HTTP 502
+            SEARCH_REQUESTS.inc(status="502")
+            raise HTTPException(
+                status_code=502,
+                detail=str(exc),
+                headers=trace_headers or None,
+            ) from exc
+
+        with STAGE_SECONDS.time(agent="api", stage="response"):
+            response = SearchResponse(
+                items=result.get("items", []),
+                source=result.get("source", "unknown"),
+                plan=result.get("plan", {}),
+                ai_rewritten_query=result.get("ai_rewritten_query"),
+                partial=result.get("partial", False),
+            )
+        if root is not None:
+            root.set(
+                route=result.get("source"),
+                items=len(response.items),
+                admission=mode,
+                partial=response.partial,
+                budget_s=budget,
+            )
+    SEARCH_REQUESTS.inc(status="200")
+    return response
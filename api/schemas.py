@@ -25,9 +25,26 @@ class SearchResponse(BaseModel):
     - source: where the results came from ("user_events", "orders", "generic_search").
     - plan: the SearchPlan as JSON, for debugging/telemetry.
     - ai_rewritten_query: optional normalized query string.
+    - partial: True if a stage was cut short by the request deadline.
     """
 
     items: List[Dict[str, Any]]
     source: str
     plan: Dict[str, Any]
     ai_rewritten_query: Optional[str] = None
+    partial: bool = False
+
+
+class Suggestion(BaseModel):
+    query: str
+    score: float
+
+
+class SuggestResponse(BaseModel):
+    """
+    Response for /api/v1/suggest: completions of ``prefix``, best first.
+    ``score`` is the time-decayed number of searches.
+    """
+
+    prefix: str
+    suggestions: List[Suggestion]
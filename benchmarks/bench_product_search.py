@@ -0,0 +1,121 @@
+# benchmarks/bench_product_search.py
+"""
+Latency of the in-process product search engine (core/product_search.py)
+on a synthetic catalog: bulk load time, per-query latency percentiles for
+text, filtered and filter-only searches, and incremental update cost.
+
+Usage:
+  python -m benchmarks.bench_product_search --products 100000
+  python -m benchmarks.bench_product_search --snapshot ./data/catalog.jsonl
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from core.product_search import ProductSearchEngine
+
+COLORS = ["black", "white", "red", "blue", "green", "grey", "navy", "pink", "brown", "yellow"]
+CATEGORIES = {
+    "jeans": ["slim", "stretch", "denim", "straight", "ripped"],
+    "shoes": ["running", "leather", "sneakers", "trail", "waterproof"],
+    "headphones": ["wireless", "noise", "cancelling", "bluetooth", "over-ear"],
+    "jackets": ["winter", "rain", "puffer", "kids", "fleece"],
+    "tea": ["organic", "green", "herbal", "loose", "leaf"],
+    "noodles": ["instant", "ramen", "family", "pack", "spicy"],
+    "bottles": ["stainless", "steel", "insulated", "water", "sports"],
+    "speakers": ["waterproof", "bluetooth", "portable", "bass", "smart"],
+}
+SIZES = ["xs", "s", "m", "l", "xl", "28", "30", "32", "34", "8", "9", "10", "11"]
+FILLER = "comfortable durable everyday premium quality lightweight classic modern soft".split()
+
+QUERIES = [
+    "waterproof bluetooth speaker under 2000",
+    "red running shoes size 10",
+    "organic green tea",
+    "black slim jeans",
+    "kids winter jacket",
+    "stainless steel water bottle",
+    "noise cancelling headphones",
+    "instant noodles family pack",
+]
+
+
+def synthetic_catalog(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    products = []
+    for i in range(n):
+        category = rng.choice(list(CATEGORIES))
+        color = rng.choice(COLORS)
+        words = rng.sample(CATEGORIES[category], 2)
+        products.append(
+            {
+                "id": f"P{i:07d}",
+                "title": f"{color} {' '.join(words)} {category}",
+                "description": " ".join(rng.choices(FILLER + CATEGORIES[category], k=20)),
+                "category": category,
+                "color": color,
+                "size": rng.sample(SIZES, 3),
+                "price": round(rng.lognormvariate(4, 1.2), 2),
+            }
+        )
+    return products
+
+
+def _pct(samples: List[float]) -> str:
+    arr = np.asarray(samples) * 1000.0
+    return " ".join(f"p{p}={np.percentile(arr, p):.2f}ms" for p in (50, 95, 99))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--snapshot", help="load this JSONL catalog instead of a synthetic one")
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    if args.snapshot:
+        engine = ProductSearchEngine.from_snapshot(args.snapshot)
+    else:
+        engine = ProductSearchEngine(price_buckets=(0, 25, 50, 100, 250, 500, 1000, 2500, 5000))
+        engine.load(synthetic_catalog(args.products, args.seed))
+    print(f"load: {time.perf_counter() - t0:.2f}s {engine.stats()}")
+
+    cases = {
+        "text (search_text)": lambda q: engine.search_text(q, k=args.k),
+        "text, no filters": lambda q: engine.search(q, k=args.k),
+        "filters only": lambda q: engine.search(
+            filters={"category": "jeans", "color": "black", "price_max": 80}, k=args.k
+        ),
+    }
+    for name, fn in cases.items():
+        for q in QUERIES:  # warm
+            fn(q)
+        samples = []
+        for _ in range(args.rounds):
+            for q in QUERIES:
+                t = time.perf_counter()
+                fn(q)
+                samples.append(time.perf_counter() - t)
+        print(f"{name:>20}: {_pct(samples)}")
+
+    rng = random.Random(args.seed)
+    updates = synthetic_catalog(1000, args.seed + 1)
+    samples = []
+    for product in updates:
+        product["id"] = f"P{rng.randrange(max(1, len(engine))):07d}"
+        t = time.perf_counter()
+        engine.upsert(product)
+        samples.append(time.perf_counter() - t)
+    print(f"{'upsert':>20}: {_pct(samples)}")
+
+
+if __name__ == "__main__":
+    main()
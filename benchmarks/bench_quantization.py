@@ -0,0 +1,100 @@
+# benchmarks/bench_quantization.py
+"""
+Recall / latency / memory of quantized MmapVectorStore search.
+
+For each quantization mode ("none", "int8", "binary") and re-scoring factor,
+reports recall@k against exact float search, query latency and the size of
+the in-RAM search matrix.
+
+Usage:
+  python -m benchmarks.bench_quantization --docs 50000 --dim 3072 --k 5
+"""
+from __future__ import annotations
+
+import argparse
+import shutil
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from benchmarks.bench_vector_store import _percentiles, _synthetic
+from rag_struct.vectorstores import MmapVectorStore
+
+
+def _build(directory: str, vectors: np.ndarray) -> None:
+    store = MmapVectorStore(directory, DeterministicFakeEmbedding(size=vectors.shape[1]))
+    for start in range(0, len(vectors), 4096):
+        end = min(start + 4096, len(vectors))
+        store.upsert(
+            [f"doc-{i}" for i in range(start, end)],
+            vectors[start:end].tolist(),
+            [{} for _ in range(start, end)],
+            ["" for _ in range(start, end)],
+        )
+    store.persist()
+
+
+def _run(store: MmapVectorStore, queries: np.ndarray, k: int) -> Dict[str, object]:
+    hits: List[List[int]] = []
+    samples = []
+    for q in queries:
+        t0 = time.perf_counter()
+        result = store.search_by_vectors(q, k=k)[0]
+        samples.append(time.perf_counter() - t0)
+        hits.append([row for row, _ in result])
+    return {"hits": hits, **_percentiles(samples)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=20_000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--rescore-factors", type=int, nargs="+", default=[2, 8, 32, 64])
+    args = parser.parse_args()
+
+    clusters = max(8, args.docs // 500)
+    vectors = _synthetic(args.docs, args.dim, clusters=clusters)
+    # Queries are noisy copies of catalog items, like real "find something like X" lookups.
+    rng = np.random.default_rng(1)
+    picks = rng.choice(args.docs, size=args.queries, replace=False)
+    queries = vectors[picks] + 0.3 * rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+
+    workdir = tempfile.mkdtemp(prefix="bench_quant_")
+    try:
+        _build(workdir, vectors)
+        embedding = DeterministicFakeEmbedding(size=args.dim)
+
+        exact_store = MmapVectorStore(workdir, embedding)
+        exact = _run(exact_store, queries, args.k)
+        float_bytes = exact_store._base.nbytes
+        print(f"docs={args.docs} dim={args.dim} queries={args.queries} k={args.k}")
+        print(
+            f"{'mode':>8} {'rescore':>8} {'recall@k':>9} {'p50_ms':>8} {'p95_ms':>8} {'ram_MB':>8}"
+        )
+        print(
+            f"{'none':>8} {'-':>8} {1.0:>9.3f} {exact['p50_ms']:>8.2f} "
+            f"{exact['p95_ms']:>8.2f} {float_bytes / 2**20:>8.1f}"
+        )
+
+        for mode in ("int8", "binary"):
+            for factor in args.rescore_factors:
+                store = MmapVectorStore(workdir, embedding, quantization=mode, rescore_factor=factor)
+                res = _run(store, queries, args.k)
+                recall = np.mean(
+                    [len(set(a) & set(e)) / max(len(e), 1) for a, e in zip(res["hits"], exact["hits"])]
+                )
+                print(
+                    f"{mode:>8} {factor:>8} {recall:>9.3f} {res['p50_ms']:>8.2f} "
+                    f"{res['p95_ms']:>8.2f} {store._quantized.nbytes / 2**20:>8.1f}"
+                )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# benchmarks/bench_router_models.py
+"""
+Router latency / accuracy per Ollama model.
+
+Runs the SearchAgent router chain (prompt -> LLM -> SearchPlan parser) over a
+fixed, labeled query set with each candidate model and reports route
+accuracy, parse failures and p50/p95 latency. Use it to pick
+LLM_ROUTER_MODEL.
+
+Requires a running Ollama with the models pulled.
+
+Usage:
+  python -m benchmarks.bench_router_models --models llama3 qwen2.5:1.5b phi3:mini
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import dataclasses
+import time
+from typing import Dict, List, Tuple
+
+from agents.orders_agent import OrdersAgent
+from agents.search_agent import SearchAgent
+from agents.users_agent import UsersAgent
+from benchmarks.bench_vector_store import _percentiles
+from core.llm import build_ollama_model, get_task_profile
+
+# (query, expected route)
+LABELED_QUERIES: List[Tuple[str, str]] = [
+    ("show me all the black jeans I searched for in the last 10 mins", "user_behavior"),
+    ("what did I look at yesterday", "user_behavior"),
+    ("the sneakers I added to my cart this morning", "user_behavior"),
+    ("products I viewed in the last hour", "user_behavior"),
+    ("things I searched for last week", "user_behavior"),
+    ("reorder my usual groceries", "orders"),
+    ("show my order history", "orders"),
+    ("add my usual noodles to the cart", "orders"),
+    ("what did I buy last month", "orders"),
+    ("where is my last order", "orders"),
+    ("waterproof bluetooth speaker under 2000", "generic_search"),
+    ("red running shoes size 10", "generic_search"),
+    ("best budget gaming laptop", "generic_search"),
+    ("organic green tea", "generic_search"),
+    ("wireless mouse for mac", "generic_search"),
+    ("kids winter jacket", "generic_search"),
+]
+
+USER_CONTEXT: Dict[str, object] = {"user_id": 42}
+
+
+async def _bench_model(model: str, rounds: int) -> Dict[str, object]:
+    profile = dataclasses.replace(get_task_profile("router"), model=model)
+    agent = SearchAgent(
+        llm=build_ollama_model(profile),
+        users_agent=UsersAgent(),
+        orders_agent=OrdersAgent(),
+    )
+
+    # One untimed call so model load time doesn't skew the first sample.
+    await agent._route(query=LABELED_QUERIES[0][0], user_context=USER_CONTEXT)
+
+    samples: List[float] = []
+    correct = failures = 0
+    for _ in range(rounds):
+        for query, expected in LABELED_QUERIES:
+            t0 = time.perf_counter()
+            try:
+                plan = await agent._route(query=query, user_context=USER_CONTEXT)
+            except Exception:
+                failures += 1
+                continue
+            finally:
+                samples.append(time.perf_counter() - t0)
+            correct += plan.route == expected
+
+    total = rounds * len(LABELED_QUERIES)
+    return {"accuracy": correct / total, "failures": failures, **_percentiles(samples)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", nargs="+", default=[get_task_profile("router").model])
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"queries={len(LABELED_QUERIES)} rounds={args.rounds}")
+    print(f"{'model':>24} {'accuracy':>9} {'failures':>9} {'p50_ms':>9} {'p95_ms':>9}")
+    for model in args.models:
+        res = asyncio.run(_bench_model(model, args.rounds))
+        print(
+            f"{model:>24} {res['accuracy']:>9.3f} {res['failures']:>9} "
+            f"{res['p50_ms']:>9.1f} {res['p95_ms']:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
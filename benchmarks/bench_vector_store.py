@@ -0,0 +1,169 @@
+# benchmarks/bench_vector_store.py
+"""
+Compare RAG vector store backends on a synthetic catalog.
+
+Measures ingest time, cold load time and single / batched query latency for:
+  - MmapVectorStore (brute force)
+  - MmapVectorStore (IVF coarse quantizer)
+  - Chroma (the default RAG backend), if chromadb is installed
+
+Vectors are precomputed and passed in directly, so the numbers reflect the
+store itself rather than embedding latency.
+
+Usage:
+  python -m benchmarks.bench_vector_store --docs 50000 --dim 768 --queries 200
+"""
+from __future__ import annotations
+
+import argparse
+import shutil
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from rag_struct.vectorstores import MmapVectorStore
+
+
+def _synthetic(n: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    labels = rng.integers(0, clusters, size=n)
+    vecs = centers[labels] + 0.5 * rng.normal(size=(n, dim))
+    return vecs.astype(np.float32)
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    arr = np.asarray(samples) * 1000.0
+    return {"p50_ms": float(np.percentile(arr, 50)), "p95_ms": float(np.percentile(arr, 95))}
+
+
+def _time_queries(search: Callable[[np.ndarray], object], queries: np.ndarray) -> Dict[str, float]:
+    samples = []
+    for q in queries:
+        t0 = time.perf_counter()
+        search(q)
+        samples.append(time.perf_counter() - t0)
+    return _percentiles(samples)
+
+
+def _bench_mmap(
+    workdir: str,
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    k: int,
+    ivf_lists: int,
+) -> Dict[str, object]:
+    directory = f"{workdir}/mmap_{ivf_lists}"
+    embedding = DeterministicFakeEmbedding(size=vectors.shape[1])
+    store = MmapVectorStore(directory, embedding, ivf_lists=ivf_lists, ivf_min_rows=0)
+
+    ids = [f"doc-{i}" for i in range(len(vectors))]
+    metas = [{"category": f"c{i % 20}"} for i in range(len(vectors))]
+    texts = [f"product {i}" for i in range(len(vectors))]
+
+    t0 = time.perf_counter()
+    for start in range(0, len(vectors), 4096):
+        end = start + 4096
+        store.upsert(ids[start:end], vectors[start:end].tolist(), metas[start:end], texts[start:end])
+    store.persist()
+    ingest_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    store = MmapVectorStore(directory, embedding, ivf_lists=ivf_lists, ivf_min_rows=0)
+    load_s = time.perf_counter() - t0
+
+    single = _time_queries(lambda q: store.search_by_vectors(q, k=k), queries)
+
+    t0 = time.perf_counter()
+    store.search_by_vectors(queries, k=k)
+    batch_per_query_ms = (time.perf_counter() - t0) * 1000.0 / len(queries)
+
+    filtered = _time_queries(
+        lambda q: store.search_by_vectors(q, k=k, filter={"category": "c3"}), queries
+    )
+
+    return {
+        "ingest_s": ingest_s,
+        "load_s": load_s,
+        "single": single,
+        "batch_ms_per_query": batch_per_query_ms,
+        "filtered": filtered,
+        "hits": [[row for row, _ in h] for h in store.search_by_vectors(queries, k=k)],
+    }
+
+
+def _bench_chroma(workdir: str, vectors: np.ndarray, queries: np.ndarray, k: int) -> Dict[str, object]:
+    from langchain_community.vectorstores import Chroma
+
+    embedding = DeterministicFakeEmbedding(size=vectors.shape[1])
+    directory = f"{workdir}/chroma"
+    store = Chroma(collection_name="bench", embedding_function=embedding, persist_directory=directory)
+
+    t0 = time.perf_counter()
+    for start in range(0, len(vectors), 4096):
+        end = min(start + 4096, len(vectors))
+        store._collection.upsert(
+            ids=[f"doc-{i}" for i in range(start, end)],
+            embeddings=vectors[start:end].tolist(),
+            metadatas=[{"category": f"c{i % 20}"} for i in range(start, end)],
+            documents=[f"product {i}" for i in range(start, end)],
+        )
+    ingest_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    store = Chroma(collection_name="bench", embedding_function=embedding, persist_directory=directory)
+    store.similarity_search_by_vector(queries[0].tolist(), k=k)
+    load_s = time.perf_counter() - t0
+
+    single = _time_queries(lambda q: store.similarity_search_by_vector(q.tolist(), k=k), queries)
+    filtered = _time_queries(
+        lambda q: store.similarity_search_by_vector(q.tolist(), k=k, filter={"category": "c3"}),
+        queries,
+    )
+    return {"ingest_s": ingest_s, "load_s": load_s, "single": single, "filtered": filtered}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=20_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--ivf-lists", type=int, default=128)
+    parser.add_argument("--skip-chroma", action="store_true")
+    args = parser.parse_args()
+
+    vectors = _synthetic(args.docs, args.dim, clusters=max(8, args.docs // 500))
+    queries = _synthetic(args.queries, args.dim, clusters=max(8, args.docs // 500), seed=1)
+
+    workdir = tempfile.mkdtemp(prefix="bench_vs_")
+    try:
+        results: Dict[str, Dict[str, object]] = {}
+        results["mmap_brute"] = _bench_mmap(workdir, vectors, queries, args.k, ivf_lists=0)
+        results["mmap_ivf"] = _bench_mmap(workdir, vectors, queries, args.k, ivf_lists=args.ivf_lists)
+
+        exact = results["mmap_brute"].pop("hits")
+        approx = results["mmap_ivf"].pop("hits")
+        recall = np.mean([len(set(a) & set(e)) / max(len(e), 1) for a, e in zip(approx, exact)])
+        results["mmap_ivf"]["recall_at_k"] = float(recall)
+
+        if not args.skip_chroma:
+            try:
+                results["chroma"] = _bench_chroma(workdir, vectors, queries, args.k)
+            except ImportError:
+                print("chromadb not installed; skipping Chroma backend")
+
+        print(f"docs={args.docs} dim={args.dim} queries={args.queries} k={args.k}")
+        for name, res in results.items():
+            print(f"\n[{name}]")
+            for key, value in res.items():
+                print(f"  {key:>20}: {value}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
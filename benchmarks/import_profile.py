@@ -0,0 +1,98 @@
+# benchmarks/import_profile.py
+"""
+Import-time profile of one or more modules.
+
+Runs ``python -X importtime -c "import <module>"`` in a fresh interpreter
+per module and reports the total wall time plus the slowest imports by
+cumulative and by self time.
+
+Usage:
+  python -m benchmarks.import_profile api.main rag_struct.main
+  python -m benchmarks.import_profile api.main --top 25
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from typing import List, NamedTuple
+
+
+class ImportRecord(NamedTuple):
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(stderr: str) -> List[ImportRecord]:
+    """
+    Parse ``-X importtime`` lines:
+        import time: self [us] | cumulative | imported package
+        import time:       512 |       1024 |   fastapi.routing
+    """
+    records = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            records.append(
+                ImportRecord(
+                    module=name.strip(),
+                    self_us=int(self_us),
+                    cumulative_us=int(cumulative_us),
+                    depth=(len(name) - len(name.lstrip())) // 2,
+                )
+            )
+        except ValueError:
+            continue
+    return records
+
+
+def profile(module: str) -> tuple:
+    env = {**os.environ, "PYTHONWARNINGS": "ignore"}
+    t0 = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    wall = time.perf_counter() - t0
+    if proc.returncode != 0:
+        errors = [l for l in proc.stderr.splitlines() if not l.startswith("import time:")]
+        raise RuntimeError(f"import {module} failed:\n" + "\n".join(errors[-10:]))
+    return wall, parse_importtime(proc.stderr)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="+")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    for module in args.modules:
+        try:
+            wall, records = profile(module)
+        except RuntimeError as exc:
+            print(f"\n== {exc}")
+            continue
+        top_level = [r for r in records if r.depth == 0]
+        total_ms = sum(r.cumulative_us for r in top_level) / 1000
+        print(f"\n== {module}: {total_ms:.0f} ms in imports, {wall * 1000:.0f} ms process wall, "
+              f"{len(records)} modules")
+
+        print("  slowest by cumulative time:")
+        for r in sorted(records, key=lambda r: r.cumulative_us, reverse=True)[: args.top]:
+            print(f"    {r.cumulative_us / 1000:>9.1f} ms  {r.module}")
+
+        print("  slowest by self time:")
+        for r in sorted(records, key=lambda r: r.self_us, reverse=True)[: args.top]:
+            print(f"    {r.self_us / 1000:>9.1f} ms  {r.module}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# benchmarks/loadtest/fakes.py
+"""
+Local stand-ins for the load test: a deterministic chat model and a fake
+Next.js analytics server, both with configurable latency / jitter.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+_QUERY_RE = re.compile(r"User query: (.*)")
+_ORDER_WORDS = ("order", "usual", "bought", "reorder", "cart again")
+_BEHAVIOR_WORDS = ("i viewed", "i searched", "i looked", "i added", "my recent", "last ")
+
+
+def plan_for(query: str) -> Dict[str, Any]:
+    """
+    Keyword router standing in for the LLM; returns SearchPlan JSON.
+    """
+    q = query.lower()
+    if any(w in q for w in _ORDER_WORDS):
+        return {"route": "orders", "rationale": "order keywords", "orders": {"purpose": "view_history"}}
+    if any(w in q for w in _BEHAVIOR_WORDS):
+        return {
+            "route": "user_behavior",
+            "rationale": "behavior keywords",
+            "user_behavior": {"action": "search", "product_category": q.split()[-1], "time_window": "1h"},
+        }
+    return {
+        "route": "generic_search",
+        "rationale": "default",
+        "generic": {"normalized_query": query.strip()},
+    }
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic router model: answers with a SearchPlan for the query in
+    the prompt after ``latency_ms`` ± ``jitter_ms`` (seeded, so runs are
+    comparable). Reports token usage so LLM metrics are exercised.
+    """
+
+    latency_ms: float = 300.0
+    jitter_ms: float = 50.0
+    seed: int = 0
+    _rng: Optional[random.Random] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-router"
+
+    def _delay(self) -> float:
+        if self._rng is None:
+            self._rng = random.Random(self.seed)
+        return max(0.0, self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000.0
+
+    def _result(self, messages: List[BaseMessage]) -> ChatResult:
+        text = "\n".join(str(m.content) for m in messages)
+        match = _QUERY_RE.search(text)
+        content = json.dumps(plan_for(match.group(1) if match else ""))
+        message = AIMessage(
+            content=content,
+            usage_metadata={
+                "input_tokens": len(text) // 4,
+                "output_tokens": len(content) // 4,
+                "total_tokens": (len(text) + len(content)) // 4,
+            },
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: List[BaseMessage], stop: Any = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        time.sleep(self._delay())
+        return self._result(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Any = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self._delay())
+        return self._result(messages)
+
+
+def build_fake_nextjs(
+    *,
+    latency_ms: float = 40.0,
+    jitter_ms: float = 10.0,
+    error_rate: float = 0.0,
+    events: int = 20,
+    seed: int = 0,
+) -> FastAPI:
+    """
+    Fake Next.js internal API: /api/internal/analytics/query returns
+    ``events`` synthetic user events; ``error_rate`` of calls return 503.
+    """
+    app = FastAPI()
+    rng = random.Random(seed)
+
+    @app.post("/api/internal/analytics/query")
+    async def analytics_query(request: Request):
+        body = await request.json()
+        await asyncio.sleep(max(0.0, latency_ms + rng.uniform(-jitter_ms, jitter_ms)) / 1000.0)
+        if rng.random() < error_rate:
+            return JSONResponse(status_code=503, content={"error": "unavailable"})
+        filters = body.get("query", {}).get("filters", {})
+        return {
+            "events": [
+                {
+                    "id": i,
+                    "type": filters.get("type", "view"),
+                    "product_category": filters.get("product_category"),
+                    "user_id": filters.get("user_id"),
+                }
+                for i in range(events)
+            ]
+        }
+
+    @app.get("/healthz")
+    async def healthz():
+        return {"status": "ok"}
+
+    return app
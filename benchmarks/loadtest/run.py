@@ -0,0 +1,316 @@
+# benchmarks/loadtest/run.py
+"""
+End-to-end load test of api.main:app against local stand-ins.
+
+Starts a fake Next.js analytics server and the real API (with a fake,
+deterministic chat model) as subprocesses, drives /api/v1/search with a
+query mix at a fixed arrival rate (open loop, capped at --concurrency
+in flight), and reports throughput, latency percentiles, error rates and
+server memory. Latency is measured from each request's scheduled send time,
+so client-side queueing under overload is counted.
+
+Usage:
+  python -m benchmarks.loadtest.run --rps 20 --duration 30 --concurrency 64
+  python -m benchmarks.loadtest.run --mix generic_search=0.6,user_behavior=0.3,orders=0.1
+  python -m benchmarks.loadtest.run --save-baseline benchmarks/loadtest/baselines/default.json
+  python -m benchmarks.loadtest.run --baseline benchmarks/loadtest/baselines/default.json
+
+With --baseline the exit status is 1 if p95/p99, throughput, error rate or
+peak RSS regress by more than --tolerance.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+
+QUERIES: Dict[str, List[str]] = {
+    "generic_search": [
+        "waterproof bluetooth speaker under 2000",
+        "red running shoes size 10",
+        "organic green tea",
+        "wireless mouse for mac",
+        "kids winter jacket",
+        "stainless steel water bottle",
+        "noise cancelling headphones",
+        "instant noodles family pack",
+    ],
+    "user_behavior": [
+        "show me the black jeans I searched for in the last 10 mins",
+        "things I viewed in the last hour jackets",
+        "what I looked at yesterday sneakers",
+        "products I added to the cart today noodles",
+        "my recent searches headphones",
+    ],
+    "orders": [
+        "reorder my usual groceries",
+        "show my order history",
+        "what did I buy last month",
+        "add my usual noodles to the cart again",
+    ],
+}
+
+DEFAULT_MIX = "generic_search=0.5,user_behavior=0.3,orders=0.2"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _parse_mix(spec: str) -> List[Tuple[str, float]]:
+    mix = []
+    for item in spec.split(","):
+        route, _, weight = item.partition("=")
+        if route not in QUERIES:
+            raise SystemExit(f"Unknown route {route!r} in --mix; expected {sorted(QUERIES)}")
+        mix.append((route, float(weight)))
+    return mix
+
+
+def _rss_mb(pid: int) -> Tuple[Optional[float], Optional[float]]:
+    """(current RSS, peak RSS) in MB from /proc; (None, None) elsewhere."""
+    try:
+        with open(f"/proc/{pid}/status") as fh:
+            fields = dict(line.split(":", 1) for line in fh if ":" in line)
+        return int(fields["VmRSS"].split()[0]) / 1024, int(fields["VmHWM"].split()[0]) / 1024
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+async def _wait_ready(url: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} not ready after {timeout}s")
+
+
+async def _drive(
+    base_url: str,
+    *,
+    rps: float,
+    duration: float,
+    concurrency: int,
+    mix: List[Tuple[str, float]],
+    server_pid: int,
+    seed: int,
+) -> Dict[str, object]:
+    rng = random.Random(seed)
+    routes = [r for r, _ in mix]
+    weights = [w for _, w in mix]
+    total = int(rps * duration)
+    gate = asyncio.Semaphore(concurrency)
+    latencies: Dict[str, List[float]] = {r: [] for r in routes}
+    statuses: Counter = Counter()
+    rss_samples: List[float] = []
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60.0, limits=limits) as client:
+
+        async def one(scheduled: float, route: str, query: str, user_id: int) -> None:
+            async with gate:
+                try:
+                    resp = await client.post(
+                        "/api/v1/search",
+                        json={"query": query, "user_context": {"user_id": user_id}},
+                    )
+                    statuses[str(resp.status_code)] += 1
+                except httpx.HTTPError as exc:
+                    statuses[type(exc).__name__] += 1
+            latencies[route].append(time.perf_counter() - scheduled)
+
+        async def sample_memory() -> None:
+            while True:
+                rss, _ = _rss_mb(server_pid)
+                if rss is not None:
+                    rss_samples.append(rss)
+                await asyncio.sleep(0.25)
+
+        sampler = asyncio.create_task(sample_memory())
+        start = time.perf_counter()
+        tasks = []
+        for i in range(total):
+            scheduled = start + i / rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            route = rng.choices(routes, weights)[0]
+            tasks.append(
+                asyncio.create_task(
+                    one(scheduled, route, rng.choice(QUERIES[route]), rng.randint(1, 500))
+                )
+            )
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+        sampler.cancel()
+
+    all_lat = np.asarray([x for xs in latencies.values() for x in xs]) * 1000.0
+    ok = statuses.get("200", 0)
+    _, peak = _rss_mb(server_pid)
+
+    def pct(arr: np.ndarray) -> Dict[str, float]:
+        if not len(arr):
+            return {}
+        return {f"p{p}_ms": float(np.percentile(arr, p)) for p in (50, 90, 95, 99)}
+
+    return {
+        "requests": total,
+        "elapsed_s": elapsed,
+        "throughput_rps": ok / elapsed if elapsed else 0.0,
+        "error_rate": (total - ok) / total if total else 0.0,
+        "statuses": dict(statuses),
+        "latency": {**pct(all_lat), "max_ms": float(all_lat.max()) if len(all_lat) else 0.0},
+        "latency_by_route": {r: pct(np.asarray(v) * 1000.0) for r, v in latencies.items()},
+        "rss_mb": {
+            "mean": float(np.mean(rss_samples)) if rss_samples else None,
+            "peak": peak if peak is not None else (max(rss_samples) if rss_samples else None),
+        },
+    }
+
+
+def _compare(result: Dict[str, object], baseline: Dict[str, object], tolerance: float) -> List[str]:
+    """Human-readable regressions of ``result`` vs ``baseline``."""
+    problems = []
+    for key in ("p95_ms", "p99_ms"):
+        old, new = baseline["latency"].get(key), result["latency"].get(key)
+        if old and new and new > old * (1 + tolerance):
+            problems.append(f"latency {key}: {old:.1f} -> {new:.1f}")
+    if result["throughput_rps"] < baseline["throughput_rps"] * (1 - tolerance):
+        problems.append(
+            f"throughput: {baseline['throughput_rps']:.2f} -> {result['throughput_rps']:.2f} rps"
+        )
+    if result["error_rate"] > baseline["error_rate"] + 0.01:
+        problems.append(f"error rate: {baseline['error_rate']:.3f} -> {result['error_rate']:.3f}")
+    old_rss, new_rss = baseline["rss_mb"].get("peak"), result["rss_mb"].get("peak")
+    if old_rss and new_rss and new_rss > old_rss * (1 + tolerance):
+        problems.append(f"peak RSS: {old_rss:.0f} -> {new_rss:.0f} MB")
+    return problems
+
+
+def _print(result: Dict[str, object]) -> None:
+    lat = result["latency"]
+    print(
+        f"requests={result['requests']} elapsed={result['elapsed_s']:.1f}s "
+        f"throughput={result['throughput_rps']:.2f} rps error_rate={result['error_rate']:.3f} "
+        f"statuses={result['statuses']}"
+    )
+    print(
+        "latency ms: "
+        + " ".join(f"{k[:-3]}={v:.1f}" for k, v in lat.items())
+    )
+    for route, stats in result["latency_by_route"].items():
+        if stats:
+            print(f"  {route:>15}: " + " ".join(f"{k[:-3]}={v:.1f}" for k, v in stats.items()))
+    rss = result["rss_mb"]
+    if rss["peak"] is not None:
+        print(f"server RSS MB: mean={rss['mean']:.0f} peak={rss['peak']:.0f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rps", type=float, default=10.0)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=50.0)
+    parser.add_argument("--llm-cache", action="store_true", help="enable the router LLM cache")
+    parser.add_argument("--nextjs-latency-ms", type=float, default=40.0)
+    parser.add_argument("--nextjs-jitter-ms", type=float, default=10.0)
+    parser.add_argument("--nextjs-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the full result as JSON")
+    parser.add_argument("--save-baseline", help="save this run as a baseline JSON")
+    parser.add_argument("--baseline", help="compare against a saved baseline JSON")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args()
+
+    mix = _parse_mix(args.mix)
+    workdir = tempfile.mkdtemp(prefix="loadtest_")
+    nextjs_port, api_port = _free_port(), _free_port()
+    serve = [sys.executable, "-m", "benchmarks.loadtest.serve"]
+    procs = [
+        subprocess.Popen(
+            serve + [
+                "nextjs", "--port", str(nextjs_port),
+                "--latency-ms", str(args.nextjs_latency_ms),
+                "--jitter-ms", str(args.nextjs_jitter_ms),
+                "--error-rate", str(args.nextjs_error_rate),
+                "--seed", str(args.seed),
+            ]
+        ),
+        subprocess.Popen(
+            serve + [
+                "api", "--port", str(api_port),
+                "--nextjs-url", f"http://127.0.0.1:{nextjs_port}",
+                "--llm-latency-ms", str(args.llm_latency_ms),
+                "--llm-jitter-ms", str(args.llm_jitter_ms),
+                "--workdir", workdir,
+                "--seed", str(args.seed),
+            ]
+            + (["--llm-cache"] if args.llm_cache else []),
+            env={**os.environ, "PYTHONUNBUFFERED": "1"},
+        ),
+    ]
+    try:
+        asyncio.run(_wait_ready(f"http://127.0.0.1:{nextjs_port}/healthz"))
+        asyncio.run(_wait_ready(f"http://127.0.0.1:{api_port}/readyz"))
+        result = asyncio.run(
+            _drive(
+                f"http://127.0.0.1:{api_port}",
+                rps=args.rps,
+                duration=args.duration,
+                concurrency=args.concurrency,
+                mix=mix,
+                server_pid=procs[1].pid,
+                seed=args.seed,
+            )
+        )
+    finally:
+        for proc in procs:
+            proc.terminate()
+        for proc in procs:
+            proc.wait(timeout=10)
+
+    result["params"] = {k: v for k, v in vars(args).items() if k not in ("out", "save_baseline", "baseline")}
+    _print(result)
+
+    for path in filter(None, (args.out, args.save_baseline)):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as fh:
+            json.dump(result, fh, indent=2)
+        print(f"wrote {path}")
+
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+        if baseline.get("params") != result["params"]:
+            print("warning: baseline was recorded with different parameters")
+        problems = _compare(result, baseline, args.tolerance)
+        if problems:
+            print("REGRESSION vs baseline:\n  " + "\n  ".join(problems))
+            sys.exit(1)
+        print("no regression vs baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# benchmarks/loadtest/serve.py
+"""
+Server processes for the load test (started by benchmarks.loadtest.run).
+
+  python -m benchmarks.loadtest.serve nextjs --port 3100 --latency-ms 40
+  python -m benchmarks.loadtest.serve api --port 8100 --nextjs-url http://127.0.0.1:3100 \\
+      --llm-latency-ms 300 --llm-jitter-ms 50
+
+The "api" mode serves the real api.main:app; only the Ollama model is
+swapped for FakeChatModel (the gateway, LLM cache, agents, metrics and
+tracing all run as in production).
+"""
+from __future__ import annotations
+
+import argparse
+import os
+
+import uvicorn
+
+
+def _serve_nextjs(args: argparse.Namespace) -> None:
+    from benchmarks.loadtest.fakes import build_fake_nextjs
+
+    app = build_fake_nextjs(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def _serve_api(args: argparse.Namespace) -> None:
+    # config.py reads the environment at import, so set it first.
+    os.environ["NEXTJS_BASE_URL"] = args.nextjs_url
+    os.environ.setdefault("WARMUP_ON_STARTUP", "false")
+    os.environ.setdefault("LLM_ROUTER_CACHE", "true" if args.llm_cache else "false")
+    os.environ.setdefault("LLM_CACHE_PATH", os.path.join(args.workdir, "llm_cache.sqlite"))
+    os.environ.setdefault("SHARED_CACHE_PATH", os.path.join(args.workdir, "shared.sqlite"))
+    os.environ.setdefault("TRACE_EXPORT_PATH", os.path.join(args.workdir, "traces.jsonl"))
+
+    import core.llm
+    from benchmarks.loadtest.fakes import FakeChatModel
+
+    core.llm.build_ollama_model = lambda profile: FakeChatModel(
+        latency_ms=args.llm_latency_ms,
+        jitter_ms=args.llm_jitter_ms,
+        seed=args.seed,
+    )
+    uvicorn.run("api.main:app", host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="mode", required=True)
+
+    nextjs = sub.add_parser("nextjs")
+    nextjs.add_argument("--port", type=int, required=True)
+    nextjs.add_argument("--latency-ms", type=float, default=40.0)
+    nextjs.add_argument("--jitter-ms", type=float, default=10.0)
+    nextjs.add_argument("--error-rate", type=float, default=0.0)
+    nextjs.add_argument("--seed", type=int, default=0)
+
+    api = sub.add_parser("api")
+    api.add_argument("--port", type=int, required=True)
+    api.add_argument("--nextjs-url", required=True)
+    api.add_argument("--llm-latency-ms", type=float, default=300.0)
+    api.add_argument("--llm-jitter-ms", type=float, default=50.0)
+    api.add_argument("--llm-cache", action="store_true")
+    api.add_argument("--workdir", default=".")
+    api.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args()
+    if args.mode == "nextjs":
+        _serve_nextjs(args)
+    else:
+        _serve_api(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -13,8 +13,193 @@ NEXTJS_BASE_URL: str = os.getenv("NEXTJS_BASE_URL", "http://localhost:3000")
 # Timeout for HTTP calls to Next.js internal APIs (seconds)
 HTTP_TIMEOUT_SECONDS: float = float(os.getenv("HTTP_TIMEOUT_SECONDS", "10"))
 
+# Connection pool for the shared Next.js HTTP client
+HTTP_MAX_CONNECTIONS: int = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+
 # LLM model used by the Brain (Ollama)
 MODEL_NAME: str = os.getenv("MODEL_NAME", "llama3")
 
 # Ollama base URL (docker-compose sets this)
 OLLAMA_BASE_URL: str = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+
+# ---------- LLM gateway ----------
+# Max concurrent LLM calls in this process, across all models.
+LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+
+# Per-model caps as "model=n,other=m"; set these to the backend's parallelism
+# (e.g. OLLAMA_NUM_PARALLEL) so admitted calls are batched server-side.
+LLM_MODEL_CONCURRENCY: dict = {
+    name.strip(): int(limit)
+    for name, _, limit in (
+        item.partition("=") for item in os.getenv("LLM_MODEL_CONCURRENCY", "").split(",")
+    )
+    if name.strip() and limit.strip()
+}
+
+# Max slots background (Kafka consumer) calls may hold, so interactive
+# requests always find capacity. Defaults to LLM_MAX_CONCURRENCY - 1.
+LLM_BACKGROUND_MAX_CONCURRENCY: int = int(
+    os.getenv("LLM_BACKGROUND_MAX_CONCURRENCY", str(max(1, LLM_MAX_CONCURRENCY - 1)))
+)
+
+
+# ---------- Per-task model tiering ----------
+def _task_profile(
+    task: str,
+    *,
+    model: str,
+    num_ctx: int,
+    num_predict: int,
+    keep_alive: str,
+    temperature: float,
+    cache: bool = False,
+) -> dict:
+    """
+    Defaults for one LLM task; each field can be overridden with
+    LLM_<TASK>_MODEL / _NUM_CTX / _NUM_PREDICT / _KEEP_ALIVE / _TEMPERATURE / _CACHE.
+    """
+    prefix = f"LLM_{task.upper()}_"
+    return {
+        "model": os.getenv(prefix + "MODEL", model),
+        "num_ctx": int(os.getenv(prefix + "NUM_CTX", str(num_ctx))),
+        "num_predict": int(os.getenv(prefix + "NUM_PREDICT", str(num_predict))),
+        "keep_alive": os.getenv(prefix + "KEEP_ALIVE", keep_alive),
+        "temperature": float(os.getenv(prefix + "TEMPERATURE", str(temperature))),
+        # Exact-match response cache opt-in (see LLM_CACHE_* below).
+        "cache": os.getenv(prefix + "CACHE", str(cache)).lower() in ("1", "true", "yes"),
+    }
+
+
+# router: short JSON SearchPlan -> small, fast model (e.g. LLM_ROUTER_MODEL=qwen2.5:1.5b)
+# summarizer: one-sentence Kafka event summaries
+# rag_answer / recommendation: user-facing prose -> the larger model
+LLM_TASKS: dict = {
+    "router": _task_profile(
+        "router", model=MODEL_NAME, num_ctx=2048, num_predict=256, keep_alive="30m", temperature=0.0,
+        cache=True,
+    ),
+    "summarizer": _task_profile(
+        "summarizer", model=MODEL_NAME, num_ctx=2048, num_predict=96, keep_alive="10m", temperature=0.1,
+        cache=True,
+    ),
+    "rag_answer": _task_profile(
+        "rag_answer", model=MODEL_NAME, num_ctx=8192, num_predict=512, keep_alive="30m", temperature=0.1
+    ),
+    "recommendation": _task_profile(
+        "recommendation", model=MODEL_NAME, num_ctx=4096, num_predict=384, keep_alive="30m", temperature=0.3
+    ),
+}
+
+# ---------- Shared cross-process cache ----------
+# Local SQLite file shared by all API workers on the box (see core/shared_cache.py).
+SHARED_CACHE_PATH: str = os.getenv("SHARED_CACHE_PATH", "./.cache/shared.sqlite")
+
+# SearchPlan cache keyed by (query, user_context); 0 disables.
+PLAN_CACHE_TTL_SECONDS: float = float(os.getenv("PLAN_CACHE_TTL_SECONDS", "3600"))
+
+# Analytics (Next.js) response cache; off by default because results are
+# time-windowed ("last 10 mins"). 0 disables.
+ANALYTICS_CACHE_TTL_SECONDS: float = float(os.getenv("ANALYTICS_CACHE_TTL_SECONDS", "0"))
+
+# ---------- LLM response cache ----------
+# Exact-match cache (memory LRU + SQLite) for deterministic task calls.
+LLM_CACHE_PATH: str = os.getenv("LLM_CACHE_PATH", SHARED_CACHE_PATH)
+LLM_CACHE_TTL_SECONDS: float = float(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+LLM_CACHE_MAX_ENTRIES: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+LLM_CACHE_MEMORY_ENTRIES: int = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "1000"))
+
+# ---------- Startup warm-up ----------
+# Preload task models into Ollama and run a warm-up router call before /readyz
+# reports ready; then re-ping every N seconds so quiet periods don't unload them.
+WARMUP_ON_STARTUP: bool = os.getenv("WARMUP_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+WARMUP_QUERY: str = os.getenv("WARMUP_QUERY", "red running shoes")
+OLLAMA_KEEPALIVE_PING_SECONDS: float = float(os.getenv("OLLAMA_KEEPALIVE_PING_SECONDS", "240"))
+
+# ---------- Tracing ----------
+# Spans per request, exported as JSONL (OTLP span field names). Tail sampling
+# keeps every failed trace, every trace slower than TRACE_SLOW_MS, and a
+# TRACE_SAMPLE_RATE fraction of the rest.
+TRACING_ENABLED: bool = os.getenv("TRACING_ENABLED", "true").lower() in ("1", "true", "yes")
+TRACE_EXPORT_PATH: str = os.getenv("TRACE_EXPORT_PATH", "./traces.jsonl")
+TRACE_SLOW_MS: float = float(os.getenv("TRACE_SLOW_MS", "1000"))
+TRACE_SAMPLE_RATE: float = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+
+# ---------- Production serving (run_api.py --prod) ----------
+API_HOST: str = os.getenv("API_HOST", "0.0.0.0")
+API_PORT: int = int(os.getenv("API_PORT", "8000"))
+# 0 = one worker per CPU core.
+API_WORKERS: int = int(os.getenv("API_WORKERS", "0"))
+# Seconds in-flight requests get to finish on SIGTERM before workers exit.
+API_GRACEFUL_TIMEOUT: float = float(os.getenv("API_GRACEFUL_TIMEOUT", "30"))
+
+# ---------- Local product search (core/product_search.py) ----------
+# JSONL catalog snapshot loaded at startup; kept current by the product-change
+# feed and rewritten by the products consumer.
+PRODUCT_CATALOG_PATH: str = os.getenv("PRODUCT_CATALOG_PATH", "./data/catalog.jsonl")
+# Price facet bucket edges; range filters check exact prices only in boundary buckets.
+PRODUCT_PRICE_BUCKETS: list = [
+    float(edge) for edge in os.getenv("PRODUCT_PRICE_BUCKETS", "0,25,50,100,250,500,1000,2500,5000").split(",")
+]
+PRODUCT_SEARCH_TOP_K: int = int(os.getenv("PRODUCT_SEARCH_TOP_K", "20"))
+KAFKA_BOOTSTRAP_SERVERS: str = os.getenv("KAFKA_BOOTSTRAP_SERVERS", "localhost:29092")
+PRODUCT_CHANGES_TOPIC: str = os.getenv("PRODUCT_CHANGES_TOPIC", "dev.amazon-clone.product-changes")
+# Each API worker tails the feed itself (no consumer group) to stay current.
+PRODUCT_FEED_ENABLED: bool = os.getenv("PRODUCT_FEED_ENABLED", "false").lower() in ("1", "true", "yes")
+# The products consumer rewrites the snapshot after this many changes.
+PRODUCT_SNAPSHOT_EVERY: int = int(os.getenv("PRODUCT_SNAPSHOT_EVERY", "500"))
+
+# ---------- Typeahead suggestions (core/typeahead.py) ----------
+# Prefix index built from the user-searches topic, served at /api/v1/suggest.
+USER_SEARCHES_TOPIC: str = os.getenv("USER_SEARCHES_TOPIC", "dev.amazon-clone.user-searches")
+TYPEAHEAD_SNAPSHOT_PATH: str = os.getenv("TYPEAHEAD_SNAPSHOT_PATH", "./data/typeahead.json")
+TYPEAHEAD_TOP_K: int = int(os.getenv("TYPEAHEAD_TOP_K", "10"))
+# Search counts lose half their weight every N seconds.
+TYPEAHEAD_HALF_LIFE_SECONDS: float = float(os.getenv("TYPEAHEAD_HALF_LIFE_SECONDS", str(7 * 86400)))
+TYPEAHEAD_MAX_QUERIES: int = int(os.getenv("TYPEAHEAD_MAX_QUERIES", "200000"))
+# The typeahead consumer rewrites the snapshot after this many searches.
+TYPEAHEAD_SNAPSHOT_EVERY: int = int(os.getenv("TYPEAHEAD_SNAPSHOT_EVERY", "1000"))
+# Each API worker tails the topic itself (no consumer group) to stay current.
+TYPEAHEAD_FEED_ENABLED: bool = os.getenv("TYPEAHEAD_FEED_ENABLED", "false").lower() in ("1", "true", "yes")
+
+# ---------- Personalized re-ranking (core/personalization.py) ----------
+USER_EVENTS_TOPIC: str = os.getenv("USER_EVENTS_TOPIC", "dev.amazon-clone.user-events")
+# Hashed feature buckets per user vector (float32 each).
+PERSONALIZATION_DIM: int = int(os.getenv("PERSONALIZATION_DIM", "128"))
+# Least recently active users beyond this are dropped (~0.5 KB each at dim 128).
+PERSONALIZATION_MAX_USERS: int = int(os.getenv("PERSONALIZATION_MAX_USERS", "50000"))
+PERSONALIZATION_HALF_LIFE_SECONDS: float = float(
+    os.getenv("PERSONALIZATION_HALF_LIFE_SECONDS", str(14 * 86400))
+)
+# Each API worker tails the user-events topic (no consumer group) so every
+# worker's vectors see every event, not just the ones POSTed to it. With the
+# feed on, POSTed events are recorded only when they arrive through it.
+PERSONALIZATION_FEED_ENABLED: bool = os.getenv("PERSONALIZATION_FEED_ENABLED", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+PERSONALIZATION_SNAPSHOT_PATH: str = os.getenv("PERSONALIZATION_SNAPSHOT_PATH", "./data/affinity.npz")
+# The affinity consumer rewrites the snapshot after this many events.
+PERSONALIZATION_SNAPSHOT_EVERY: int = int(os.getenv("PERSONALIZATION_SNAPSHOT_EVERY", "1000"))
+
+# ---------- Admission control (core/admission.py) ----------
+# Full (LLM-routed) searches in flight per worker; beyond the gateway's slots
+# they'd only queue on the LLM.
+ADMISSION_MAX_IN_FLIGHT: int = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", str(LLM_MAX_CONCURRENCY * 2)))
+ADMISSION_MAX_QUEUE: int = int(os.getenv("ADMISSION_MAX_QUEUE", "50"))
+# Longest a request may wait for a full slot before degrading / 503.
+ADMISSION_MAX_QUEUE_DELAY_SECONDS: float = float(os.getenv("ADMISSION_MAX_QUEUE_DELAY_SECONDS", "1.0"))
+# Degraded searches (no LLM routing: cached plan or generic fallback) in
+# flight per worker; 0 disables degraded mode.
+ADMISSION_DEGRADED_MAX_IN_FLIGHT: int = int(os.getenv("ADMISSION_DEGRADED_MAX_IN_FLIGHT", "100"))
+# How often an in-flight search checks whether its client went away.
+DISCONNECT_POLL_SECONDS: float = float(os.getenv("DISCONNECT_POLL_SECONDS", "0.25"))
+
+# ---------- Request deadlines (core/deadline.py) ----------
+# End-to-end budget per search; each stage (admission, LLM gateway + call,
+# downstream HTTP) uses what is left. Callers can send a shorter budget in
+# DEADLINE_HEADER (milliseconds); it is forwarded downstream the same way.
+REQUEST_DEADLINE_SECONDS: float = float(os.getenv("REQUEST_DEADLINE_SECONDS", "10"))
+REQUEST_DEADLINE_MAX_SECONDS: float = float(os.getenv("REQUEST_DEADLINE_MAX_SECONDS", "30"))
+DEADLINE_HEADER: str = os.getenv("DEADLINE_HEADER", "X-Request-Timeout-Ms")
@@ -0,0 +1,56 @@
+import logging
+import threading
+from typing import Any, Optional
+
+import config
+from consumers.feed import run_feed
+from core.personalization import AffinityStore, event_fields, get_affinity_store
+
+logger = logging.getLogger(__name__)
+
+
+def consume_user_affinities(
+    store: Optional[AffinityStore] = None,
+    *,
+    group_id: Optional[str] = "affinity-group-1",
+    snapshot_every: Optional[int] = None,
+    stop: Optional[threading.Event] = None,
+):
+    """
+    Fold 'dev.amazon-clone.user-events' into the in-memory affinity store
+    used for re-ranking.
+
+    - As a standalone consumer (main.py): committed offsets under
+      ``group_id``; the snapshot (with its feed offsets) is rewritten every
+      ``snapshot_every`` events, so a restart resumes from the snapshot
+      without losing events.
+    - Inside an API worker: ``group_id=None`` (every worker sees every
+      event), ``snapshot_every=0`` and a ``stop`` event from the lifespan.
+      The feed resumes from the offsets in the loaded snapshot, so events
+      since it was written are replayed, not lost.
+
+    See ``consumers.feed.run_feed``.
+    """
+    if store is None:
+        store = get_affinity_store()
+    if snapshot_every is None:
+        snapshot_every = config.PERSONALIZATION_SNAPSHOT_EVERY
+
+    def apply(message: Any) -> bool:
+        try:
+            store.record_event(**event_fields(message.value))
+        except (AttributeError, TypeError, ValueError):
+            logger.warning("Skipping malformed user event: %r", message.value)
+            return False
+        return True
+
+    run_feed(
+        config.USER_EVENTS_TOPIC,
+        apply,
+        label="affinity",
+        group_id=group_id,
+        snapshot=lambda offsets: store.save_snapshot(config.PERSONALIZATION_SNAPSHOT_PATH, offsets=offsets),
+        snapshot_every=snapshot_every,
+        start_offsets=store.feed_offsets,
+        stop=stop,
+    )
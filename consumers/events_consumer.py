@@ -4,11 +4,11 @@ import json
 from langchain_ollama.chat_models import ChatOllama
 from langchain_core.prompts import ChatPromptTemplate
 
-from core.llm import get_default_chat_model
+from core.llm import get_chat_model
 
 def consume_user_events():
 
-    llm = get_default_chat_model()
+    llm = get_chat_model("summarizer")
 
     prompt = ChatPromptTemplate.from_messages(
         [
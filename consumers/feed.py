@@ -0,0 +1,92 @@
+from kafka import KafkaConsumer, TopicPartition
+import json
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+def run_feed(
+    topic: str,
+    handle: Callable[[Any], bool],
+    *,
+    label: str,
+    group_id: Optional[str],
+    snapshot: Optional[Callable[[Dict[int, int]], None]] = None,
+    snapshot_every: int = 0,
+    start_offsets: Optional[Dict[int, int]] = None,
+    stop: Optional[threading.Event] = None,
+):
+    """
+    Consume loop shared by the snapshotting feeds (products, typeahead,
+    affinity). ``handle(message)`` applies one record and returns False if it
+    was skipped.
+
+    - Standalone (``group_id`` set): resumes from the group's committed
+      offsets. Every ``snapshot_every`` applied records it calls
+      ``snapshot(offsets)`` with the next offset per partition, then commits
+      those offsets, so the snapshot and the group never disagree and a
+      crash replays records instead of dropping them.
+    - API worker (``group_id=None``): every partition is assigned and
+      seeked to ``start_offsets``, the offsets stored in the snapshot the
+      worker loaded, so records after that snapshot are replayed. Without
+      snapshot offsets (no snapshot yet) it starts at the end.
+    - Returns once ``stop`` is set (checked at least every second).
+    """
+    common = dict(
+        bootstrap_servers=config.KAFKA_BOOTSTRAP_SERVERS.split(","),
+        group_id=group_id,
+        # If a stored offset has been deleted by retention, take what is left.
+        auto_offset_reset="earliest",
+        # Offsets are committed after each snapshot instead.
+        enable_auto_commit=False,
+        # Wake up regularly so a stop request is noticed.
+        consumer_timeout_ms=1000,
+        value_deserializer=lambda m: json.loads(m.decode("utf-8")),
+    )
+    if group_id:
+        consumer = KafkaConsumer(topic, **common)
+    else:
+        consumer = KafkaConsumer(**common)
+        partitions = [TopicPartition(topic, p) for p in sorted(consumer.partitions_for_topic(topic) or ())]
+        consumer.assign(partitions)
+        if start_offsets is None:
+            consumer.seek_to_end()
+        else:
+            for tp in partitions:
+                if tp.partition in start_offsets:
+                    consumer.seek(tp, start_offsets[tp.partition])
+                else:
+                    # Partition added after the snapshot: all of it is new.
+                    consumer.seek_to_beginning(tp)
+
+    print(f"Consumer is listening for messages on '{topic}' ({label})...")
+
+    positions: Dict[int, int] = {}
+    pending = 0
+
+    def _snapshot() -> None:
+        offsets = {tp.partition: consumer.position(tp) for tp in consumer.assignment()}
+        offsets.update(positions)
+        snapshot(offsets)
+        if group_id:
+            consumer.commit()
+
+    try:
+        while stop is None or not stop.is_set():
+            for message in consumer:
+                positions[message.partition] = message.offset + 1
+                if handle(message):
+                    pending += 1
+                if snapshot is not None and snapshot_every and pending >= snapshot_every:
+                    _snapshot()
+                    pending = 0
+                if stop is not None and stop.is_set():
+                    break
+    finally:
+        if snapshot is not None and snapshot_every and pending:
+            _snapshot()
+        consumer.close()
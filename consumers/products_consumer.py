@@ -0,0 +1,57 @@
+import logging
+import threading
+from typing import Any, Optional
+
+import config
+from consumers.feed import run_feed
+from core.product_search import ProductSearchEngine, get_product_search
+
+logger = logging.getLogger(__name__)
+
+
+def consume_product_changes(
+    engine: Optional[ProductSearchEngine] = None,
+    *,
+    group_id: Optional[str] = "products-agent-group-1",
+    snapshot_every: Optional[int] = None,
+    stop: Optional[threading.Event] = None,
+):
+    """
+    Apply product-change messages ({"op": "upsert"|"delete", ...}) to the
+    local search engine.
+
+    - As a standalone consumer (main.py): committed offsets under
+      ``group_id`` and the catalog snapshot (with its feed offsets) is
+      rewritten every ``snapshot_every`` changes, so API workers start from
+      a fresh catalog.
+    - Inside an API worker: ``group_id=None`` (every worker sees every
+      change), ``snapshot_every=0`` and a ``stop`` event from the lifespan.
+      The feed resumes from the offsets in the loaded snapshot, so changes
+      made since it was written are replayed, not lost.
+
+    See ``consumers.feed.run_feed``.
+    """
+    if engine is None:
+        # Not `engine or ...`: an empty engine is falsy (__len__).
+        engine = get_product_search()
+    if snapshot_every is None:
+        snapshot_every = config.PRODUCT_SNAPSHOT_EVERY
+
+    def apply(message: Any) -> bool:
+        try:
+            engine.apply_change(message.value)
+        except (KeyError, TypeError, ValueError):
+            logger.warning("Skipping malformed product change: %r", message.value)
+            return False
+        return True
+
+    run_feed(
+        config.PRODUCT_CHANGES_TOPIC,
+        apply,
+        label="products",
+        group_id=group_id,
+        snapshot=lambda offsets: engine.save_snapshot(config.PRODUCT_CATALOG_PATH, offsets=offsets),
+        snapshot_every=snapshot_every,
+        start_offsets=engine.feed_offsets,
+        stop=stop,
+    )
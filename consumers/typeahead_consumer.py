@@ -0,0 +1,77 @@
+import logging
+import threading
+from typing import Any, Optional
+
+import config
+from consumers.feed import run_feed
+from core.typeahead import TypeaheadIndex, get_typeahead
+
+logger = logging.getLogger(__name__)
+
+
+def _search_text(value: Any) -> Optional[str]:
+    """
+    The query string of a user-searches message. Accepts a bare string,
+    {"query": ...} / {"searchQuery": ...} / {"term": ...}, or the same
+    wrapped as {"topic": ..., "message": {...}}.
+    """
+    if isinstance(value, str):
+        return value
+    if not isinstance(value, dict):
+        return None
+    for key in ("query", "searchQuery", "term"):
+        if isinstance(value.get(key), str):
+            return value[key]
+    if isinstance(value.get("message"), dict):
+        return _search_text(value["message"])
+    return None
+
+
+def consume_search_suggestions(
+    index: Optional[TypeaheadIndex] = None,
+    *,
+    group_id: Optional[str] = "typeahead-group-1",
+    snapshot_every: Optional[int] = None,
+    stop: Optional[threading.Event] = None,
+):
+    """
+    Feed 'dev.amazon-clone.user-searches' into the typeahead index, weighted
+    by the message timestamp so replays decay correctly.
+
+    - As a standalone consumer (main.py): committed offsets under
+      ``group_id``; the snapshot (with its feed offsets) is rewritten every
+      ``snapshot_every`` searches, so API workers start from fresh
+      suggestions.
+    - Inside an API worker: ``group_id=None`` (every worker sees every
+      search), ``snapshot_every=0`` and a ``stop`` event from the lifespan.
+      The feed resumes from the offsets in the loaded snapshot, so searches
+      made since it was written are replayed, not lost.
+
+    See ``consumers.feed.run_feed``.
+    """
+    if index is None:
+        # Not `index or ...`: an empty index is falsy (__len__).
+        index = get_typeahead()
+    if snapshot_every is None:
+        snapshot_every = config.TYPEAHEAD_SNAPSHOT_EVERY
+
+    def apply(message: Any) -> bool:
+        text = _search_text(message.value)
+        if not text:
+            logger.debug("No query in user-searches message: %r", message.value)
+            return False
+        # Kafka record timestamps are epoch milliseconds.
+        ts = message.timestamp / 1000.0 if message.timestamp and message.timestamp > 0 else None
+        index.add(text, ts=ts)
+        return True
+
+    run_feed(
+        config.USER_SEARCHES_TOPIC,
+        apply,
+        label="typeahead",
+        group_id=group_id,
+        snapshot=lambda offsets: index.save_snapshot(config.TYPEAHEAD_SNAPSHOT_PATH, offsets=offsets),
+        snapshot_every=snapshot_every,
+        start_offsets=index.feed_offsets,
+        stop=stop,
+    )
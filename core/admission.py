@@ -0,0 +1,170 @@
+# core/admission.py
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+
+from core import deadline
+from core.metrics import ADMISSION_QUEUE_SECONDS, ADMISSIONS
+
+FULL = "full"
+DEGRADED = "degraded"
+
+
+class Overloaded(RuntimeError):
+    """
+    Raised when a request can't be admitted; ``retry_after`` (seconds) is
+    the controller's estimate of when capacity frees up.
+    """
+
+    def __init__(self, retry_after: float) -> None:
+        super().__init__(f"Over capacity; retry after {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Per-worker admission control for the search endpoint (one event loop).
+
+    - At most ``max_in_flight`` full requests (LLM routing) run at once.
+    - Over that, a request waits in a FIFO queue only if the estimated
+      queueing delay ((queued + 1) / max_in_flight x service-time EMA) fits
+      in ``max_queue_delay``, and for at most that long.
+    - Otherwise it is admitted in *degraded* mode (no LLM routing: cached
+      plan or generic fallback) while fewer than ``degraded_max_in_flight``
+      degraded requests run; 0 disables degraded mode.
+    - Otherwise ``Overloaded`` is raised and the API answers 503 with
+      Retry-After, before any work is done.
+
+    Shedding early keeps admitted requests inside their latency budget, so
+    throughput stays at capacity instead of collapsing into timeouts.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_in_flight: int = 8,
+        max_queue: int = 50,
+        max_queue_delay: float = 1.0,
+        degraded_max_in_flight: int = 100,
+    ) -> None:
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_queue_delay = max_queue_delay
+        self.degraded_max_in_flight = degraded_max_in_flight
+
+        self._in_flight = 0
+        self._degraded_in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._service_ema: Optional[float] = None
+        self._queue_ema = 0.0
+
+    # ---------- estimates ----------
+
+    def expected_wait(self) -> float:
+        """Seconds a new full request would queue, from the service-time EMA."""
+        if self._in_flight < self.max_in_flight and not self._waiters:
+            return 0.0
+        service = self._service_ema or 0.0
+        return (len(self._waiters) + 1) / self.max_in_flight * service
+
+    # ---------- acquire / release ----------
+
+    async def _acquire(self) -> str:
+        if self._in_flight < self.max_in_flight and not self._waiters:
+            self._in_flight += 1
+            return FULL
+
+        wait = self.expected_wait()
+        if len(self._waiters) < self.max_queue and wait <= self.max_queue_delay:
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.append(future)
+            t0 = time.monotonic()
+            try:
+                # Never queue past the request's own deadline.
+                await asyncio.wait_for(
+                    asyncio.shield(future), deadline.timeout_for(self.max_queue_delay)
+                )
+            except asyncio.TimeoutError:
+                pass
+            except asyncio.CancelledError:
+                self._abandon(future)
+                raise
+            if future.done() and not future.cancelled():
+                # The slot was handed over by _release (possibly as we timed out).
+                self._record_queue_time(time.monotonic() - t0)
+                return FULL
+            self._abandon(future)
+            self._record_queue_time(time.monotonic() - t0)
+
+        if self._degraded_in_flight < self.degraded_max_in_flight:
+            self._degraded_in_flight += 1
+            return DEGRADED
+
+        raise Overloaded(retry_after=max(1.0, math.ceil(self.expected_wait())))
+
+    def _abandon(self, future: asyncio.Future) -> None:
+        if future.done() and not future.cancelled():
+            # Granted concurrently with the timeout/cancel: give the slot back.
+            self._release_full()
+            return
+        future.cancel()
+        try:
+            self._waiters.remove(future)
+        except ValueError:
+            pass
+
+    def _release_full(self) -> None:
+        """Hand the slot to the oldest live waiter, or free it."""
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self._in_flight -= 1
+
+    def _record_queue_time(self, seconds: float) -> None:
+        self._queue_ema = 0.8 * self._queue_ema + 0.2 * seconds
+        ADMISSION_QUEUE_SECONDS.observe(seconds)
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[str]:
+        """
+        Hold an admission for the duration of the block; yields FULL or
+        DEGRADED. Raises ``Overloaded`` if neither is available.
+
+            async with admission.admit() as mode:
+                ...
+        """
+        try:
+            mode = await self._acquire()
+        except Overloaded:
+            ADMISSIONS.inc(decision="rejected")
+            raise
+        ADMISSIONS.inc(decision=mode)
+        started = time.monotonic()
+        try:
+            yield mode
+        finally:
+            if mode == FULL:
+                elapsed = time.monotonic() - started
+                self._service_ema = (
+                    elapsed if self._service_ema is None else 0.8 * self._service_ema + 0.2 * elapsed
+                )
+                self._release_full()
+            else:
+                self._degraded_in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self._in_flight,
+            "degraded_in_flight": self._degraded_in_flight,
+            "queued": sum(1 for f in self._waiters if not f.done()),
+            "service_time_ema": self._service_ema,
+            "queue_time_ema": self._queue_ema,
+            "expected_wait": self.expected_wait(),
+        }
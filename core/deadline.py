@@ -0,0 +1,105 @@
+# core/deadline.py
+from __future__ import annotations
+
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Dict, Iterator, Optional, TypeVar
+
+import config
+
+T = TypeVar("T")
+
+# Absolute deadline (time.monotonic()) of the request being served, if any.
+# Context variables follow the request into tasks it spawns and into
+# LangChain runnables, so every stage sees the same budget.
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request's time budget ran out before this stage could finish."""
+
+
+def request_budget(header_value: Optional[str] = None) -> float:
+    """
+    Seconds this request may take: the caller's ``DEADLINE_HEADER``
+    (milliseconds) if present and valid, else REQUEST_DEADLINE_SECONDS;
+    capped at REQUEST_DEADLINE_MAX_SECONDS.
+    """
+    budget = config.REQUEST_DEADLINE_SECONDS
+    if header_value:
+        try:
+            budget = float(header_value) / 1000.0
+        except ValueError:
+            pass
+    return max(0.0, min(budget, config.REQUEST_DEADLINE_MAX_SECONDS))
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[Optional[float]]:
+    """
+    Run the block with a deadline ``seconds`` from now, never later than an
+    enclosing one. ``None`` keeps the enclosing deadline (if any).
+    """
+    current = _deadline.get()
+    deadline = current
+    if seconds is not None:
+        candidate = time.monotonic() + seconds
+        deadline = candidate if current is None else min(current, candidate)
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
+
+
+def current_deadline() -> Optional[float]:
+    return _deadline.get()
+
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current budget (>= 0), or None without a deadline."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def timeout_for(default: float) -> float:
+    """A stage's own timeout, shortened to the remaining budget."""
+    left = remaining()
+    return default if left is None else min(default, left)
+
+
+def check(stage: str = "") -> None:
+    """Cooperative cancellation point: raise if the budget is already spent."""
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded(f"Deadline exceeded before {stage or 'stage'}")
+
+
+def propagation_headers() -> Dict[str, str]:
+    """Remaining budget for downstream services, in DEADLINE_HEADER."""
+    left = remaining()
+    if left is None:
+        return {}
+    return {config.DEADLINE_HEADER: str(int(left * 1000))}
+
+
+async def within_deadline(aw: Awaitable[T], stage: str = "") -> T:
+    """
+    Await ``aw`` for at most the remaining budget; on expiry it is cancelled
+    (closing its HTTP requests / gateway slots) and DeadlineExceeded raised.
+    """
+    left = remaining()
+    if left is None:
+        return await aw
+    if left <= 0:
+        if asyncio.iscoroutine(aw):
+            aw.close()
+        raise DeadlineExceeded(f"Deadline exceeded before {stage or 'stage'}")
+    try:
+        return await asyncio.wait_for(aw, left)
+    except asyncio.TimeoutError as exc:
+        raise DeadlineExceeded(f"Deadline exceeded during {stage or 'stage'}") from exc
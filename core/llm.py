@@ -1,26 +1,587 @@
 # core/llm.py
 from __future__ import annotations
 
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from enum import IntEnum
 from functools import lru_cache
-from typing import Any
+from typing import Any, AsyncIterator, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
 
+import httpx
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
 from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
 from langchain_ollama.chat_models import ChatOllama
 
 import config
+from core.deadline import current_deadline, within_deadline
+from core.llm_cache import TieredLLMCache
+from core.metrics import LLM_CALL_SECONDS, LLM_QUEUE_SECONDS, LLM_TOKENS
+from core.tracing import tracing_callback
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Lower value = served first."""
+
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+class GatewayRejected(RuntimeError):
+    """Raised when a call can't be admitted before its deadline."""
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    model: str = field(compare=False)
+    enqueued_at: float = field(compare=False)
+    event: Optional[threading.Event] = field(default=None, compare=False)
+    future: Optional[asyncio.Future] = field(default=None, compare=False)
+    loop: Optional[asyncio.AbstractEventLoop] = field(default=None, compare=False)
+    granted: bool = field(default=False, compare=False)
+
+
+class LLMGateway:
+    """
+    Process-wide admission point for LLM calls.
+
+    - Global and per-model concurrency caps (match per-model caps to the
+      backend's parallelism, e.g. OLLAMA_NUM_PARALLEL, so Ollama batches the
+      admitted requests server-side).
+    - Priority classes: waiting INTERACTIVE calls are always granted before
+      BACKGROUND ones, and BACKGROUND calls may only hold ``background_limit``
+      slots, so consumers catching up on lag can't occupy every slot.
+    - Deadline-aware admission: a call whose estimated queue wait + service
+      time would overrun its deadline is rejected immediately.
+    - Queue-time metrics per priority (see ``stats``).
+
+    Works for both sync (Kafka consumer threads) and async (FastAPI) callers.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_concurrency: int = 4,
+        model_limits: Optional[Dict[str, int]] = None,
+        default_model_limit: Optional[int] = None,
+        background_limit: Optional[int] = None,
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.model_limits = dict(model_limits or {})
+        self.default_model_limit = default_model_limit or max_concurrency
+        self.background_limit = (
+            background_limit if background_limit is not None else max(1, max_concurrency - 1)
+        )
+
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self._waiters: List[_Waiter] = []
+        self._in_flight = 0
+        self._in_flight_by_model: Dict[str, int] = {}
+        self._in_flight_by_priority: Dict[int, int] = {p: 0 for p in Priority}
+        # (model, priority) -> queued waiters, for per-model wait estimates.
+        self._queued_by_model: Dict[Tuple[str, int], int] = {}
+        # EMA of observed service time per model, for admission estimates.
+        self._service_ema: Dict[str, float] = {}
+        self._queue_times: Dict[int, Deque[float]] = {p: deque(maxlen=2048) for p in Priority}
+        self._counters: Dict[str, int] = {"admitted": 0, "rejected": 0, "timed_out": 0, "cancelled": 0}
+
+    # ---------- capacity ----------
+
+    def _model_limit(self, model: str) -> int:
+        return self.model_limits.get(model, self.default_model_limit)
+
+    def _has_capacity(self, model: str, priority: int) -> bool:
+        if self._in_flight >= self.max_concurrency:
+            return False
+        if self._in_flight_by_model.get(model, 0) >= self._model_limit(model):
+            return False
+        if priority != Priority.INTERACTIVE and (
+            self._in_flight_by_priority[priority] >= self.background_limit
+        ):
+            return False
+        return True
+
+    def _take(self, model: str, priority: int) -> None:
+        self._in_flight += 1
+        self._in_flight_by_model[model] = self._in_flight_by_model.get(model, 0) + 1
+        self._in_flight_by_priority[priority] += 1
+        self._counters["admitted"] += 1
+
+    def _unqueue(self, waiter: _Waiter) -> None:
+        key = (waiter.model, waiter.priority)
+        self._queued_by_model[key] -= 1
+        if not self._queued_by_model[key]:
+            del self._queued_by_model[key]
+
+    def _grant_waiters(self) -> None:
+        """Hand freed slots to eligible waiters in priority/FIFO order. Lock held."""
+        if not self._waiters:
+            return
+        remaining: List[_Waiter] = []
+        for waiter in sorted(self._waiters):
+            if self._has_capacity(waiter.model, waiter.priority):
+                self._take(waiter.model, waiter.priority)
+                self._unqueue(waiter)
+                waiter.granted = True
+                if waiter.event is not None:
+                    waiter.event.set()
+                else:
+                    waiter.loop.call_soon_threadsafe(_resolve, waiter.future)
+            else:
+                remaining.append(waiter)
+        heapq.heapify(remaining)
+        self._waiters = remaining
+
+    def _estimate_wait(self, model: str, priority: int) -> float:
+        """
+        Queue wait for one more ``model`` call, from that model's own slots,
+        queue and service time: its waiters at this priority or better drain
+        ``capacity`` at a time. Zero while the model and the gateway both have
+        a free slot. Lock held.
+        """
+        capacity = max(1, min(self.max_concurrency, self._model_limit(model)))
+        if (
+            self._in_flight_by_model.get(model, 0) < capacity
+            and self._in_flight < self.max_concurrency
+        ):
+            return 0.0
+        ahead = sum(
+            n for (m, p), n in self._queued_by_model.items() if m == model and p <= priority
+        )
+        return (ahead // capacity + 1) * self._service_ema.get(model, 0.0)
+
+    # ---------- acquire / release ----------
+
+    def _enqueue(
+        self, model: str, priority: int, deadline: Optional[float], waiter: _Waiter
+    ) -> bool:
+        """
+        Admit now (True) or leave ``waiter`` queued (False). Raises if hopeless.
+
+        Queued waiters that can't use a free slot (e.g. BACKGROUND calls held
+        back by ``background_limit``) never block a call that can: the new
+        waiter goes through the same priority/FIFO grant as everyone else.
+        """
+        with self._lock:
+            if not self._waiters and self._has_capacity(model, priority):
+                self._take(model, priority)
+                return True
+            if deadline is not None:
+                est = self._estimate_wait(model, priority) + self._service_ema.get(model, 0.0)
+                if time.monotonic() + est > deadline:
+                    self._counters["rejected"] += 1
+                    raise GatewayRejected(
+                        f"LLM gateway: estimated {est:.1f}s exceeds remaining deadline for {model}"
+                    )
+            heapq.heappush(self._waiters, waiter)
+            key = (model, waiter.priority)
+            self._queued_by_model[key] = self._queued_by_model.get(key, 0) + 1
+            self._grant_waiters()
+            return waiter.granted
+
+    def _abandon(self, waiter: _Waiter, reason: str = "timed_out") -> None:
+        """Drop a waiter that timed out or was cancelled (``reason`` is the counter)."""
+        with self._lock:
+            self._counters[reason] += 1
+            if waiter.granted:
+                # Granted concurrently with the timeout/cancel: give the slot back.
+                self._release_locked(waiter.model, waiter.priority)
+                return
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                return
+            self._unqueue(waiter)
+            heapq.heapify(self._waiters)
+
+    def _release_locked(self, model: str, priority: int) -> None:
+        self._in_flight -= 1
+        self._in_flight_by_model[model] -= 1
+        self._in_flight_by_priority[priority] -= 1
+        self._grant_waiters()
+
+    def release(self, model: str, priority: int, service_time: Optional[float] = None) -> None:
+        if service_time is not None:
+            LLM_CALL_SECONDS.observe(service_time, model=model, priority=Priority(priority).name.lower())
+        with self._lock:
+            if service_time is not None:
+                prev = self._service_ema.get(model)
+                self._service_ema[model] = (
+                    service_time if prev is None else 0.8 * prev + 0.2 * service_time
+                )
+            self._release_locked(model, priority)
+
+    def _record_queue_time(self, priority: int, seconds: float) -> None:
+        self._queue_times[priority].append(seconds)
+        LLM_QUEUE_SECONDS.observe(seconds, priority=Priority(priority).name.lower())
+
+    @contextmanager
+    def slot_sync(
+        self,
+        model: str,
+        priority: Priority = Priority.BACKGROUND,
+        deadline: Optional[float] = None,
+    ) -> Iterator[None]:
+        """Blocking acquire for sync callers. ``deadline`` is a time.monotonic() value."""
+        t0 = time.monotonic()
+        waiter = _Waiter(int(priority), next(self._seq), model, t0, event=threading.Event())
+        if not self._enqueue(model, priority, deadline, waiter):
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not waiter.event.wait(timeout):
+                self._abandon(waiter)
+                raise GatewayRejected(f"LLM gateway: deadline expired while queued for {model}")
+        started = time.monotonic()
+        self._record_queue_time(priority, started - t0)
+        try:
+            yield
+        finally:
+            self.release(model, priority, time.monotonic() - started)
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        model: str,
+        priority: Priority = Priority.INTERACTIVE,
+        deadline: Optional[float] = None,
+    ) -> AsyncIterator[None]:
+        """Async acquire; waiting never blocks the event loop."""
+        loop = asyncio.get_running_loop()
+        t0 = time.monotonic()
+        waiter = _Waiter(
+            int(priority), next(self._seq), model, t0, future=loop.create_future(), loop=loop
+        )
+        if not self._enqueue(model, priority, deadline, waiter):
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+            except asyncio.TimeoutError:
+                self._abandon(waiter)
+                raise GatewayRejected(f"LLM gateway: deadline expired while queued for {model}")
+            except asyncio.CancelledError:
+                self._abandon(waiter, reason="cancelled")
+                raise
+        started = time.monotonic()
+        self._record_queue_time(priority, started - t0)
+        try:
+            yield
+        finally:
+            self.release(model, priority, time.monotonic() - started)
+
+    # ---------- metrics ----------
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            queue_time = {}
+            for priority, samples in self._queue_times.items():
+                ordered = sorted(samples)
+                queue_time[Priority(priority).name.lower()] = {
+                    "samples": len(ordered),
+                    "p50": ordered[len(ordered) // 2] if ordered else 0.0,
+                    "p99": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] if ordered else 0.0,
+                    "max": ordered[-1] if ordered else 0.0,
+                }
+            queued_by_model: Dict[str, int] = {}
+            for (model, _), n in self._queued_by_model.items():
+                queued_by_model[model] = queued_by_model.get(model, 0) + n
+            return {
+                "in_flight": self._in_flight,
+                "in_flight_by_model": dict(self._in_flight_by_model),
+                "queued": len(self._waiters),
+                "queued_by_model": queued_by_model,
+                "service_time_ema": dict(self._service_ema),
+                "queue_time": queue_time,
+                **self._counters,
+            }
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+_NON_GENERATION_FIELDS = {
+    "cache",
+    "callbacks",
+    "callback_manager",
+    "custom_get_token_ids",
+    "metadata",
+    "rate_limiter",
+    "tags",
+    "verbose",
+    "client_kwargs",
+    "async_client_kwargs",
+    "sync_client_kwargs",
+}
+
+
+def _record_usage(model: str, message: Any) -> None:
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        LLM_TOKENS.inc(usage.get("input_tokens", 0), model=model, kind="prompt")
+        LLM_TOKENS.inc(usage.get("output_tokens", 0), model=model, kind="completion")
+
+
+class GatedChatModel(BaseChatModel):
+    """
+    Chat model wrapper that routes every call of ``inner`` through the gateway.
+
+    It is a regular BaseChatModel, so it composes into chains
+    (``prompt | llm | parser``) exactly like the model it wraps.
+    """
+
+    inner: BaseChatModel
+    gateway: Any
+    model_key: str
+    priority: Priority = Priority.INTERACTIVE
+
+    @property
+    def _llm_type(self) -> str:
+        return f"gated-{self.inner._llm_type}"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        # Feeds the LLM cache key, so it must cover every generation param.
+        # ChatOllama reports none itself; fall back to its declared fields.
+        params = self.inner.model_dump(exclude_none=True, exclude=_NON_GENERATION_FIELDS)
+        params.update(self.inner._identifying_params)
+        params["_inner_type"] = self.inner._llm_type
+        return params
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        with self.gateway.slot_sync(self.model_key, self.priority, current_deadline()):
+            result = self.inner._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        for generation in result.generations:
+            _record_usage(self.model_key, generation.message)
+        return result
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        # The request deadline bounds both the gateway wait and the call.
+        async with self.gateway.slot(self.model_key, self.priority, current_deadline()):
+            result = await within_deadline(
+                self.inner._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs),
+                stage=f"LLM call ({self.model_key})",
+            )
+        for generation in result.generations:
+            _record_usage(self.model_key, generation.message)
+        return result
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        with self.gateway.slot_sync(self.model_key, self.priority, current_deadline()):
+            for chunk in self.inner._stream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                _record_usage(self.model_key, chunk.message)
+                yield chunk
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        async with self.gateway.slot(self.model_key, self.priority, current_deadline()):
+            stream = self.inner._astream(messages, stop=stop, run_manager=run_manager, **kwargs)
+            try:
+                while True:
+                    chunk = await within_deadline(
+                        stream.__anext__(), stage=f"LLM stream ({self.model_key})"
+                    )
+                    _record_usage(self.model_key, chunk.message)
+                    yield chunk
+            except StopAsyncIteration:
+                return
+            finally:
+                await stream.aclose()
+
+
+@lru_cache()
+def get_llm_gateway() -> LLMGateway:
+    """
+    The process-wide gateway. Limits come from config.py.
+    """
+    return LLMGateway(
+        max_concurrency=config.LLM_MAX_CONCURRENCY,
+        model_limits=config.LLM_MODEL_CONCURRENCY,
+        background_limit=config.LLM_BACKGROUND_MAX_CONCURRENCY,
+    )
+
+
+@dataclass(frozen=True)
+class TaskProfile:
+    """
+    Model settings for one kind of LLM work (see config.LLM_TASKS).
+    """
+
+    task: str
+    model: str
+    num_ctx: int
+    num_predict: int
+    keep_alive: str
+    temperature: float
+    cache: bool = False
+    priority: Priority = Priority.INTERACTIVE
+
+
+# Tasks that never serve a waiting user default to background priority.
+_BACKGROUND_TASKS = {"summarizer"}
+
+
+def get_task_profile(task: str) -> TaskProfile:
+    try:
+        settings = config.LLM_TASKS[task]
+    except KeyError:
+        raise ValueError(
+            f"Unknown LLM task {task!r}; expected one of {sorted(config.LLM_TASKS)}"
+        ) from None
+    return TaskProfile(
+        task=task,
+        priority=Priority.BACKGROUND if task in _BACKGROUND_TASKS else Priority.INTERACTIVE,
+        **settings,
+    )
+
+
+def build_ollama_model(profile: TaskProfile) -> ChatOllama:
+    """
+    Bare ChatOllama for a profile (no gateway); also used by benchmarks.
+    """
+    return ChatOllama(
+        model=profile.model,
+        temperature=profile.temperature,
+        num_ctx=profile.num_ctx,
+        num_predict=profile.num_predict,
+        keep_alive=profile.keep_alive,
+        base_url=config.OLLAMA_BASE_URL,
+    )
+
+
+@lru_cache()
+def get_llm_cache() -> TieredLLMCache:
+    """
+    The process-wide exact-match response cache (memory LRU + SQLite).
+    """
+    return TieredLLMCache(
+        config.LLM_CACHE_PATH,
+        ttl_seconds=config.LLM_CACHE_TTL_SECONDS,
+        max_entries=config.LLM_CACHE_MAX_ENTRIES,
+        memory_entries=config.LLM_CACHE_MEMORY_ENTRIES,
+    )
+
+
+@lru_cache()
+def get_chat_model(task: str, *, priority: Optional[Priority] = None) -> BaseChatModel:
+    """
+    Chat model for a registered task: "router", "summarizer", "rag_answer"
+    or "recommendation".
+
+    - Each task has its own model, context length, num_predict, keep_alive
+      and temperature (config.LLM_TASKS), so routing can run on a tiny
+      model while answers use the larger one.
+    - Calls go through the shared LLMGateway; per-model caps apply to the
+      task's model.
+    - Tasks with ``cache`` enabled answer repeated (model, params, prompt)
+      calls from get_llm_cache() without taking a gateway slot.
+    - Cached per (task, priority).
+    """
+    profile = get_task_profile(task)
+    return GatedChatModel(
+        inner=build_ollama_model(profile),
+        gateway=get_llm_gateway(),
+        model_key=profile.model,
+        priority=profile.priority if priority is None else priority,
+        cache=get_llm_cache() if profile.cache else False,
+        callbacks=[tracing_callback],
+    )
 
 
 @lru_cache()
-def get_default_chat_model(*, temperature: float = 0.1) -> BaseChatModel:
+def get_default_chat_model(
+    *,
+    temperature: float = 0.1,
+    priority: Priority = Priority.INTERACTIVE,
+    cache: bool = False,
+) -> BaseChatModel:
     """
     Central factory for the chat model used by all agents.
 
     - Uses Ollama via langchain-ollama.
     - Reads MODEL_NAME and OLLAMA_BASE_URL from config.py.
+    - Every call goes through the shared LLMGateway with the given priority
+      (API paths: INTERACTIVE, Kafka consumers: BACKGROUND).
+    - ``cache=True`` serves repeated identical calls from get_llm_cache().
     - Cached so we don't re-instantiate the model per request.
     """
-    return ChatOllama(
+    inner = ChatOllama(
         model=config.MODEL_NAME,
         temperature=temperature,
         base_url=config.OLLAMA_BASE_URL,
     )
+    return GatedChatModel(
+        inner=inner,
+        gateway=get_llm_gateway(),
+        model_key=config.MODEL_NAME,
+        priority=priority,
+        cache=get_llm_cache() if cache else False,
+        callbacks=[tracing_callback],
+    )
+
+
+async def preload_models(
+    client: httpx.AsyncClient,
+    tasks: Optional[Iterable[str]] = None,
+) -> Dict[str, float]:
+    """
+    Load each task model into Ollama memory and (re)arm its keep_alive.
+
+    An empty /api/generate request only loads the model, so this is cheap
+    once it is resident; the API calls it at startup and then periodically
+    as a keep-alive ping. Returns seconds taken per model.
+    """
+    keep_alive: Dict[str, str] = {}
+    for task in tasks or config.LLM_TASKS:
+        profile = get_task_profile(task)
+        keep_alive.setdefault(profile.model, profile.keep_alive)
+
+    async def _load(model: str) -> float:
+        t0 = time.perf_counter()
+        resp = await client.post(
+            f"{config.OLLAMA_BASE_URL}/api/generate",
+            json={"model": model, "keep_alive": keep_alive[model]},
+        )
+        resp.raise_for_status()
+        return time.perf_counter() - t0
+
+    durations = await asyncio.gather(*(_load(model) for model in keep_alive))
+    return dict(zip(keep_alive, durations))
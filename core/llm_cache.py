@@ -0,0 +1,85 @@
+# core/llm_cache.py
+from __future__ import annotations
+
+import hashlib
+import logging
+from typing import Any, Optional
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+
+from core.shared_cache import SharedCache
+
+logger = logging.getLogger(__name__)
+
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    """
+    ``llm_string`` is LangChain's serialization of the model + params
+    (model name, temperature, num_predict, stop, ...), ``prompt`` the
+    rendered messages, so the key covers (model, params, prompt).
+    """
+    return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+
+class TieredLLMCache(BaseCache):
+    """
+    Exact-match LLM response cache: in-process LRU in front of SQLite.
+
+    - Backed by SharedCache (namespace "llm"), so every API worker on the
+      box shares one set of entries and hit rates don't divide by workers.
+    - Memory tier: ``memory_entries`` most recently used responses. Entries
+      for a key never change, so they live as long as the TTL.
+    - SQLite tier: survives restarts/deploys; capped at ``max_entries``
+      (least recently used rows are evicted) and ``ttl_seconds``.
+    - Thread-safe; the async methods inherited from BaseCache run the sync
+      ones in an executor (SQLite calls are sub-millisecond).
+
+    Plug into a chat model with ``ChatOllama(..., cache=TieredLLMCache(...))``.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        *,
+        ttl_seconds: Optional[float] = 86400.0,
+        max_entries: int = 10_000,
+        memory_entries: int = 1_000,
+    ) -> None:
+        self.store = SharedCache(
+            "llm",
+            path=path,
+            ttl_seconds=ttl_seconds,
+            max_entries=max_entries,
+            front_entries=memory_entries,
+            front_ttl_seconds=ttl_seconds,
+        )
+
+    @property
+    def hits(self) -> int:
+        return self.store.hits
+
+    @property
+    def misses(self) -> int:
+        return self.store.misses
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = cache_key(prompt, llm_string)
+        raw = self.store.get(key)
+        if raw is None:
+            return None
+        try:
+            return [loads(item) for item in loads(raw)]
+        except Exception:
+            logger.warning("Dropping undecodable LLM cache entry %s", key)
+            self.store.delete(key)
+            return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        self.store.set(cache_key(prompt, llm_string), dumps([dumps(gen) for gen in return_val]))
+
+    def clear(self, **kwargs: Any) -> None:
+        self.store.clear()
+
+    def stats(self) -> dict:
+        return self.store.stats()
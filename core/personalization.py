@@ -0,0 +1,337 @@
+# core/personalization.py
+from __future__ import annotations
+
+import logging
+import math
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# How much one event says about a user's taste.
+EVENT_WEIGHTS: Dict[str, float] = {
+    "search": 0.5,
+    "view": 1.0,
+    "add_to_cart": 3.0,
+    "purchase": 5.0,
+}
+
+# Product fields that become affinity features ("category:jeans", "color:black", ...).
+FEATURE_FIELDS: Tuple[str, ...] = ("category", "color", "size", "brand")
+
+
+def _values(raw: Any) -> List[str]:
+    if raw is None or raw == "":
+        return []
+    if isinstance(raw, (list, tuple, set)):
+        return [str(v).strip().lower() for v in raw if str(v).strip()]
+    return [str(raw).strip().lower()]
+
+
+@lru_cache(maxsize=65_536)
+def _feature_bucket(feature: str, dim: int) -> int:
+    return zlib.crc32(feature.encode("utf-8")) % dim
+
+
+class AffinityStore:
+    """
+    Per-user category/attribute affinity vectors and per-item popularity,
+    for re-ranking search candidates.
+
+    - Features are hashed into ``dim`` buckets (crc32 of "field:value"), so
+      there is no vocabulary to maintain and vectors have a fixed size.
+    - User vectors decay with ``half_life_seconds``: an event first scales
+      the vector by the elapsed decay, then adds its weight to the event's
+      features. Updates are O(features), never O(users).
+    - Bounded memory: at most ``max_users`` vectors (least recently updated
+      evicted) and ``max_items`` popularity entries.
+    - ``rerank`` builds a (candidates x features) matrix and scores every
+      candidate with one matrix-vector product: relevance, affinity (cosine),
+      popularity and recency, combined with ``weights``.
+    - Thread-safe (events may arrive from a feed thread).
+    """
+
+    def __init__(
+        self,
+        *,
+        dim: int = 128,
+        max_users: int = 50_000,
+        max_items: int = 200_000,
+        half_life_seconds: float = 14 * 86400.0,
+        recency_seconds: float = 86400.0,
+        weights: Sequence[float] = (1.0, 0.6, 0.2, 0.1),
+    ) -> None:
+        self.dim = dim
+        self.max_users = max_users
+        self.max_items = max_items
+        self.half_life_seconds = half_life_seconds
+        self.recency_seconds = recency_seconds
+        # relevance, affinity, popularity, recency
+        self.weights = np.asarray(weights, dtype=np.float32)
+
+        self._lock = threading.Lock()
+        # user_id -> (vector, last update ts)
+        self._users: "OrderedDict[str, Tuple[np.ndarray, float]]" = OrderedDict()
+        # product_id -> (decayed interaction count, last interaction ts)
+        self._items: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        # Next user-events offset per partition, from the loaded snapshot.
+        self.feed_offsets: Optional[Dict[int, int]] = None
+
+    # ---------- features ----------
+
+    def _feature_ids(self, item: Dict[str, Any], attributes: Optional[Dict[str, Any]] = None) -> List[int]:
+        features = []
+        for field in FEATURE_FIELDS:
+            raw = item.get(field)
+            if raw:
+                for value in _values(raw):
+                    features.append(_feature_bucket(f"{field}:{value}", self.dim))
+        for key, raw in (attributes or {}).items():
+            for value in _values(raw):
+                features.append(_feature_bucket(f"{str(key).lower()}:{value}", self.dim))
+        return features
+
+    def _decay(self, elapsed: float) -> float:
+        return 0.5 ** (max(0.0, elapsed) / self.half_life_seconds)
+
+    # ---------- updates ----------
+
+    def record_event(
+        self,
+        user_id: Any,
+        event_type: str,
+        *,
+        category: Optional[str] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+        product_id: Any = None,
+        ts: Optional[float] = None,
+    ) -> None:
+        """
+        Fold one user event into the user's vector and the item's popularity.
+        ``attributes`` are extra product facets ({"color": "black", ...}).
+        """
+        now = ts or time.time()
+        weight = EVENT_WEIGHTS.get(event_type, 0.5)
+        features = self._feature_ids({"category": category}, attributes)
+
+        with self._lock:
+            if user_id is not None and features:
+                key = str(user_id)
+                entry = self._users.pop(key, None)
+                if entry is None:
+                    vector, last = np.zeros(self.dim, dtype=np.float32), now
+                else:
+                    vector, last = entry
+                    vector *= self._decay(now - last)
+                # A late event (now < last) is decayed to ``last`` instead,
+                # so the vector's timestamp never moves backwards.
+                np.add.at(vector, features, weight * self._decay(last - now))
+                self._users[key] = (vector, max(last, now))
+                while len(self._users) > self.max_users:
+                    self._users.popitem(last=False)
+
+            if product_id is not None:
+                key = str(product_id)
+                count, last = self._items.pop(key, (0.0, now))
+                self._items[key] = (
+                    count * self._decay(now - last) + weight * self._decay(last - now),
+                    max(last, now),
+                )
+                while len(self._items) > self.max_items:
+                    self._items.popitem(last=False)
+
+    def user_vector(self, user_id: Any) -> Optional[np.ndarray]:
+        """Unit-length affinity vector, or None for unknown users."""
+        with self._lock:
+            entry = self._users.get(str(user_id))
+            if entry is None:
+                return None
+            vector = entry[0].copy()
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm > 0 else None
+
+    # ---------- scoring ----------
+
+    def rerank(
+        self,
+        items: List[Dict[str, Any]],
+        user_id: Any = None,
+        *,
+        score_key: str = "score",
+        id_key: str = "id",
+    ) -> List[Dict[str, Any]]:
+        """
+        Re-order candidates for ``user_id``. Each item keeps its fields and
+        gains ``personal_score``. Without a known user or any popularity
+        signal the original order is returned unchanged.
+        """
+        if len(items) < 2:
+            return items
+        user = self.user_vector(user_id) if user_id is not None else None
+        now = time.time()
+
+        n = len(items)
+        rows: List[int] = []
+        cols: List[int] = []
+        for i, item in enumerate(items):
+            ids = self._feature_ids(item)
+            rows.extend([i] * len(ids))
+            cols.extend(ids)
+
+        popularity = np.zeros(n, dtype=np.float32)
+        recency = np.zeros(n, dtype=np.float32)
+        with self._lock:
+            for i, item in enumerate(items):
+                entry = self._items.get(str(item.get(id_key)))
+                if entry is not None:
+                    count, last = entry
+                    popularity[i] = math.log1p(count * self._decay(now - last))
+                    recency[i] = math.exp(-(now - last) / self.recency_seconds)
+        if user is None and not popularity.any():
+            return items
+
+        relevance = np.asarray([float(item.get(score_key) or 0.0) for item in items], dtype=np.float32)
+        features = np.zeros((n, 4), dtype=np.float32)
+        features[:, 0] = relevance / relevance.max() if relevance.max() > 0 else 0.0
+        if user is not None and rows:
+            item_matrix = np.zeros((n, self.dim), dtype=np.float32)
+            np.add.at(item_matrix, (rows, cols), 1.0)
+            norms = np.linalg.norm(item_matrix, axis=1)
+            norms[norms == 0] = 1.0
+            features[:, 1] = (item_matrix @ user) / norms
+        features[:, 2] = popularity / popularity.max() if popularity.max() > 0 else 0.0
+        features[:, 3] = recency
+
+        scores = features @ self.weights
+        order = np.argsort(-scores, kind="stable")
+        return [{**items[i], "personal_score": round(float(scores[i]), 4)} for i in order]
+
+    # ---------- snapshots ----------
+
+    def save_snapshot(self, path: str, offsets: Optional[Dict[int, int]] = None) -> None:
+        """
+        Write users and item popularity to an .npz file (atomic replace).
+        ``offsets`` (next user-events offset per partition) lets a worker
+        resume the feed where the snapshot ends.
+        """
+        with self._lock:
+            user_ids = list(self._users)
+            vectors = (
+                np.stack([v for v, _ in self._users.values()])
+                if user_ids
+                else np.zeros((0, self.dim), dtype=np.float32)
+            )
+            user_ts = np.asarray([t for _, t in self._users.values()], dtype=np.float64)
+            item_ids = list(self._items)
+            item_state = np.asarray(list(self._items.values()), dtype=np.float64).reshape(-1, 2)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f"{path}.tmp.{os.getpid()}.npz"
+        np.savez(
+            tmp,
+            user_ids=np.asarray(user_ids, dtype=str),
+            vectors=vectors,
+            user_ts=user_ts,
+            item_ids=np.asarray(item_ids, dtype=str),
+            item_state=item_state,
+            # (partition, next offset) rows
+            feed_offsets=np.asarray(sorted((offsets or {}).items()), dtype=np.int64).reshape(-1, 2),
+            has_feed_offsets=offsets is not None,
+        )
+        os.replace(tmp, path)
+
+    def load_snapshot(self, path: str) -> None:
+        """Replace users and item popularity with a snapshot (oldest first, so LRU order holds)."""
+        with np.load(path) as state:
+            self.feed_offsets = (
+                {int(p): int(o) for p, o in state["feed_offsets"]}
+                if "has_feed_offsets" in state.files and bool(state["has_feed_offsets"])
+                else None
+            )
+            vectors = state["vectors"]
+            if vectors.shape[1] != self.dim:
+                logger.warning(
+                    "Affinity snapshot dim %d differs from %d; ignoring it", vectors.shape[1], self.dim
+                )
+                return
+            users = OrderedDict(
+                (str(u), (vectors[i].astype(np.float32), float(t)))
+                for i, (u, t) in enumerate(zip(state["user_ids"], state["user_ts"]))
+            )
+            items = OrderedDict(
+                (str(p), (float(c), float(t))) for p, (c, t) in zip(state["item_ids"], state["item_state"])
+            )
+        with self._lock:
+            self._users = users
+            self._items = items
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    @classmethod
+    def from_snapshot(cls, path: str, **kwargs: Any) -> "AffinityStore":
+        """Load a snapshot if one exists; otherwise start empty."""
+        store = cls(**kwargs)
+        if os.path.exists(path):
+            store.load_snapshot(path)
+            logger.info("Loaded affinities for %d users from %s", len(store._users), path)
+        else:
+            logger.warning("Affinity snapshot %s not found; starting empty", path)
+        return store
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"users": len(self._users), "items": len(self._items), "dim": self.dim}
+
+
+def event_fields(event: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Normalize a user event from Next.js / Kafka (camelCase, optionally
+    wrapped as {"topic", "message"}) or the analytics shape (snake_case,
+    attributes under "meta") into ``record_event`` keyword arguments.
+    """
+    if isinstance(event.get("message"), dict):
+        event = {**event, **event["message"]}
+    attributes = dict(event.get("meta") or event.get("attributes") or {})
+    for field in FEATURE_FIELDS[1:]:
+        if event.get(field) is not None:
+            attributes.setdefault(field, event[field])
+    ts = event.get("timestamp")
+    if isinstance(ts, str):
+        try:
+            ts = datetime.fromisoformat(ts.replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            ts = None
+    elif hasattr(ts, "timestamp"):
+        ts = ts.timestamp()
+    return {
+        "user_id": event.get("userId", event.get("user_id")),
+        "event_type": str(event.get("eventType") or event.get("type") or "view").lower(),
+        "category": event.get("categoryName") or event.get("product_category") or event.get("category"),
+        "attributes": attributes,
+        "product_id": event.get("productId", event.get("product_id")),
+        "ts": min(float(ts), time.time()) if isinstance(ts, (int, float)) else None,
+    }
+
+
+@lru_cache()
+def get_affinity_store() -> AffinityStore:
+    """
+    Process-wide store sized from config, restored from its snapshot.
+    """
+    return AffinityStore.from_snapshot(
+        config.PERSONALIZATION_SNAPSHOT_PATH,
+        dim=config.PERSONALIZATION_DIM,
+        max_users=config.PERSONALIZATION_MAX_USERS,
+        half_life_seconds=config.PERSONALIZATION_HALF_LIFE_SECONDS,
+    )
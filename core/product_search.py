@@ -0,0 +1,466 @@
+# core/product_search.py
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+import re
+import threading
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import config
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Facets indexed as exact (lower-cased) values; a product may have several
+# values per facet (e.g. sizes ["30", "32"]).
+FACETS: Tuple[str, ...] = ("category", "color", "size")
+
+# "under 2000", "below $50", "over 100", "above 20"
+_PRICE_RE = re.compile(r"\b(under|below|over|above)\s+\$?(\d+(?:\.\d+)?)\b")
+_SIZE_RE = re.compile(r"\bsize\s+([a-z0-9]+)\b")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _values(raw: Any) -> List[str]:
+    """Facet value(s) of a product field, lower-cased; [] if missing."""
+    if raw is None or raw == "":
+        return []
+    if isinstance(raw, (list, tuple, set)):
+        return [str(v).strip().lower() for v in raw if str(v).strip()]
+    return [str(raw).strip().lower()]
+
+
+def _bits_from_indices(indices: Iterable[int], size: int) -> int:
+    """Bitset (Python int, bit i = doc i) built in one pass instead of N shifts."""
+    buf = bytearray((size + 8) // 8)
+    for i in indices:
+        buf[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buf, "little")
+
+
+def _bits_from_mask(mask: np.ndarray) -> int:
+    """Bitset from a boolean array indexed by slot."""
+    return int.from_bytes(np.packbits(mask, bitorder="little").tobytes(), "little")
+
+
+def _bits_to_mask(bits: int, size: int) -> np.ndarray:
+    """Boolean array (length ``size``) of the slots set in ``bits``."""
+    raw = np.frombuffer(bits.to_bytes(size // 8 + 1, "little"), dtype=np.uint8)
+    return np.unpackbits(raw, bitorder="little")[:size].view(bool)
+
+
+def _bits_to_indices(bits: int) -> np.ndarray:
+    """Doc ids set in ``bits``, ascending."""
+    if not bits:
+        return np.empty(0, dtype=np.int64)
+    raw = np.frombuffer(bits.to_bytes((bits.bit_length() + 7) // 8, "little"), dtype=np.uint8)
+    return np.flatnonzero(np.unpackbits(raw, bitorder="little"))
+
+
+class ProductSearchEngine:
+    """
+    In-process product search over a local catalog snapshot.
+
+    - Inverted index over title + description, scored with BM25 (title
+      terms count ``title_boost`` times). Postings are dicts for cheap
+      updates, with a per-term numpy copy (rebuilt after a change) so a
+      query scores every posting in one vectorized pass.
+    - Columnar facet indexes: one bitset per (facet, value) for category,
+      color and size, plus price buckets; filters are bitset AND/OR, and
+      price ranges only check exact prices in the two boundary buckets.
+    - Top-k by partial selection (argpartition), never a full sort.
+    - Incremental: ``upsert`` / ``delete`` update postings and bitsets in
+      place (slots of deleted products are reused), so a product-change feed
+      can keep it current between snapshots.
+    - Thread-safe: one lock; searches take a few milliseconds.
+
+    Products are dicts with at least ``id`` and ``title``; ``description``,
+    ``category``, ``color``, ``size`` and ``price`` are indexed when present
+    and every field is returned with the hit.
+    """
+
+    def __init__(
+        self,
+        *,
+        price_buckets: Sequence[float] = (0, 25, 50, 100, 250, 500, 1000),
+        title_boost: int = 2,
+        k1: float = 1.2,
+        b: float = 0.75,
+    ) -> None:
+        self.price_edges: List[float] = sorted(float(e) for e in price_buckets)
+        self.title_boost = title_boost
+        self.k1 = k1
+        self.b = b
+        # Kafka offsets (partition -> next offset) the loaded snapshot covers.
+        self.feed_offsets: Optional[Dict[int, int]] = None
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self) -> None:
+        # Slot-indexed columns; the numeric ones are numpy with spare capacity.
+        self._docs: List[Optional[Dict[str, Any]]] = []
+        self._lengths = np.zeros(1024, dtype=np.float64)
+        self._prices = np.full(1024, np.nan, dtype=np.float64)
+        self._terms: List[Tuple[str, ...]] = []
+        self._facet_values: List[Tuple[Tuple[str, str], ...]] = []
+        self._free: List[int] = []
+        self._slot_by_id: Dict[str, int] = {}
+        self._total_length = 0
+
+        # term -> {slot: weighted tf}
+        self._postings: Dict[str, Dict[int, int]] = {}
+        # term -> (slots, tfs) arrays; dropped whenever the term's postings change
+        self._posting_arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        # facet -> value -> bitset; "price" -> bucket index (as str) -> bitset
+        self._facets: Dict[str, Dict[str, int]] = {f: {} for f in FACETS + ("price",)}
+
+    # ---------- loading / snapshots ----------
+
+    @classmethod
+    def from_snapshot(cls, path: str, **kwargs: Any) -> "ProductSearchEngine":
+        """
+        Build from a JSONL catalog snapshot (one product per line, optionally
+        preceded by a {"_feed_offsets": {...}} line). A missing file gives an
+        empty engine.
+        """
+        engine = cls(**kwargs)
+        if not os.path.exists(path):
+            logger.warning("Product catalog snapshot %s not found; search index is empty", path)
+            return engine
+        with open(path, encoding="utf-8") as fh:
+            products = [json.loads(line) for line in fh if line.strip()]
+        if products and "_feed_offsets" in products[0]:
+            engine.feed_offsets = {int(p): int(o) for p, o in products.pop(0)["_feed_offsets"].items()}
+        engine.load(products)
+        logger.info("Loaded %d products from %s", len(engine), path)
+        return engine
+
+    def load(self, products: Iterable[Dict[str, Any]]) -> None:
+        """
+        Bulk (re)build. Bitsets are assembled once per value rather than
+        shifted in per product. Later duplicates of an ``id`` win.
+        """
+        latest = {str(p["id"]): p for p in products}
+        with self._lock:
+            self._reset()
+            members: Dict[Tuple[str, str], List[int]] = {}
+            for product in latest.values():
+                slot = self._add(product)
+                for key in self._facet_values[slot]:
+                    members.setdefault(key, []).append(slot)
+            size = len(self._docs)
+            for (facet, value), slots in members.items():
+                self._facets[facet][value] = _bits_from_indices(slots, size)
+
+    def save_snapshot(self, path: str, offsets: Optional[Dict[int, int]] = None) -> None:
+        """
+        Write live products as JSONL, atomically (write + rename). ``offsets``
+        (the product-change feed position the snapshot covers) go in a first
+        line, so workers loading it can resume the feed from there.
+        """
+        with self._lock:
+            docs = [d for d in self._docs if d is not None]
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f"{path}.tmp.{os.getpid()}"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            if offsets is not None:
+                fh.write(json.dumps({"_feed_offsets": {str(p): o for p, o in offsets.items()}}) + "\n")
+            for doc in docs:
+                fh.write(json.dumps(doc, ensure_ascii=False) + "\n")
+        os.replace(tmp, path)
+
+    def __len__(self) -> int:
+        return len(self._slot_by_id)
+
+    # ---------- indexing ----------
+
+    def _price_bucket(self, price: float) -> str:
+        return str(max(0, bisect_right(self.price_edges, price) - 1))
+
+    def _add(self, product: Dict[str, Any]) -> int:
+        """Index postings/columns for a new product; facet bitsets are the caller's. Lock held."""
+        doc = dict(product)
+        doc["id"] = str(doc["id"])
+        slot = self._free.pop() if self._free else len(self._docs)
+        if slot == len(self._docs):
+            if slot == len(self._lengths):
+                self._lengths = np.concatenate([self._lengths, np.zeros_like(self._lengths)])
+                self._prices = np.concatenate([self._prices, np.full_like(self._prices, np.nan)])
+            self._docs.append(None)
+            self._terms.append(())
+            self._facet_values.append(())
+
+        title_tokens = tokenize(str(doc.get("title") or ""))
+        desc_tokens = tokenize(str(doc.get("description") or ""))
+        tf: Dict[str, int] = {}
+        for tok in title_tokens:
+            tf[tok] = tf.get(tok, 0) + self.title_boost
+        for tok in desc_tokens:
+            tf[tok] = tf.get(tok, 0) + 1
+        for term, count in tf.items():
+            self._postings.setdefault(term, {})[slot] = count
+            self._posting_arrays.pop(term, None)
+        length = len(title_tokens) * self.title_boost + len(desc_tokens)
+
+        facet_values = [(f, v) for f in FACETS for v in _values(doc.get(f))]
+        price = doc.get("price")
+        try:
+            price = float(price) if price is not None else None
+        except (TypeError, ValueError):
+            price = None
+        if price is not None:
+            facet_values.append(("price", self._price_bucket(price)))
+
+        self._docs[slot] = doc
+        self._lengths[slot] = length
+        self._prices[slot] = price if price is not None else np.nan
+        self._terms[slot] = tuple(tf)
+        self._facet_values[slot] = tuple(dict.fromkeys(facet_values))
+        self._slot_by_id[doc["id"]] = slot
+        self._total_length += length
+        return slot
+
+    def _remove(self, slot: int) -> None:
+        """Drop a product's postings and facet bits and free its slot. Lock held."""
+        for term in self._terms[slot]:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(slot, None)
+                self._posting_arrays.pop(term, None)
+                if not postings:
+                    del self._postings[term]
+        mask = ~(1 << slot)
+        for facet, value in self._facet_values[slot]:
+            bits = self._facets[facet].get(value, 0) & mask
+            if bits:
+                self._facets[facet][value] = bits
+            else:
+                self._facets[facet].pop(value, None)
+        del self._slot_by_id[self._docs[slot]["id"]]
+        self._total_length -= self._lengths[slot]
+        self._docs[slot] = None
+        self._lengths[slot] = 0
+        self._prices[slot] = np.nan
+        self._terms[slot] = ()
+        self._facet_values[slot] = ()
+        self._free.append(slot)
+
+    def upsert(self, product: Dict[str, Any]) -> None:
+        """Insert or replace one product (by ``id``)."""
+        with self._lock:
+            old = self._slot_by_id.get(str(product["id"]))
+            if old is not None:
+                self._remove(old)
+            slot = self._add(product)
+            bit = 1 << slot
+            for facet, value in self._facet_values[slot]:
+                values = self._facets[facet]
+                values[value] = values.get(value, 0) | bit
+
+    def delete(self, product_id: Any) -> bool:
+        with self._lock:
+            slot = self._slot_by_id.get(str(product_id))
+            if slot is None:
+                return False
+            self._remove(slot)
+            return True
+
+    def apply_change(self, change: Dict[str, Any]) -> None:
+        """
+        Apply one product-change feed message:
+          {"op": "upsert", "product": {...}}   (also "create" / "update")
+          {"op": "delete", "id": "..."}
+        """
+        op = change.get("op", "upsert")
+        if op == "delete":
+            self.delete(change.get("id") or (change.get("product") or {}).get("id"))
+        elif op in ("upsert", "create", "update"):
+            self.upsert(change["product"])
+        else:
+            raise ValueError(f"Unknown product change op {op!r}")
+
+    # ---------- filtering ----------
+
+    def _price_bits(self, price_min: Optional[float], price_max: Optional[float]) -> int:
+        """
+        Buckets fully inside [price_min, price_max] contribute their whole
+        bitset; only the (at most two) boundary buckets check exact prices.
+        Lock held.
+        """
+        lo = price_min if price_min is not None else -math.inf
+        hi = price_max if price_max is not None else math.inf
+        edges = self.price_edges
+        bits = 0
+        for bucket, bucket_bits in self._facets["price"].items():
+            i = int(bucket)
+            start = edges[i]
+            end = edges[i + 1] if i + 1 < len(edges) else math.inf
+            if end <= lo or start > hi:
+                continue
+            if start >= lo and end <= hi:
+                bits |= bucket_bits
+                continue
+            slots = _bits_to_indices(bucket_bits)
+            prices = self._prices[slots]
+            keep = np.zeros(len(self._docs), dtype=bool)
+            keep[slots[(prices >= lo) & (prices <= hi)]] = True
+            bits |= _bits_from_mask(keep)
+        return bits
+
+    def _filter_bits(self, filters: Dict[str, Any]) -> Optional[int]:
+        """
+        AND across facets, OR across values within a facet. None = no filter.
+        Lock held.
+        """
+        result: Optional[int] = None
+        for facet in FACETS:
+            values = _values(filters.get(facet))
+            if not values:
+                continue
+            index = self._facets[facet]
+            bits = 0
+            for value in values:
+                bits |= index.get(value, 0)
+            result = bits if result is None else result & bits
+            if not result:
+                return 0
+
+        price_min, price_max = filters.get("price_min"), filters.get("price_max")
+        if price_min is not None or price_max is not None:
+            bits = self._price_bits(
+                float(price_min) if price_min is not None else None,
+                float(price_max) if price_max is not None else None,
+            )
+            result = bits if result is None else result & bits
+        return result
+
+    # ---------- search ----------
+
+    def search(
+        self,
+        query: str = "",
+        *,
+        filters: Optional[Dict[str, Any]] = None,
+        k: int = 10,
+    ) -> List[Dict[str, Any]]:
+        """
+        BM25 over ``query`` restricted to ``filters`` (keys: category, color,
+        size, price_min, price_max; values may be lists). With no query
+        terms, returns the first ``k`` matching products in catalog order.
+        Hits are product dicts plus a ``score``.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            allowed = self._filter_bits(filters or {})
+            if allowed == 0 or not self._slot_by_id:
+                return []
+
+            if not terms:
+                if allowed is None:
+                    slots = [s for s, d in enumerate(self._docs) if d is not None][:k]
+                else:
+                    slots = [int(s) for s in _bits_to_indices(allowed)[:k]]
+                return [{**self._docs[s], "score": 0.0} for s in slots]
+
+            size = len(self._docs)
+            n_docs = len(self._slot_by_id)
+            avgdl = self._total_length / n_docs or 1.0
+            k1 = self.k1
+            k1_base = k1 * (1 - self.b)
+            k1_len = k1 * self.b / avgdl
+            lengths = self._lengths
+
+            scores = np.zeros(size, dtype=np.float64)
+            for term in terms:
+                arrays = self._term_arrays(term)
+                if arrays is None:
+                    continue
+                slots, tfs = arrays
+                df = len(slots)
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                scores[slots] += idf * (k1 + 1) * tfs / (tfs + k1_base + k1_len * lengths[slots])
+            if allowed is not None:
+                scores[~_bits_to_mask(allowed, size)] = 0.0
+
+            # BM25 scores of matching docs are > 0.
+            candidates = np.flatnonzero(scores)
+            if len(candidates) > k:
+                candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+            top = candidates[np.argsort(-scores[candidates], kind="stable")]
+            return [{**self._docs[s], "score": round(float(scores[s]), 4)} for s in top]
+
+    def _term_arrays(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """(slots, tfs) for a term, cached until its postings change. Lock held."""
+        arrays = self._posting_arrays.get(term)
+        if arrays is None:
+            postings = self._postings.get(term)
+            if not postings:
+                return None
+            arrays = (
+                np.fromiter(postings.keys(), dtype=np.int64, count=len(postings)),
+                np.fromiter(postings.values(), dtype=np.float64, count=len(postings)),
+            )
+            self._posting_arrays[term] = arrays
+        return arrays
+
+    def parse_query(self, text: str) -> Tuple[str, Dict[str, Any]]:
+        """
+        Lift facet constraints out of free text: "red running shoes size 10
+        under 2000" -> ("red running shoes", {"color": ["red"], "size": "10",
+        "price_max": 2000.0}). Colors are only recognized if the catalog has
+        them; category words stay in the text (they're usually in titles).
+        """
+        lowered = text.lower()
+        filters: Dict[str, Any] = {}
+        for word, amount in _PRICE_RE.findall(lowered):
+            key = "price_max" if word in ("under", "below") else "price_min"
+            filters[key] = float(amount)
+        size = _SIZE_RE.search(lowered)
+        if size:
+            filters["size"] = size.group(1)
+        rest = _SIZE_RE.sub(" ", _PRICE_RE.sub(" ", lowered))
+
+        with self._lock:
+            colors = [tok for tok in tokenize(rest) if tok in self._facets["color"]]
+        if colors:
+            filters["color"] = list(dict.fromkeys(colors))
+        return " ".join(rest.split()), filters
+
+    def search_text(self, text: str, *, k: int = 10) -> List[Dict[str, Any]]:
+        """
+        Free-text search with facet constraints parsed from the query. If the
+        parsed filters leave nothing, falls back to plain BM25 on the text.
+        """
+        query, filters = self.parse_query(text)
+        hits = self.search(query, filters=filters, k=k) if filters else []
+        return hits or self.search(query, k=k)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "products": len(self._slot_by_id),
+                "slots": len(self._docs),
+                "terms": len(self._postings),
+                "facet_values": {f: len(v) for f, v in self._facets.items()},
+            }
+
+
+@lru_cache()
+def get_product_search() -> ProductSearchEngine:
+    """
+    Process-wide engine loaded from the catalog snapshot in config.
+    """
+    return ProductSearchEngine.from_snapshot(
+        config.PRODUCT_CATALOG_PATH, price_buckets=config.PRODUCT_PRICE_BUCKETS
+    )
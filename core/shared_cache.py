@@ -0,0 +1,240 @@
+# core/shared_cache.py
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+def hash_key(*parts: Any) -> str:
+    """
+    Stable cache key from JSON-serializable parts (dict keys sorted).
+    """
+    raw = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SharedCache:
+    """
+    Cross-process string cache: local SQLite (WAL) shared by every worker on
+    the box, with a small in-process front LRU.
+
+    - One table, partitioned by ``namespace`` ("llm", "plan", "analytics", ...),
+      each with its own TTL and max entries.
+    - Front-cache entries live at most ``front_ttl_seconds``, which bounds how
+      long a worker can serve a value another worker has replaced.
+    - Reads don't take SQLite's write lock: a hit refreshes the row's
+      ``accessed`` time (used for LRU eviction) only when it is older than
+      ``touch_interval_seconds``, and never waits for a busy writer.
+    - Fork-safe: the connection is (re)opened per process, so a cache created
+      in a preloading master is usable in its workers.
+    - Values are strings; callers serialize (JSON, LangChain dumps, ...).
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        *,
+        path: Optional[str] = None,
+        ttl_seconds: Optional[float] = None,
+        max_entries: int = 10_000,
+        front_entries: int = 256,
+        front_ttl_seconds: Optional[float] = 5.0,
+        touch_interval_seconds: float = 60.0,
+    ) -> None:
+        self.namespace = namespace
+        self.path = path or config.SHARED_CACHE_PATH
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.front_entries = front_entries
+        self.front_ttl_seconds = front_ttl_seconds
+        self.touch_interval_seconds = touch_interval_seconds
+        self.hits = 0
+        self.front_hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._front: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._writes_since_evict = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+
+    # ---------- connection ----------
+
+    def _db(self) -> sqlite3.Connection:
+        """Connection for this process. Lock held."""
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS shared_cache ("
+                " namespace TEXT NOT NULL,"
+                " key TEXT NOT NULL,"
+                " value TEXT NOT NULL,"
+                " expires REAL,"
+                " accessed REAL NOT NULL,"
+                " PRIMARY KEY (namespace, key))"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS shared_cache_accessed ON shared_cache(namespace, accessed)"
+            )
+            conn.commit()
+            self._conn, self._pid = conn, os.getpid()
+            self._front.clear()
+        return self._conn
+
+    # ---------- front tier ----------
+
+    def _front_get(self, key: str, now: float) -> Optional[str]:
+        entry = self._front.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < now:
+            del self._front[key]
+            return None
+        self._front.move_to_end(key)
+        return value
+
+    def _front_put(self, key: str, value: str, expires: Optional[float], now: float) -> None:
+        if self.front_entries <= 0:
+            return
+        front_expires = now + self.front_ttl_seconds if self.front_ttl_seconds is not None else float("inf")
+        if expires is not None:
+            front_expires = min(front_expires, expires)
+        self._front[key] = (front_expires, value)
+        self._front.move_to_end(key)
+        while len(self._front) > self.front_entries:
+            self._front.popitem(last=False)
+
+    # ---------- API ----------
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            value = self._front_get(key, now)
+            if value is not None:
+                self.front_hits += 1
+                self.hits += 1
+                return value
+
+            try:
+                db = self._db()
+                row = db.execute(
+                    "SELECT value, expires, accessed FROM shared_cache WHERE namespace = ? AND key = ?",
+                    (self.namespace, key),
+                ).fetchone()
+            except sqlite3.Error:
+                logger.exception("Shared cache read failed (%s)", self.namespace)
+                self.misses += 1
+                return None
+            if row is None or (row[1] is not None and row[1] < now):
+                self.misses += 1
+                return None
+
+            value, expires, accessed = row
+            if now - accessed >= self.touch_interval_seconds:
+                self._touch(db, key, now)
+            self._front_put(key, value, expires, now)
+            self.hits += 1
+            return value
+
+    def _touch(self, db: sqlite3.Connection, key: str, now: float) -> None:
+        """Best-effort LRU refresh; skipped if another worker holds the write lock. Lock held."""
+        try:
+            db.execute("PRAGMA busy_timeout = 0")
+            db.execute(
+                "UPDATE shared_cache SET accessed = ? WHERE namespace = ? AND key = ?",
+                (now, self.namespace, key),
+            )
+            db.commit()
+        except sqlite3.OperationalError:
+            db.rollback()
+        finally:
+            db.execute("PRAGMA busy_timeout = 5000")
+
+    def set(self, key: str, value: str, *, ttl_seconds: Optional[float] = None) -> None:
+        now = time.time()
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        expires = now + ttl if ttl is not None else None
+        with self._lock:
+            self._front_put(key, value, expires, now)
+            try:
+                db = self._db()
+                db.execute(
+                    "INSERT OR REPLACE INTO shared_cache (namespace, key, value, expires, accessed)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (self.namespace, key, value, expires, now),
+                )
+                self._writes_since_evict += 1
+                if self._writes_since_evict >= max(1, self.max_entries // 100):
+                    self._evict(db, now)
+                db.commit()
+            except sqlite3.Error:
+                logger.exception("Shared cache write failed (%s)", self.namespace)
+
+    def _evict(self, db: sqlite3.Connection, now: float) -> None:
+        """Drop expired rows, then least recently used rows over max_entries. Lock held."""
+        self._writes_since_evict = 0
+        db.execute(
+            "DELETE FROM shared_cache WHERE namespace = ? AND expires IS NOT NULL AND expires < ?",
+            (self.namespace, now),
+        )
+        db.execute(
+            "DELETE FROM shared_cache WHERE namespace = ? AND key IN ("
+            " SELECT key FROM shared_cache WHERE namespace = ?"
+            " ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (self.namespace, self.namespace, self.max_entries),
+        )
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._front.pop(key, None)
+            try:
+                db = self._db()
+                db.execute(
+                    "DELETE FROM shared_cache WHERE namespace = ? AND key = ?", (self.namespace, key)
+                )
+                db.commit()
+            except sqlite3.Error:
+                logger.exception("Shared cache delete failed (%s)", self.namespace)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._front.clear()
+            try:
+                db = self._db()
+                db.execute("DELETE FROM shared_cache WHERE namespace = ?", (self.namespace,))
+                db.commit()
+            except sqlite3.Error:
+                logger.exception("Shared cache clear failed (%s)", self.namespace)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            try:
+                (rows,) = self._db().execute(
+                    "SELECT COUNT(*) FROM shared_cache WHERE namespace = ?", (self.namespace,)
+                ).fetchone()
+            except sqlite3.Error:
+                logger.exception("Shared cache stats failed (%s)", self.namespace)
+                rows = None
+            return {
+                "namespace": self.namespace,
+                "hits": self.hits,
+                "front_hits": self.front_hits,
+                "misses": self.misses,
+                "front_entries": len(self._front),
+                "shared_entries": rows,
+            }
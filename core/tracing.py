@@ -0,0 +1,287 @@
+# core/tracing.py
+from __future__ import annotations
+
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+import config
+
+logger = logging.getLogger(__name__)
+
+_TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+
+def _new_id(nbytes: int) -> str:
+    return os.urandom(nbytes).hex()
+
+
+@dataclass
+class Span:
+    """
+    One timed operation. Field names follow the OTLP JSON span shape so the
+    exported JSONL can be fed to OTLP-aware tooling.
+    """
+
+    trace: "_Trace"
+    name: str
+    span_id: str = field(default_factory=lambda: _new_id(8))
+    parent_id: Optional[str] = None
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: Optional[int] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    status: str = "ok"
+    error: Optional[str] = None
+
+    @property
+    def trace_id(self) -> str:
+        return self.trace.trace_id
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def fail(self, exc: BaseException) -> None:
+        self.status = "error"
+        self.error = f"{type(exc).__name__}: {exc}"
+        self.trace.failed = True
+
+    def finish(self) -> None:
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "durationMs": round(((self.end_ns or self.start_ns) - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "status": {"code": self.status, "message": self.error},
+        }
+
+
+@dataclass
+class _Trace:
+    trace_id: str
+    spans: List[Span] = field(default_factory=list)
+    failed: bool = False
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def add(self, span: Span) -> None:
+        with self.lock:
+            self.spans.append(span)
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class JsonlSpanExporter:
+    """
+    Appends kept traces to a JSONL file, one span per line.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def export(self, spans: List[Span]) -> None:
+        lines = "".join(json.dumps(s.to_dict(), default=str) + "\n" for s in spans)
+        with self._lock, open(self.path, "a", encoding="utf-8") as fh:
+            fh.write(lines)
+
+
+class TailSampler:
+    """
+    Decide after the root span ends: keep every failed trace, every trace
+    slower than ``slow_ms``, and a ``sample_rate`` fraction of the rest.
+    """
+
+    def __init__(self, *, slow_ms: float, sample_rate: float) -> None:
+        self.slow_ms = slow_ms
+        self.sample_rate = sample_rate
+
+    def keep(self, trace: _Trace, root: Span) -> bool:
+        if trace.failed:
+            return True
+        if ((root.end_ns or 0) - root.start_ns) / 1e6 >= self.slow_ms:
+            return True
+        return random.random() < self.sample_rate
+
+
+class Tracer:
+    def __init__(self, exporter: JsonlSpanExporter, sampler: TailSampler, *, enabled: bool = True) -> None:
+        self.exporter = exporter
+        self.sampler = sampler
+        self.enabled = enabled
+
+    @contextmanager
+    def trace(
+        self,
+        name: str,
+        *,
+        traceparent: Optional[str] = None,
+        **attributes: Any,
+    ) -> Iterator[Optional[Span]]:
+        """
+        Root span for one request. Continues an incoming W3C ``traceparent``
+        if given; the finished trace goes through tail sampling.
+        """
+        if not self.enabled:
+            yield None
+            return
+
+        trace_id, parent_id = _new_id(16), None
+        match = _TRACEPARENT_RE.match(traceparent or "")
+        if match:
+            trace_id, parent_id = match.group(1), match.group(2)
+
+        trace = _Trace(trace_id)
+        root = Span(trace, name, parent_id=parent_id, attributes=dict(attributes))
+        trace.add(root)
+        token = _current_span.set(root)
+        try:
+            yield root
+        except BaseException as exc:
+            root.fail(exc)
+            raise
+        finally:
+            _current_span.reset(token)
+            root.finish()
+            self._complete(trace, root)
+
+    def _complete(self, trace: _Trace, root: Span) -> None:
+        if not self.sampler.keep(trace, root):
+            return
+        with trace.lock:
+            spans = list(trace.spans)
+        for span in spans:
+            span.finish()
+        try:
+            self.exporter.export(spans)
+        except OSError:
+            logger.exception("Failed to export trace %s", trace.trace_id)
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+        """
+        Child of the current span; a no-op outside a trace.
+        """
+        parent = _current_span.get()
+        if parent is None:
+            yield None
+            return
+        span = Span(parent.trace, name, parent_id=parent.span_id, attributes=dict(attributes))
+        parent.trace.add(span)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as exc:
+            span.fail(exc)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.finish()
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def current_trace_id() -> Optional[str]:
+    span = _current_span.get()
+    return span.trace_id if span is not None else None
+
+
+def propagation_headers() -> Dict[str, str]:
+    """
+    Outbound headers linking a downstream call to the current span.
+    """
+    span = _current_span.get()
+    if span is None:
+        return {}
+    return {
+        "traceparent": f"00-{span.trace_id}-{span.span_id}-01",
+        "X-Request-Id": span.trace_id,
+    }
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """
+    Records LangChain LLM runs (including retries and cache hits) as child
+    spans of whatever span was current when the run started.
+    """
+
+    run_inline = True
+
+    def __init__(self) -> None:
+        self._spans: Dict[UUID, Span] = {}
+
+    def _start(self, run_id: UUID, name: str, **attributes: Any) -> None:
+        parent = _current_span.get()
+        if parent is None:
+            return
+        span = Span(parent.trace, name, parent_id=parent.span_id, attributes=attributes)
+        parent.trace.add(span)
+        self._spans[run_id] = span
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs: Any) -> None:
+        params = kwargs.get("invocation_params") or {}
+        self._start(
+            run_id,
+            "llm.chat",
+            model=params.get("model") or (kwargs.get("metadata") or {}).get("ls_model_name"),
+            messages=sum(len(batch) for batch in messages),
+        )
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs: Any) -> None:
+        params = kwargs.get("invocation_params") or {}
+        self._start(run_id, "llm.completion", model=params.get("model"), prompts=len(prompts))
+
+    def on_retry(self, retry_state: Any, *, run_id, **kwargs: Any) -> None:
+        span = self._spans.get(run_id)
+        if span is not None:
+            span.attributes["retries"] = span.attributes.get("retries", 0) + 1
+
+    def on_llm_end(self, response, *, run_id, **kwargs: Any) -> None:
+        span = self._spans.pop(run_id, None)
+        if span is None:
+            return
+        for batch in response.generations:
+            for generation in batch:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    span.set(
+                        prompt_tokens=usage.get("input_tokens"),
+                        completion_tokens=usage.get("output_tokens"),
+                    )
+        span.finish()
+
+    def on_llm_error(self, error: BaseException, *, run_id, **kwargs: Any) -> None:
+        span = self._spans.pop(run_id, None)
+        if span is not None:
+            span.fail(error)
+            span.finish()
+
+
+tracer = Tracer(
+    JsonlSpanExporter(config.TRACE_EXPORT_PATH),
+    TailSampler(slow_ms=config.TRACE_SLOW_MS, sample_rate=config.TRACE_SAMPLE_RATE),
+    enabled=config.TRACING_ENABLED,
+)
+tracing_callback = TracingCallbackHandler()
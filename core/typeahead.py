@@ -0,0 +1,232 @@
+# core/typeahead.py
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Boosted scores are rebased before 2**exponent gets near float overflow.
+_MAX_EXPONENT = 512.0
+
+
+def normalize_query(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+class TypeaheadIndex:
+    """
+    Frequency-weighted prefix index for search suggestions.
+
+    - Flattened trie: every prefix (up to ``max_prefix_len`` chars) maps to
+      its top ``top_k`` completions, so a lookup is one dict get and a slice.
+    - Time-decayed counts with a half-life, without touching old entries:
+      a search at time t adds 2**((t - epoch) / half_life), so newer
+      searches weigh more and all stored scores decay at the same rate.
+      Scores therefore only change when a query is searched again, which
+      keeps every per-prefix top-k exact under incremental updates.
+    - Bounded: past ``max_queries`` the lowest-scoring queries are dropped.
+    - Snapshots to JSON (atomic rename); thread-safe.
+    """
+
+    def __init__(
+        self,
+        *,
+        top_k: int = 10,
+        half_life_seconds: float = 7 * 86400.0,
+        max_prefix_len: int = 24,
+        max_queries: int = 200_000,
+    ) -> None:
+        self.top_k = top_k
+        self.half_life_seconds = half_life_seconds
+        self.max_prefix_len = max_prefix_len
+        self.max_queries = max_queries
+
+        self._lock = threading.Lock()
+        self._epoch = time.time()
+        self._scores: Dict[str, float] = {}
+        # prefix -> [(boosted score, query)], best first, at most top_k
+        self._top: Dict[str, List[Tuple[float, str]]] = {}
+        # Next user-searches offset per partition, from the loaded snapshot.
+        self.feed_offsets: Optional[Dict[int, int]] = None
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    # ---------- updates ----------
+
+    def _boost(self, ts: float) -> float:
+        """Weight of one search at ``ts``. Lock held."""
+        exponent = (ts - self._epoch) / self.half_life_seconds
+        if exponent > _MAX_EXPONENT:
+            self._rebase(ts)
+            exponent = 0.0
+        return 2.0 ** exponent
+
+    def _rebase(self, ts: float) -> None:
+        """Move the epoch to ``ts``, rescaling every score. Lock held."""
+        factor = 2.0 ** (-(ts - self._epoch) / self.half_life_seconds)
+        self._epoch = ts
+        self._scores = {q: s * factor for q, s in self._scores.items() if s * factor > 0.0}
+        self._top = {
+            prefix: [(s * factor, q) for s, q in entries if q in self._scores]
+            for prefix, entries in self._top.items()
+        }
+
+    def _prefixes(self, query: str) -> List[str]:
+        return [query[:i] for i in range(1, min(len(query), self.max_prefix_len) + 1)]
+
+    def _promote(self, prefix: str, query: str, score: float) -> None:
+        """Insert/raise ``query`` in one prefix's top-k. Lock held."""
+        entries = self._top.setdefault(prefix, [])
+        for i, (_, q) in enumerate(entries):
+            if q == query:
+                del entries[i]
+                break
+        else:
+            if len(entries) >= self.top_k and score <= entries[-1][0]:
+                return
+        lo, hi = 0, len(entries)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if entries[mid][0] >= score:
+                lo = mid + 1
+            else:
+                hi = mid
+        entries.insert(lo, (score, query))
+        del entries[self.top_k:]
+
+    def add(self, query: str, *, count: float = 1.0, ts: Optional[float] = None) -> None:
+        """Record ``count`` searches of ``query`` at ``ts`` (default now)."""
+        query = normalize_query(query)
+        if len(query) < 2:
+            return
+        now = time.time()
+        # Future timestamps (producer clock skew) would outweigh everything.
+        ts = min(ts, now) if ts else now
+        with self._lock:
+            score = self._scores.get(query, 0.0) + count * self._boost(ts)
+            self._scores[query] = score
+            for prefix in self._prefixes(query):
+                self._promote(prefix, query, score)
+            if len(self._scores) > self.max_queries * 1.1:
+                self._prune()
+
+    def _prune(self) -> None:
+        """Drop the lowest-scoring queries down to max_queries. Lock held."""
+        keep = sorted(self._scores.items(), key=lambda item: item[1], reverse=True)[: self.max_queries]
+        dropped = self._scores.keys() - {q for q, _ in keep}
+        self._scores = dict(keep)
+        for query in dropped:
+            for prefix in self._prefixes(query):
+                entries = self._top.get(prefix)
+                if entries is None:
+                    continue
+                entries[:] = [e for e in entries if e[1] != query]
+                if not entries:
+                    del self._top[prefix]
+
+    # ---------- lookups ----------
+
+    def suggest(self, prefix: str, k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Best completions of ``prefix``; ``score`` is the decayed search count
+        as of now. Prefixes longer than max_prefix_len are matched on their
+        first max_prefix_len chars and filtered.
+        """
+        prefix = normalize_query(prefix)
+        if not prefix:
+            return []
+        k = k or self.top_k
+        with self._lock:
+            entries = self._top.get(prefix[: self.max_prefix_len], ())
+            decay = 2.0 ** (-(time.time() - self._epoch) / self.half_life_seconds)
+            return [
+                {"query": q, "score": round(s * decay, 3)}
+                for s, q in entries
+                if q.startswith(prefix)
+            ][:k]
+
+    # ---------- snapshots ----------
+
+    def save_snapshot(self, path: str, offsets: Optional[Dict[int, int]] = None) -> None:
+        """
+        Write the scores atomically. ``offsets`` (next user-searches offset
+        per partition) lets a worker resume the feed where the snapshot ends.
+        """
+        with self._lock:
+            state = {
+                "epoch": self._epoch,
+                "half_life_seconds": self.half_life_seconds,
+                "scores": dict(self._scores),
+            }
+        if offsets is not None:
+            state["feed_offsets"] = {str(p): o for p, o in offsets.items()}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f"{path}.tmp.{os.getpid()}"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(state, fh, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def load_snapshot(self, path: str) -> None:
+        """Replace the index with a snapshot, rebuilding the per-prefix top-k."""
+        with open(path, encoding="utf-8") as fh:
+            state = json.load(fh)
+        offsets = state.get("feed_offsets")
+        self.feed_offsets = {int(p): int(o) for p, o in offsets.items()} if offsets else None
+        if state.get("half_life_seconds") != self.half_life_seconds:
+            logger.warning(
+                "Typeahead snapshot half-life %ss differs from %ss; scores keep their old weighting",
+                state.get("half_life_seconds"),
+                self.half_life_seconds,
+            )
+
+        with self._lock:
+            # Scores are boosted relative to the snapshot's epoch.
+            self._epoch = float(state["epoch"])
+            self._scores = {q: float(s) for q, s in state["scores"].items()}
+            by_prefix: Dict[str, List[Tuple[float, str]]] = {}
+            for query, score in self._scores.items():
+                for prefix in self._prefixes(query):
+                    by_prefix.setdefault(prefix, []).append((score, query))
+            self._top = {
+                prefix: sorted(entries, reverse=True)[: self.top_k]
+                for prefix, entries in by_prefix.items()
+            }
+            if len(self._scores) > self.max_queries:
+                self._prune()
+
+    @classmethod
+    def from_snapshot(cls, path: str, **kwargs: Any) -> "TypeaheadIndex":
+        """Load a snapshot if one exists; otherwise start empty."""
+        index = cls(**kwargs)
+        if os.path.exists(path):
+            index.load_snapshot(path)
+            logger.info("Loaded %d typeahead queries from %s", len(index), path)
+        else:
+            logger.warning("Typeahead snapshot %s not found; starting empty", path)
+        return index
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"queries": len(self._scores), "prefixes": len(self._top)}
+
+
+@lru_cache()
+def get_typeahead() -> TypeaheadIndex:
+    """
+    Process-wide index loaded from the snapshot in config.
+    """
+    return TypeaheadIndex.from_snapshot(
+        config.TYPEAHEAD_SNAPSHOT_PATH,
+        top_k=config.TYPEAHEAD_TOP_K,
+        half_life_seconds=config.TYPEAHEAD_HALF_LIFE_SECONDS,
+        max_queries=config.TYPEAHEAD_MAX_QUERIES,
+    )
@@ -1,10 +1,10 @@
-from langchain_community.llms import Ollama
 from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
-from .config import MODEL_NAME
 
-# Connect to Ollama and set up an LLMChain
-llm = Ollama(model=MODEL_NAME)
+from core.llm import get_chat_model
+
+# Connect to Ollama (recommendation task profile) and set up an LLMChain
+llm = get_chat_model("recommendation")
 
 product_prompt = PromptTemplate(
     input_variables=["user_query"],
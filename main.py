@@ -2,6 +2,9 @@ import threading
 from consumers.events_consumer import consume_user_events
 from consumers.search_consumer import consume_search_events
 from consumers.orders_consumer import consume_orders_events
+from consumers.products_consumer import consume_product_changes
+from consumers.typeahead_consumer import consume_search_suggestions
+from consumers.affinity_consumer import consume_user_affinities
 
 if __name__ == "__main__":
     print("Starting AI Agent consumers...")
@@ -9,15 +12,24 @@ if __name__ == "__main__":
     events_thread = threading.Thread(target=consume_user_events)
     search_thread = threading.Thread(target=consume_search_events)
     orders_thread = threading.Thread(target=consume_orders_events)
+    products_thread = threading.Thread(target=consume_product_changes)
+    typeahead_thread = threading.Thread(target=consume_search_suggestions)
+    affinity_thread = threading.Thread(target=consume_user_affinities)
 
     events_thread.start()
     search_thread.start()
     orders_thread.start()
+    products_thread.start()
+    typeahead_thread.start()
+    affinity_thread.start()
 
     print("All consumers are running in the background.")
 
     events_thread.join()
     search_thread.join()
     orders_thread.join()
+    products_thread.join()
+    typeahead_thread.join()
+    affinity_thread.join()
 
     print("Application has finished.")
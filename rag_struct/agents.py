@@ -1,8 +1,13 @@
 # agentic_ai_sdk/agents.py
-from typing import Dict, Any
+import asyncio
+import os
+from typing import AsyncIterator, Dict, Any, List, Optional
 
 from langchain_openai import ChatOpenAI
 from langchain.agents import initialize_agent, AgentType, Tool
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.tools import BaseTool
+from pydantic import BaseModel, Field
 
 from .tools import (
     get_user_previous_product_views,
@@ -12,13 +17,19 @@ from .tools import (
 )
 
 
-def build_llm() -> ChatOpenAI:
+# Tag on the top-level SearchAgent LLM, used to pick its tokens out of the event stream.
+SEARCH_ANSWER_TAG = "search_agent_answer"
+
+
+def build_llm(tags: Optional[List[str]] = None) -> ChatOpenAI:
     import os
     return ChatOpenAI(
         api_key=os.environ["OPENAI_API_KEY"],
         model="gpt-4.1-mini",
         temperature=0.2,
         base_url=os.getenv("OPENAI_BASE_URL"),
+        streaming=True,
+        tags=tags,
     )
 
 
@@ -55,9 +66,7 @@ def build_orders_agent() -> Any:
 
 # ---------- SearchAgent (top-level orchestrator) ----------
 
-def build_search_agent() -> Any:
-    llm = build_llm()
-
+def _build_search_tools() -> List[BaseTool]:
     user_agent = build_user_agent()
     orders_agent = build_orders_agent()
 
@@ -65,6 +74,7 @@ def build_search_agent() -> Any:
     user_agent_tool = Tool.from_function(
         name="user_agent_delegate",
         func=lambda query: user_agent.run(query),
+        coroutine=lambda query: user_agent.arun(query),
         description=(
             "Delegate queries about user's past activity, previously viewed products, "
             "search history, and preferences to the UserAgent."
@@ -74,6 +84,7 @@ def build_search_agent() -> Any:
     orders_agent_tool = Tool.from_function(
         name="orders_agent_delegate",
         func=lambda query: orders_agent.run(query),
+        coroutine=lambda query: orders_agent.arun(query),
         description=(
             "Delegate queries about user's orders, returns, refunds, and order history "
             "to the OrdersAgent."
@@ -81,13 +92,34 @@ def build_search_agent() -> Any:
     )
 
     # SearchAgent's own tools:
-    tools = [
+    return [
         product_rag_search,
         search_products_by_filters,
         user_agent_tool,
         orders_agent_tool,
     ]
 
+
+def build_search_agent(mode: Optional[str] = None) -> Any:
+    """
+    mode (default: $SEARCH_AGENT_MODE or "agent"):
+      - "agent":    OpenAI-functions agent loop; tools are called one after another.
+      - "parallel": ParallelSearchAgent; plan once, fan out tools concurrently, synthesize.
+    """
+    mode = mode or os.getenv("SEARCH_AGENT_MODE", "agent")
+    tools = _build_search_tools()
+
+    if mode == "parallel":
+        return ParallelSearchAgent(
+            planner_llm=build_llm(),
+            synthesis_llm=build_llm(tags=[SEARCH_ANSWER_TAG]),
+            tools=tools,
+            call_timeout=float(os.getenv("SEARCH_AGENT_CALL_TIMEOUT", "20")),
+        )
+    if mode != "agent":
+        raise ValueError(f"Unknown search agent mode: {mode!r}")
+
+    llm = build_llm(tags=[SEARCH_ANSWER_TAG])
     search_agent = initialize_agent(
         tools=tools,
         llm=llm,
@@ -95,3 +127,132 @@ def build_search_agent() -> Any:
         verbose=True,
     )
     return search_agent
+
+
+# ---------- ParallelSearchAgent (planner / executor) ----------
+
+class ToolCall(BaseModel):
+    tool: str = Field(description="Name of the tool to call.")
+    args: Dict[str, str] = Field(
+        default_factory=dict,
+        description="Tool arguments, e.g. {'query': '...'} or {'color': 'black', 'category': 'jeans'}.",
+    )
+
+
+class DelegationPlan(BaseModel):
+    """Independent tool / sub-agent calls needed to answer the request."""
+
+    calls: List[ToolCall] = Field(default_factory=list)
+
+
+PLANNER_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            "You are the planner of an e-commerce SearchAgent. Decide which tools are "
+            "needed to answer the request. All calls run in parallel, so only include "
+            "calls that don't depend on each other's results. Use no tools if none "
+            "are needed.\n\nAvailable tools:\n{tools}",
+        ),
+        ("human", "{input}"),
+    ]
+)
+
+SYNTHESIS_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            "You are the SearchAgent of an e-commerce platform. Answer the request "
+            "using the tool results below. Be concise and list any found products.",
+        ),
+        ("human", "Request: {input}\n\nTool results:\n{results}"),
+    ]
+)
+
+
+class ParallelSearchAgent:
+    """
+    Planner/executor alternative to the sequential functions agent.
+
+    1. One planner LLM call returns every independent tool/sub-agent call.
+    2. All calls run concurrently (asyncio.gather), each bounded by
+       ``call_timeout``; failures and timeouts become result text instead of
+       failing the request.
+    3. One synthesis LLM call answers from the merged results.
+
+    A query needing both history and orders therefore costs
+    max(user_agent, orders_agent) instead of their sum.
+    Exposes run/arun like the AgentExecutor it replaces.
+    """
+
+    def __init__(
+        self,
+        *,
+        planner_llm: ChatOpenAI,
+        synthesis_llm: ChatOpenAI,
+        tools: List[BaseTool],
+        call_timeout: float = 20.0,
+    ) -> None:
+        self.tools = {t.name: t for t in tools}
+        self.call_timeout = call_timeout
+        self.planner = PLANNER_PROMPT | planner_llm.with_structured_output(DelegationPlan)
+        self.synthesizer = SYNTHESIS_PROMPT | synthesis_llm
+
+    def _tool_descriptions(self) -> str:
+        return "\n".join(
+            f"- {t.name}({', '.join(t.args)}): {t.description}" for t in self.tools.values()
+        )
+
+    async def _call(self, call: ToolCall) -> str:
+        tool = self.tools.get(call.tool)
+        if tool is None:
+            return f"[{call.tool}] unknown tool"
+        # Single-input tools take a plain string; structured tools take the args dict.
+        tool_input: Any = call.args if len(tool.args) > 1 else next(iter(call.args.values()), "")
+        try:
+            result = await asyncio.wait_for(tool.ainvoke(tool_input), timeout=self.call_timeout)
+        except asyncio.TimeoutError:
+            return f"[{call.tool}] timed out after {self.call_timeout}s"
+        except Exception as exc:
+            return f"[{call.tool}] failed: {exc}"
+        return f"[{call.tool}] {result}"
+
+    async def _gather(self, prompt: str) -> Dict[str, str]:
+        plan: DelegationPlan = await self.planner.ainvoke(
+            {"input": prompt, "tools": self._tool_descriptions()}
+        )
+        results = await asyncio.gather(*(self._call(c) for c in plan.calls))
+        return {"input": prompt, "results": "\n\n".join(results) or "(no tools used)"}
+
+    async def arun(self, prompt: str) -> str:
+        resp = await self.synthesizer.ainvoke(await self._gather(prompt))
+        return resp.content
+
+    def run(self, prompt: str) -> str:
+        return asyncio.run(self.arun(prompt))
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        async for chunk in self.synthesizer.astream(await self._gather(prompt)):
+            if chunk.content:
+                yield chunk.content
+
+
+async def astream_answer(search_agent: Any, prompt: str) -> AsyncIterator[str]:
+    """
+    Run the SearchAgent asynchronously and yield its answer tokens as they are
+    generated. Tokens from sub-agents, the RAG chain and tool-calling turns
+    (which have no text content) are skipped.
+    """
+    if isinstance(search_agent, ParallelSearchAgent):
+        async for token in search_agent.astream(prompt):
+            yield token
+        return
+
+    async for event in search_agent.astream_events({"input": prompt}, version="v2"):
+        if event["event"] != "on_chat_model_stream":
+            continue
+        if SEARCH_ANSWER_TAG not in event.get("tags", []):
+            continue
+        content = event["data"]["chunk"].content
+        if content:
+            yield content
@@ -0,0 +1,135 @@
+# rag_struct/answer_cache.py
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    answer: str
+    doc_ids: Tuple[str, ...]
+    index_version: int
+    created_at: float
+    slot: int
+
+
+class SemanticAnswerCache:
+    """
+    Answer cache matched by question-embedding similarity.
+
+    Question vectors live in one preallocated float32 matrix, so a lookup is a
+    single matrix-vector product over at most ``max_entries`` rows. Entries
+    expire after ``ttl_seconds`` and the least recently used entry is evicted
+    when the cache is full.
+
+    The cache only finds candidates; deciding whether a candidate is still
+    valid (same index version / same retrieved documents) is up to the caller.
+    """
+
+    def __init__(
+        self,
+        *,
+        threshold: float = 0.95,
+        ttl_seconds: float = 3600.0,
+        max_entries: int = 1000,
+    ) -> None:
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._matrix: Optional[np.ndarray] = None
+        self._live = np.zeros(max_entries, dtype=bool)
+        # slot -> entry, in LRU order (oldest first)
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _unit(vector: List[float]) -> np.ndarray:
+        vec = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def _drop(self, slot: int) -> None:
+        self._entries.pop(slot, None)
+        self._live[slot] = False
+
+    def lookup(self, vector: List[float]) -> Optional[CachedAnswer]:
+        """
+        Most similar non-expired entry with cosine >= threshold, or None.
+        """
+        with self._lock:
+            if self._matrix is None or not self._entries:
+                self.misses += 1
+                return None
+
+            scores = self._matrix @ self._unit(vector)
+            scores[~self._live] = -np.inf
+            now = time.time()
+            # Walk candidates best-first, dropping expired ones on the way.
+            for slot in np.argsort(-scores):
+                if scores[slot] < self.threshold:
+                    break
+                entry = self._entries[int(slot)]
+                if now - entry.created_at > self.ttl_seconds:
+                    self._drop(int(slot))
+                    continue
+                self._entries.move_to_end(int(slot))
+                self.hits += 1
+                return entry
+
+            self.misses += 1
+            return None
+
+    def store(
+        self,
+        question: str,
+        vector: List[float],
+        answer: str,
+        doc_ids: Tuple[str, ...],
+        index_version: int,
+    ) -> None:
+        if self.max_entries <= 0:
+            return
+        unit = self._unit(vector)
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.zeros((self.max_entries, unit.shape[0]), dtype=np.float32)
+
+            free = np.flatnonzero(~self._live)
+            if len(free):
+                slot = int(free[0])
+            else:
+                slot, _ = self._entries.popitem(last=False)
+
+            self._matrix[slot] = unit
+            self._live[slot] = True
+            self._entries[slot] = CachedAnswer(
+                question=question,
+                answer=answer,
+                doc_ids=doc_ids,
+                index_version=index_version,
+                created_at=time.time(),
+                slot=slot,
+            )
+
+    def discard(self, entry: CachedAnswer) -> None:
+        """Drop an entry the caller found to be stale."""
+        with self._lock:
+            if self._entries.get(entry.slot) is entry:
+                self._drop(entry.slot)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._live[:] = False
@@ -0,0 +1,206 @@
+# rag_struct/bm25.py
+import asyncio
+import heapq
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from .chunk_ids import document_id
+from .concurrency import run_sync
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased alphanumeric tokens. Numbers are kept on purpose so
+    queries like "size 32" match exactly.
+    """
+    return _TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Incremental in-memory inverted index with Okapi BM25 scoring.
+
+    Documents are keyed by chunk ID (the same content-hash IDs the vector
+    store uses), so ``add``/``remove`` mirror vector store upserts/deletes.
+    Only the documents are persisted (JSON); postings are rebuilt on load.
+    """
+
+    def __init__(self, path: Optional[str] = None, *, k1: float = 1.5, b: float = 0.75) -> None:
+        self.path = path
+        self.k1 = k1
+        self.b = b
+
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._doc_len: Dict[str, int] = {}
+        self._docs: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        self._total_len = 0
+
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+            for cid, (text, meta) in stored.items():
+                self._add_one(cid, text, meta)
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self._docs
+
+    def _add_one(self, chunk_id: str, text: str, metadata: Dict[str, Any]) -> None:
+        if chunk_id in self._docs:
+            self._remove_one(chunk_id)
+        tf = Counter(tokenize(text))
+        for term, count in tf.items():
+            self._postings.setdefault(term, {})[chunk_id] = count
+        length = sum(tf.values())
+        self._doc_len[chunk_id] = length
+        self._total_len += length
+        self._docs[chunk_id] = (text, metadata)
+
+    def _remove_one(self, chunk_id: str) -> None:
+        entry = self._docs.pop(chunk_id, None)
+        if entry is None:
+            return
+        for term in set(tokenize(entry[0])):
+            posting = self._postings.get(term)
+            if posting is not None:
+                posting.pop(chunk_id, None)
+                if not posting:
+                    del self._postings[term]
+        self._total_len -= self._doc_len.pop(chunk_id, 0)
+
+    def add(
+        self,
+        ids: Sequence[str],
+        texts: Sequence[str],
+        metadatas: Sequence[Dict[str, Any]],
+    ) -> None:
+        with self._lock:
+            for cid, text, meta in zip(ids, texts, metadatas):
+                self._add_one(cid, text, dict(meta or {}))
+
+    def remove(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            for cid in ids:
+                self._remove_one(cid)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._postings = {}
+            self._doc_len = {}
+            self._docs = {}
+            self._total_len = 0
+
+    def ids(self) -> Set[str]:
+        with self._lock:
+            return set(self._docs)
+
+    def ids_where_in(self, key: str, values: Sequence[Any]) -> Set[str]:
+        allowed = set(values)
+        with self._lock:
+            return {cid for cid, (_, meta) in self._docs.items() if meta.get(key) in allowed}
+
+    def persist(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._docs, f)
+            os.replace(tmp, self.path)
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[str, float]]:
+        """
+        Top-k (chunk_id, bm25 score) pairs for ``query``.
+        """
+        with self._lock:
+            n = len(self._docs)
+            if not n:
+                return []
+            avgdl = self._total_len / n
+            scores: Dict[str, float] = {}
+            for term in set(tokenize(query)):
+                posting = self._postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1.0 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+                for cid, tf in posting.items():
+                    norm = self.k1 * (1.0 - self.b + self.b * self._doc_len[cid] / avgdl)
+                    scores[cid] = scores.get(cid, 0.0) + idf * tf * (self.k1 + 1.0) / (tf + norm)
+            return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def document(self, chunk_id: str) -> Document:
+        text, meta = self._docs[chunk_id]
+        return Document(id=chunk_id, page_content=text, metadata=meta)
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Fuses dense (vector) and lexical (BM25) results with reciprocal rank fusion:
+
+        score(d) = sum_i  weight_i / (rrf_k + rank_i(d))
+
+    Each side contributes ``candidate_k`` results; the fused top ``k`` is returned.
+    Equal weights give plain RRF; skew them to favour one retriever.
+    """
+
+    vector_retriever: BaseRetriever
+    bm25: Any
+    k: int = 5
+    candidate_k: int = 20
+    rrf_k: int = 60
+    dense_weight: float = 1.0
+    lexical_weight: float = 1.0
+
+    def _fuse(self, dense: List[Document], lexical: List[Tuple[str, float]]) -> List[Document]:
+        scores: Dict[str, float] = {}
+        docs: Dict[str, Document] = {}
+
+        for rank, doc in enumerate(dense):
+            key = document_id(doc)
+            docs.setdefault(key, doc)
+            scores[key] = scores.get(key, 0.0) + self.dense_weight / (self.rrf_k + rank + 1)
+
+        for rank, (cid, _) in enumerate(lexical):
+            doc = self.bm25.document(cid)
+            key = document_id(doc)
+            docs.setdefault(key, doc)
+            scores[key] = scores.get(key, 0.0) + self.lexical_weight / (self.rrf_k + rank + 1)
+
+        best = heapq.nlargest(self.k, scores.items(), key=lambda item: item[1])
+        return [docs[key] for key, _ in best]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        dense = self.vector_retriever.invoke(
+            query, config={"callbacks": run_manager.get_child()}
+        )
+        lexical = self.bm25.search(query, k=self.candidate_k)
+        return self._fuse(dense, lexical)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        # Both sides are sync libraries; run them concurrently on the bounded executor.
+        dense, lexical = await asyncio.gather(
+            self.vector_retriever.ainvoke(query, config={"callbacks": run_manager.get_child()}),
+            run_sync(self.bm25.search, query, k=self.candidate_k),
+        )
+        return self._fuse(dense, lexical)
@@ -0,0 +1,44 @@
+# rag_struct/chunk_ids.py
+import hashlib
+import json
+
+from langchain_core.documents import Document
+
+# Metadata key linking every chunk back to the source document it came from.
+DOC_ID_KEY = "doc_id"
+
+
+def content_hash(*parts: str) -> str:
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part.encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+def doc_key(doc_id: object) -> int:
+    """
+    64-bit digest of a source document ID, so long streaming runs can track
+    the documents they have seen in a fixed amount of memory per document.
+    """
+    digest = hashlib.blake2b(str(doc_id).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def chunk_id(chunk: Document) -> str:
+    """
+    Deterministic chunk ID derived from the chunk's content.
+
+    Same document + same text + same metadata => same ID, so re-ingesting an
+    unchanged product produces IDs that already exist in the store.
+    """
+    meta = json.dumps(chunk.metadata, sort_keys=True, default=str)
+    return content_hash(str(chunk.metadata.get(DOC_ID_KEY, "")), chunk.page_content, meta)
+
+
+def document_id(doc: Document) -> str:
+    """
+    Stable ID of a retrieved chunk. Not every vector store returns
+    Document.id; the content hash is the same ID it was stored under.
+    """
+    return doc.id or chunk_id(doc)
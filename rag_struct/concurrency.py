@@ -0,0 +1,29 @@
+# rag_struct/concurrency.py
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Sync-only libraries (Chroma, BM25, the embedding cache's disk tier) run here
+# instead of on the event loop. Bounded so a burst of requests can't spawn an
+# unbounded number of threads.
+_MAX_WORKERS = int(os.getenv("RAG_SYNC_WORKERS", "8"))
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=_MAX_WORKERS, thread_name_prefix="rag-sync")
+    return _executor
+
+
+async def run_sync(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run a blocking call on the bounded RAG executor without blocking the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(func, *args, **kwargs))
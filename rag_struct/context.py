@@ -0,0 +1,161 @@
+# rag_struct/context.py
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Optional
+
+from langchain_core.documents import Document
+
+from .bm25 import tokenize
+from .chunk_ids import DOC_ID_KEY
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate (~4 characters per token for English text).
+    Good enough for budgeting; no tokenizer dependency needed.
+    """
+    return max(1, math.ceil(len(text) / 4))
+
+
+def _overlap(first: str, second: str, max_overlap: int) -> int:
+    """Length of the longest suffix of ``first`` that is a prefix of ``second``."""
+    for size in range(min(len(first), len(second), max_overlap), 0, -1):
+        if first.endswith(second[:size]):
+            return size
+    return 0
+
+
+def _strip_overlap(prev: str, curr: str, min_overlap: int, max_overlap: int) -> str:
+    """
+    Remove the splitter's chunk_overlap region shared by two chunks of the same
+    document, whichever order they were retrieved in.
+    """
+    size = _overlap(prev, curr, max_overlap)
+    if size >= min_overlap:
+        curr = curr[size:].lstrip()
+    size = _overlap(curr, prev, max_overlap)
+    if size >= min_overlap:
+        curr = curr[: len(curr) - size].rstrip()
+    return curr
+
+
+def dedupe(
+    docs: List[Document],
+    *,
+    min_overlap: int = 20,
+    max_overlap: int = 400,
+) -> List[Document]:
+    """
+    Within each source document: drop exact duplicate chunks, strip splitter
+    overlap between chunks, and drop sentences already present earlier.
+    Sentences repeated across documents (templated catalog lines like
+    "Color: black.") are kept, since they describe different products.
+    Order is preserved; empty results are dropped.
+    """
+    kept: List[Document] = []
+    seen_sentences: Dict[str, set] = {}
+    by_source: Dict[str, List[str]] = {}
+
+    for doc in docs:
+        text = doc.page_content
+        source = str(doc.metadata.get(DOC_ID_KEY, ""))
+        source_sentences = seen_sentences.setdefault(source, set())
+
+        for prev in by_source.get(source, []):
+            text = _strip_overlap(prev, text, min_overlap, max_overlap)
+
+        sentences = []
+        for sentence in _SENTENCE_RE.split(text):
+            norm = " ".join(sentence.lower().split())
+            if not norm or norm in source_sentences:
+                continue
+            source_sentences.add(norm)
+            sentences.append(sentence.strip())
+
+        if sentences:
+            by_source.setdefault(source, []).append(doc.page_content)
+            kept.append(Document(id=doc.id, page_content=" ".join(sentences), metadata=doc.metadata))
+
+    return kept
+
+
+def rerank(question: str, docs: List[Document], *, rank_prior: float = 0.3) -> List[Document]:
+    """
+    Cheap local reranker: BM25-style term overlap with the question (IDF
+    computed over the candidate set), blended with the retriever's own order.
+    """
+    if len(docs) <= 1:
+        return list(docs)
+
+    q_terms = set(tokenize(question))
+    doc_terms = [Counter(tokenize(d.page_content)) for d in docs]
+    avg_len = sum(sum(t.values()) for t in doc_terms) / len(docs) or 1.0
+    n = len(docs)
+
+    def _score(i: int) -> float:
+        terms = doc_terms[i]
+        length = sum(terms.values())
+        score = 0.0
+        for term in q_terms:
+            tf = terms.get(term, 0)
+            if not tf:
+                continue
+            df = sum(1 for t in doc_terms if term in t)
+            idf = math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+            score += idf * tf * 2.2 / (tf + 1.2 * (0.25 + 0.75 * length / avg_len))
+        return score
+
+    lexical = [_score(i) for i in range(n)]
+    top = max(lexical) or 1.0
+    blended = [
+        (1.0 - rank_prior) * lexical[i] / top + rank_prior / (i + 1) for i in range(n)
+    ]
+    order = sorted(range(n), key=lambda i: blended[i], reverse=True)
+    return [docs[i] for i in order]
+
+
+def pack(docs: List[Document], max_tokens: int, *, min_tail_tokens: int = 40) -> List[Document]:
+    """
+    Greedily keep docs (in order) until ``max_tokens`` is used. The first doc
+    that doesn't fit is truncated at a sentence boundary if at least
+    ``min_tail_tokens`` of budget remain.
+    """
+    packed: List[Document] = []
+    used = 0
+    for doc in docs:
+        cost = estimate_tokens(doc.page_content)
+        if used + cost <= max_tokens:
+            packed.append(doc)
+            used += cost
+            continue
+
+        remaining = max_tokens - used
+        if remaining >= min_tail_tokens:
+            text = ""
+            for sentence in _SENTENCE_RE.split(doc.page_content):
+                candidate = f"{text} {sentence}".strip()
+                if estimate_tokens(candidate) > remaining:
+                    break
+                text = candidate
+            if text:
+                packed.append(Document(id=doc.id, page_content=text, metadata=doc.metadata))
+        break
+    return packed
+
+
+def compress_context(
+    question: str,
+    docs: List[Document],
+    *,
+    max_tokens: Optional[int] = 1500,
+) -> List[Document]:
+    """
+    Post-retrieval stage: dedupe overlapping spans -> rerank -> pack to budget.
+    """
+    docs = rerank(question, dedupe(docs))
+    if max_tokens is not None:
+        docs = pack(docs, max_tokens)
+    return docs
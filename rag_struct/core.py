@@ -1,11 +1,27 @@
 # rag_struct/core.py
-from typing import Iterable, Dict, Any, List
+import itertools
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Iterable, Dict, Any, List, Set
 from langchain_core.documents import Document
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_core.embeddings import Embeddings
 from langchain_community.vectorstores import Chroma
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough, RunnableParallel
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough, RunnableParallel
+
+from .bm25 import BM25Index, HybridRetriever
+from .answer_cache import SemanticAnswerCache
+from .chunk_ids import DOC_ID_KEY, chunk_id, doc_key, document_id
+from .concurrency import run_sync
+from .context import compress_context
+from .embedding_cache import CachedEmbeddings
+from .ingest import IngestStats, Record, split_records, stream_ingest
+from .vectorstores import ChromaIndexAdapter, MmapVectorStore
+
+logger = logging.getLogger(__name__)
 
 SYSTEM_PROMPT = """You are an AI assistant for an e-commerce platform.
 Use ONLY the given context to answer.
@@ -19,6 +35,11 @@ def _format_docs(docs: List[Document]) -> str:
         parts.append(f"[{i+1}] {d.page_content}")
     return "\n\n".join(parts)
 
+
+def _batched(items: List[Any], size: int) -> List[List[Any]]:
+    return [items[i : i + size] for i in range(0, len(items), size)]
+
+
 class RAG:
     def __init__(
         self,
@@ -30,6 +51,22 @@ class RAG:
         persist_directory: str = "./.rag_db",
         collection_name: str = "agentic_rag",
         top_k: int = 5,
+        embed_batch_size: int = 64,
+        embed_concurrency: int = 4,
+        embeddings: Embeddings | None = None,
+        embedding_cache_dir: str | None = None,
+        embedding_cache_size: int = 10_000,
+        vector_backend: str = "chroma",
+        vector_index_options: Dict[str, Any] | None = None,
+        retrieval: str = "hybrid",
+        candidate_k: int = 20,
+        answer_cache: bool = True,
+        answer_cache_threshold: float = 0.95,
+        answer_cache_ttl_seconds: float = 3600.0,
+        answer_cache_size: int = 1000,
+        answer_cache_strict: bool = False,
+        context_compression: bool = True,
+        context_token_budget: int | None = 1500,
     ):
         emb_kwargs = {}
         llm_kwargs = {}
@@ -38,18 +75,41 @@ class RAG:
             emb_kwargs["base_url"] = openai_base_url
             llm_kwargs["base_url"] = openai_base_url
 
-        self.embeddings = OpenAIEmbeddings(
+        # `embeddings` lets callers plug in a local/deterministic embedding function;
+        # `embedding_model` still names its cache key space, so give it a distinct name.
+        base_embeddings = embeddings or OpenAIEmbeddings(
             api_key=openai_api_key,
             model=embedding_model,
             **emb_kwargs,
         )
 
-        self.vs = Chroma(
-            collection_name=collection_name,
-            embedding_function=self.embeddings,
-            persist_directory=persist_directory,
+        # Every document and query embedding goes through the content-addressed cache.
+        self.embeddings = CachedEmbeddings(
+            base_embeddings,
+            model_name=embedding_model,
+            cache_dir=embedding_cache_dir or os.path.join(persist_directory, "embedding_cache"),
+            memory_size=embedding_cache_size,
         )
 
+        # "chroma" (default) or "mmap" (in-process MmapVectorStore, see vectorstores.py).
+        # `self.index` exposes the same write operations for either backend.
+        if vector_backend == "mmap":
+            self.vs = MmapVectorStore(
+                os.path.join(persist_directory, f"{collection_name}.mmap"),
+                self.embeddings,
+                **(vector_index_options or {}),
+            )
+            self.index = self.vs
+        elif vector_backend == "chroma":
+            self.vs = Chroma(
+                collection_name=collection_name,
+                embedding_function=self.embeddings,
+                persist_directory=persist_directory,
+            )
+            self.index = ChromaIndexAdapter(self.vs)
+        else:
+            raise ValueError(f"Unknown vector_backend: {vector_backend!r}")
+
         self.llm = ChatOpenAI(
             api_key=openai_api_key,
             model=chat_model,
@@ -57,11 +117,51 @@ class RAG:
             **llm_kwargs,
         )
 
-        self.retriever = self.vs.as_retriever(search_kwargs={"k": top_k})
+        self.embed_batch_size = embed_batch_size
+        self.embed_concurrency = embed_concurrency
+
+        # Lexical index kept in sync with the vector store by ingest().
+        self.bm25 = BM25Index(os.path.join(persist_directory, f"{collection_name}.bm25.json"))
+
+        if retrieval == "hybrid":
+            self.retriever = HybridRetriever(
+                vector_retriever=self.vs.as_retriever(search_kwargs={"k": candidate_k}),
+                bm25=self.bm25,
+                k=top_k,
+                candidate_k=candidate_k,
+            )
+        elif retrieval == "dense":
+            self.retriever = self.vs.as_retriever(search_kwargs={"k": top_k})
+        else:
+            raise ValueError(f"Unknown retrieval mode: {retrieval!r}")
+        # Index version, shared through a file next to the index: bumped by every
+        # write (in any process, e.g. an ingest job) and re-read by mtime, so
+        # cached answers are revalidated once the catalog changes.
+        self._version_path = os.path.join(persist_directory, f"{collection_name}.version")
+        self._version_stat: tuple | None = None
+        self._version = 0
+        # strict: always revalidate cache hits against freshly retrieved doc IDs.
+        self.answer_cache_strict = answer_cache_strict
+        self.answer_cache = (
+            SemanticAnswerCache(
+                threshold=answer_cache_threshold,
+                ttl_seconds=answer_cache_ttl_seconds,
+                max_entries=answer_cache_size,
+            )
+            if answer_cache
+            else None
+        )
+
+        # Post-retrieval dedupe/rerank/pack stage (see context.py).
+        self.context_compression = context_compression
+        self.context_token_budget = context_token_budget
+
+        self.prompt = self._build_prompt()
+        self.answer_chain = self.prompt | self.llm
         self.chain = self._build_chain()
 
-    def _build_chain(self):
-        prompt = ChatPromptTemplate.from_messages(
+    def _build_prompt(self) -> ChatPromptTemplate:
+        return ChatPromptTemplate.from_messages(
             [
                 ("system", SYSTEM_PROMPT),
                 (
@@ -73,45 +173,209 @@ class RAG:
             ]
         )
 
+    def _render_context(self, question: str, docs: List[Document]) -> str:
+        if self.context_compression:
+            docs = compress_context(question, docs, max_tokens=self.context_token_budget)
+        return _format_docs(docs)
+
+    def _build_chain(self):
         setup: RunnableParallel = RunnableParallel(
-            context=self.retriever | _format_docs,
+            docs=self.retriever,
             question=RunnablePassthrough(),
         )
+        render = RunnableLambda(
+            lambda x: {
+                "context": self._render_context(x["question"], x["docs"]),
+                "question": x["question"],
+            }
+        )
 
-        return setup | prompt | self.llm
+        return setup | render | self.prompt | self.llm
 
     def _chunk(
         self,
         texts: Iterable[str],
         metadatas: Iterable[Dict[str, Any]] | None = None,
+        ids: Iterable[str] | None = None,
         chunk_size: int = 800,
         chunk_overlap: int = 200,
     ) -> List[Document]:
-        texts = list(texts)
-        metadatas = list(metadatas) if metadatas is not None else [{} for _ in texts]
+        records = zip(
+            texts,
+            metadatas if metadatas is not None else itertools.repeat({}),
+            ids if ids is not None else itertools.repeat(None),
+        )
+        return split_records(records, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
 
-        docs = [
-            Document(page_content=t, metadata=meta or {})
-            for t, meta in zip(texts, metadatas)
-        ]
+    def _existing_chunk_ids(self, doc_ids: List[str]) -> Set[str]:
+        """
+        IDs of all chunks currently stored for the given source documents.
+        """
+        existing: Set[str] = set()
+        for batch in _batched(doc_ids, 500):
+            existing.update(self.index.ids_where_in(DOC_ID_KEY, batch))
+        return existing
 
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap,
-        )
-        return splitter.split_documents(docs)
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed texts in batches of ``embed_batch_size``, running up to
+        ``embed_concurrency`` embedding requests at a time.
+        """
+        batches = _batched(texts, self.embed_batch_size)
+        if len(batches) <= 1 or self.embed_concurrency <= 1:
+            return [v for b in batches for v in self.embeddings.embed_documents(b)]
+
+        with ThreadPoolExecutor(max_workers=self.embed_concurrency) as pool:
+            results = pool.map(self.embeddings.embed_documents, batches)
+            return [v for batch_vectors in results for v in batch_vectors]
+
+    def _sync_chunks(
+        self,
+        chunks: List[Document],
+        stats: IngestStats,
+        seen_docs: Set[int] | None = None,
+        lexical: bool = True,
+    ) -> None:
+        """
+        Diff one batch of chunks against the store: skip unchanged chunks,
+        embed + upsert the rest, then delete stale chunks of the batch's
+        documents (only after the upsert succeeded, so a failed embedding
+        never leaves a document without chunks).
+
+        ``seen_docs`` (streaming ingest) holds ``doc_key``s of documents synced
+        earlier in the same run; their chunks in this batch are added without
+        deleting the ones written before. ``lexical=False`` leaves the BM25
+        index alone; the caller rebuilds it with ``_rebuild_lexical``.
+
+        Does not persist; callers do that once via ``_persist``.
+        """
+        by_id: Dict[str, Document] = {}
+        for chunk in chunks:
+            by_id.setdefault(chunk_id(chunk), chunk)
+        if not by_id:
+            return
+
+        doc_ids = sorted({c.metadata[DOC_ID_KEY] for c in by_id.values()})
+        existing = self._existing_chunk_ids(doc_ids)
+        new_ids = [cid for cid in by_id if cid not in existing]
+
+        if seen_docs:
+            fresh = [d for d in doc_ids if doc_key(d) not in seen_docs]
+            stale = self._existing_chunk_ids(fresh) - by_id.keys() if fresh else set()
+        else:
+            stale = existing - by_id.keys()
+        if seen_docs is not None:
+            seen_docs.update(doc_key(d) for d in doc_ids)
+
+        if new_ids:
+            new_chunks = [by_id[cid] for cid in new_ids]
+            vectors = self._embed([c.page_content for c in new_chunks])
+            for batch in _batched(list(range(len(new_ids))), self.embed_batch_size):
+                self.index.upsert(
+                    ids=[new_ids[i] for i in batch],
+                    embeddings=[vectors[i] for i in batch],
+                    metadatas=[new_chunks[i].metadata for i in batch],
+                    documents=[new_chunks[i].page_content for i in batch],
+                )
+
+        # Also backfills chunks that predate the BM25 index.
+        lexical_missing = [cid for cid in by_id if cid not in self.bm25] if lexical else []
+        if lexical_missing:
+            self.bm25.add(
+                lexical_missing,
+                [by_id[cid].page_content for cid in lexical_missing],
+                [by_id[cid].metadata for cid in lexical_missing],
+            )
+
+        if stale:
+            self.index.delete(list(stale))
+            if lexical:
+                self.bm25.remove(stale)
+
+        stats.chunks += len(by_id)
+        stats.written += len(new_ids)
+        stats.unchanged += len(by_id) - len(new_ids)
+        stats.deleted += len(stale)
+        stats.lexical_added += len(lexical_missing)
+
+    @property
+    def index_version(self) -> int:
+        """
+        Current index version; re-read from the version file when its
+        (inode, mtime) changes, which costs one stat() per lookup.
+        """
+        try:
+            st = os.stat(self._version_path)
+        except FileNotFoundError:
+            return self._version
+        key = (st.st_ino, st.st_mtime_ns)
+        if key != self._version_stat:
+            try:
+                with open(self._version_path, "r", encoding="utf-8") as f:
+                    self._version = int(f.read().strip() or 0)
+                self._version_stat = key
+            except (OSError, ValueError):
+                pass
+        return self._version
+
+    def _bump_version(self) -> None:
+        # A fresh timestamp rather than a counter: concurrent writers in
+        # different processes can't both produce the same "next" version.
+        version = max(time.time_ns(), self.index_version + 1)
+        tmp = f"{self._version_path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(str(version))
+        os.replace(tmp, self._version_path)
+        self._version = version
+
+    def _persist(self, stats: IngestStats, lexical: bool = True) -> None:
+        if stats.written or stats.deleted:
+            self.index.persist()
+        if lexical and (stats.lexical_added or stats.deleted):
+            self.bm25.persist()
+        if stats.written or stats.deleted or stats.lexical_added:
+            # Hybrid retrieval reads BM25 too, so lexical-only changes count.
+            self._bump_version()
+
+    def _rebuild_lexical(self, stats: IngestStats) -> None:
+        """
+        Rebuild the BM25 index from the persisted chunks, page by page, after
+        a streaming ingest (which leaves BM25 out of the per-batch path so it
+        doesn't grow with the run). Skipped when no chunk was written or
+        deleted and BM25 already holds exactly the stored chunks.
+        """
+        if not (stats.written or stats.deleted) and self.bm25.ids() == self.index.chunk_ids():
+            return
+        self.bm25.clear()
+        for ids, texts, metas in self.index.iter_chunks():
+            self.bm25.add(ids, texts, metas)
+        stats.lexical_added = len(self.bm25)
+        self.bm25.persist()
+        self._bump_version()
 
     def ingest(
         self,
         texts: Iterable[str],
         metadatas: Iterable[Dict[str, Any]] | None = None,
         *,
+        ids: Iterable[str] | None = None,
         chunk_size: int = 800,
         chunk_overlap: int = 200,
     ) -> int:
+        """
+        Incrementally sync documents into the vector store.
+
+        ``ids`` are stable source document IDs (e.g. product IDs). Chunks are
+        keyed by a content hash, so unchanged chunks are skipped, new/changed
+        ones are embedded and upserted, and chunks that no longer exist for a
+        re-ingested document are deleted. Returns the number of chunks written.
+
+        For large exports use ``ingest_stream``, which keeps memory bounded.
+        """
         chunks = self._chunk(
             texts=texts,
             metadatas=metadatas,
+            ids=ids,
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
         )
@@ -119,10 +383,145 @@ class RAG:
         if not chunks:
             return 0
 
-        self.vs.add_documents(chunks)
-        self.vs.persist()
-        return len(chunks)
+        stats = IngestStats()
+        self._sync_chunks(chunks, stats)
+        stats.docs = len({c.metadata[DOC_ID_KEY] for c in chunks})
+
+        logger.info(
+            "RAG ingest: %d docs, %d chunks (%d new, %d unchanged, %d deleted)",
+            stats.docs,
+            stats.chunks,
+            stats.written,
+            stats.unchanged,
+            stats.deleted,
+        )
+
+        self._persist(stats)
+        return stats.written
+
+    def ingest_stream(
+        self,
+        records: Iterable[Record],
+        **kwargs: Any,
+    ) -> IngestStats:
+        """
+        Memory-bounded ingestion of (text, metadata, doc_id) records, e.g. from
+        ``iter_jsonl`` / ``iter_csv`` or any generator. See ``ingest.stream_ingest``
+        for batching, worker and progress options.
+        """
+        return stream_ingest(self, records, **kwargs)
+
+    def delete_documents(self, doc_ids: Iterable[str]) -> int:
+        """
+        Remove all chunks belonging to the given source documents
+        (e.g. products dropped from the catalog). Returns the number deleted.
+        """
+        doc_ids = list(doc_ids)
+        stale = self._existing_chunk_ids(doc_ids)
+        lexical_stale = self.bm25.ids_where_in(DOC_ID_KEY, doc_ids)
+        if lexical_stale:
+            self.bm25.remove(lexical_stale)
+            self.bm25.persist()
+        if stale:
+            self.index.delete(list(stale))
+            self.index.persist()
+        if stale or lexical_stale:
+            self._bump_version()
+        return len(stale)
 
     def ask(self, question: str) -> Dict[str, Any]:
-        resp = self.chain.invoke(question)
-        return {"answer": resp.content}
+        """
+        Answer ``question`` from retrieved context.
+
+        With the answer cache enabled, a semantically similar earlier question
+        is reused when the index hasn't changed since it was answered, or when
+        retrieval still returns exactly the same documents.
+        """
+        if self.answer_cache is None:
+            resp = self.chain.invoke(question)
+            return {"answer": resp.content}
+
+        qvec = self.embeddings.embed_query(question)
+        hit = self.answer_cache.lookup(qvec)
+        if hit is not None and hit.index_version == self.index_version and not self.answer_cache_strict:
+            return {"answer": hit.answer, "cached": True}
+
+        # The query embedding is cached now, so retrieval only pays for the search.
+        docs = self.retriever.invoke(question)
+        doc_ids = tuple(document_id(d) for d in docs)
+        if hit is not None:
+            if hit.doc_ids == doc_ids:
+                hit.index_version = self.index_version
+                return {"answer": hit.answer, "cached": True}
+            self.answer_cache.discard(hit)
+
+        resp = self.answer_chain.invoke(
+            {"context": self._render_context(question, docs), "question": question}
+        )
+        self.answer_cache.store(question, qvec, resp.content, doc_ids, self.index_version)
+        return {"answer": resp.content, "cached": False}
+
+    async def _acached(self, question: str):
+        """
+        Async cache probe shared by aask/astream.
+
+        Returns (answer, None, None, None) on a valid hit, otherwise
+        (None, query vector, retrieved docs, doc IDs) for the caller to generate.
+        """
+        qvec = await run_sync(self.embeddings.embed_query, question)
+        hit = self.answer_cache.lookup(qvec)
+        if hit is not None and hit.index_version == self.index_version and not self.answer_cache_strict:
+            return hit.answer, None, None, None
+
+        docs = await self.retriever.ainvoke(question)
+        doc_ids = tuple(document_id(d) for d in docs)
+        if hit is not None:
+            if hit.doc_ids == doc_ids:
+                hit.index_version = self.index_version
+                return hit.answer, None, None, None
+            self.answer_cache.discard(hit)
+        return None, qvec, docs, doc_ids
+
+    async def aask(self, question: str) -> Dict[str, Any]:
+        """
+        Async ``ask``: retrieval runs on the bounded executor and generation
+        uses ``ainvoke``, so the event loop is never blocked.
+        """
+        if self.answer_cache is None:
+            resp = await self.chain.ainvoke(question)
+            return {"answer": resp.content}
+
+        answer, qvec, docs, doc_ids = await self._acached(question)
+        if answer is not None:
+            return {"answer": answer, "cached": True}
+
+        resp = await self.answer_chain.ainvoke(
+            {"context": self._render_context(question, docs), "question": question}
+        )
+        self.answer_cache.store(question, qvec, resp.content, doc_ids, self.index_version)
+        return {"answer": resp.content, "cached": False}
+
+    async def astream(self, question: str) -> AsyncIterator[str]:
+        """
+        Stream answer tokens as the LLM generates them. A cache hit is
+        yielded as a single chunk.
+        """
+        if self.answer_cache is None:
+            async for chunk in self.chain.astream(question):
+                if chunk.content:
+                    yield chunk.content
+            return
+
+        answer, qvec, docs, doc_ids = await self._acached(question)
+        if answer is not None:
+            yield answer
+            return
+
+        parts: List[str] = []
+        async for chunk in self.answer_chain.astream(
+            {"context": self._render_context(question, docs), "question": question}
+        ):
+            if chunk.content:
+                parts.append(chunk.content)
+                yield chunk.content
+        self.answer_cache.store(question, qvec, "".join(parts), doc_ids, self.index_version)
@@ -0,0 +1,278 @@
+# rag_struct/embedding_cache.py
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+
+def embedding_key(model_name: str, text: str) -> str:
+    """
+    Content address for an embedding: (model name, text hash).
+    """
+    h = hashlib.sha256()
+    h.update(model_name.encode("utf-8"))
+    h.update(b"\x00")
+    h.update(text.encode("utf-8"))
+    return h.hexdigest()
+
+
+class _MemoryLRU:
+    """
+    Small thread-safe LRU of key -> float32 vector.
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vec = self._data.get(key)
+            if vec is not None:
+                self._data.move_to_end(key)
+            return vec
+
+    def put(self, key: str, vec: np.ndarray) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = vec
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+
+class DiskEmbeddingStore:
+    """
+    Append-only on-disk embedding store, shareable between processes (the
+    API server and ingest jobs may point at the same directory).
+
+    Layout inside ``directory``:
+      - vectors.f32 : raw float32 matrix, one row per key (read via np.memmap)
+      - index.txt   : one key per line; line number == row number
+      - meta.json   : {"dim": <vector dimension>}
+      - .lock       : flock'd by writers
+
+    Writers hold an exclusive flock, pick up rows appended by other processes
+    from index.txt, and append vectors before their index lines. A crash
+    mid-write leaves at most orphan vector rows past the last index line;
+    they are truncated on the next load or write.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+        self._vectors_path = os.path.join(directory, "vectors.f32")
+        self._index_path = os.path.join(directory, "index.txt")
+        self._meta_path = os.path.join(directory, "meta.json")
+        self._lock_path = os.path.join(directory, ".lock")
+
+        self._lock = threading.Lock()
+        self._rows: Dict[str, int] = {}
+        self._n_rows = 0
+        # Bytes of index.txt already read (complete lines only).
+        self._index_offset = 0
+        self._dim: Optional[int] = None
+        self._mmap: Optional[np.memmap] = None
+        with self._lock, self._file_lock():
+            self._refresh(repair=True)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """Exclusive cross-process lock (no-op where flock is unavailable)."""
+        if fcntl is None:
+            yield
+            return
+        with open(self._lock_path, "a") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _refresh(self, repair: bool = False) -> None:
+        """
+        Read index lines appended since the last refresh (by any process).
+        With ``repair`` (file lock held), drop rows past the last index line
+        and index lines without a vector, so row numbers stay aligned.
+        """
+        if self._dim is None:
+            if not os.path.exists(self._meta_path):
+                return
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                self._dim = int(json.load(f)["dim"])
+
+        row_bytes = 4 * self._dim
+        size = os.path.getsize(self._vectors_path) if os.path.exists(self._vectors_path) else 0
+        max_rows = size // row_bytes
+
+        if os.path.exists(self._index_path):
+            with open(self._index_path, "rb") as f:
+                f.seek(self._index_offset)
+                for line in f:
+                    if not line.endswith(b"\n") or self._n_rows >= max_rows:
+                        break
+                    self._rows[line[:-1].decode("utf-8")] = self._n_rows
+                    self._n_rows += 1
+                    self._index_offset += len(line)
+
+        if repair:
+            if os.path.exists(self._index_path) and os.path.getsize(self._index_path) > self._index_offset:
+                os.truncate(self._index_path, self._index_offset)
+            if size > self._n_rows * row_bytes:
+                os.truncate(self._vectors_path, self._n_rows * row_bytes)
+
+    def _matrix(self) -> np.memmap:
+        n = self._n_rows
+        if self._mmap is None or self._mmap.shape[0] < n:
+            self._mmap = np.memmap(
+                self._vectors_path, dtype=np.float32, mode="r", shape=(n, self._dim)
+            )
+        return self._mmap
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        with self._lock:
+            if any(k not in self._rows for k in keys):
+                # Another process may have written them since.
+                self._refresh()
+            rows = {k: self._rows[k] for k in keys if k in self._rows}
+            if not rows:
+                return {}
+            matrix = self._matrix()
+            return {k: np.array(matrix[r]) for k, r in rows.items()}
+
+    def put_many(self, items: Dict[str, np.ndarray]) -> None:
+        with self._lock:
+            items = {k: v for k, v in items.items() if k not in self._rows}
+            if not items:
+                return
+
+            with self._file_lock():
+                self._refresh(repair=True)
+                items = {k: v for k, v in items.items() if k not in self._rows}
+                if not items:
+                    return
+
+                if self._dim is None:
+                    self._dim = int(next(iter(items.values())).shape[0])
+                    with open(self._meta_path, "w", encoding="utf-8") as f:
+                        json.dump({"dim": self._dim}, f)
+
+                keys = list(items)
+                block = np.stack([items[k] for k in keys]).astype(np.float32, copy=False)
+                if block.shape[1] != self._dim:
+                    raise ValueError(
+                        f"Embedding dim {block.shape[1]} does not match cache dim {self._dim}"
+                    )
+
+                with open(self._vectors_path, "ab") as f:
+                    f.write(block.tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+                lines = "".join(k + "\n" for k in keys).encode("utf-8")
+                with open(self._index_path, "ab") as f:
+                    f.write(lines)
+
+                # After repair, the file held exactly _n_rows rows.
+                for i, k in enumerate(keys):
+                    self._rows[k] = self._n_rows + i
+                self._n_rows += len(keys)
+                self._index_offset += len(lines)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Content-addressed cache in front of any LangChain ``Embeddings``.
+
+    Lookups go memory LRU -> disk store -> underlying model, and only texts
+    missing from both tiers are sent to the model (deduplicated, in one call).
+    Documents and queries share the same (model name, text hash) key space.
+    """
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        *,
+        model_name: str,
+        cache_dir: Optional[str] = None,
+        memory_size: int = 10_000,
+    ) -> None:
+        self.underlying = underlying
+        self.model_name = model_name
+        self.memory = _MemoryLRU(memory_size)
+        self.disk = DiskEmbeddingStore(cache_dir) if cache_dir else None
+
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        missing: List[str] = []
+        for k in keys:
+            vec = self.memory.get(k)
+            if vec is None:
+                missing.append(k)
+            else:
+                found[k] = vec
+
+        if missing and self.disk is not None:
+            for k, vec in self.disk.get_many(missing).items():
+                self.memory.put(k, vec)
+                found[k] = vec
+        return found
+
+    def _store(self, new: Dict[str, np.ndarray]) -> None:
+        for k, vec in new.items():
+            self.memory.put(k, vec)
+        if self.disk is not None:
+            self.disk.put_many(new)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [embedding_key(self.model_name, t) for t in texts]
+        found = self._lookup(keys)
+
+        todo: Dict[str, str] = {}
+        for k, t in zip(keys, texts):
+            if k not in found:
+                todo.setdefault(k, t)
+
+        self.hits += len(texts) - len(todo)
+        self.misses += len(todo)
+
+        if todo:
+            vectors = self.underlying.embed_documents(list(todo.values()))
+            new = {
+                k: np.asarray(v, dtype=np.float32) for k, v in zip(todo.keys(), vectors)
+            }
+            self._store(new)
+            found.update(new)
+
+        return [found[k].tolist() for k in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = embedding_key(self.model_name, text)
+        vec = self._lookup([key]).get(key)
+        if vec is not None:
+            self.hits += 1
+            return vec.tolist()
+
+        self.misses += 1
+        vec = np.asarray(self.underlying.embed_query(text), dtype=np.float32)
+        self._store({key: vec})
+        return vec.tolist()
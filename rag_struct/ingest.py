@@ -0,0 +1,230 @@
+# rag_struct/ingest.py
+import csv
+import json
+import logging
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from .chunk_ids import DOC_ID_KEY, content_hash
+
+logger = logging.getLogger(__name__)
+
+# (text, metadata, doc_id) -- doc_id may be None.
+Record = Tuple[str, Dict[str, Any], Optional[str]]
+
+
+@dataclass
+class IngestStats:
+    """
+    Running counters for an ingest run; passed to progress callbacks.
+    """
+
+    docs: int = 0
+    chunks: int = 0
+    written: int = 0
+    unchanged: int = 0
+    deleted: int = 0
+    lexical_added: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    @property
+    def docs_per_second(self) -> float:
+        return self.docs / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def split_records(
+    records: Iterable[Record],
+    chunk_size: int = 800,
+    chunk_overlap: int = 200,
+) -> List[Document]:
+    """
+    Split records into chunk Documents tagged with their source ``doc_id``.
+
+    Top-level (picklable) so it can run in a process pool.
+    """
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+    )
+    chunks: List[Document] = []
+    for text, meta, doc_id in records:
+        meta = dict(meta or {})
+        # Without an explicit ID, fall back to the text hash: identical texts
+        # still dedupe, but edits to a document can't replace its old chunks.
+        meta[DOC_ID_KEY] = doc_id or meta.get(DOC_ID_KEY) or content_hash(text)
+        chunks.extend(splitter.split_documents([Document(page_content=text, metadata=meta)]))
+    return chunks
+
+
+def _text_of(row: Dict[str, Any], text_field: str | Sequence[str]) -> str:
+    if isinstance(text_field, str):
+        return str(row.get(text_field) or "")
+    return "\n".join(str(row[f]) for f in text_field if row.get(f))
+
+
+def _record_of(
+    row: Dict[str, Any],
+    text_field: str | Sequence[str],
+    id_field: Optional[str],
+    metadata_fields: Optional[Sequence[str]],
+) -> Record:
+    text_fields = {text_field} if isinstance(text_field, str) else set(text_field)
+    if metadata_fields is None:
+        meta = {k: v for k, v in row.items() if k not in text_fields and v is not None}
+    else:
+        meta = {k: row[k] for k in metadata_fields if row.get(k) is not None}
+    doc_id = str(row[id_field]) if id_field and row.get(id_field) is not None else None
+    return _text_of(row, text_field), meta, doc_id
+
+
+def iter_jsonl(
+    path: str,
+    *,
+    text_field: str | Sequence[str] = "text",
+    id_field: Optional[str] = "id",
+    metadata_fields: Optional[Sequence[str]] = None,
+) -> Iterator[Record]:
+    """
+    Lazily read records from a JSONL export, one object per line.
+
+    ``text_field`` may name several fields (e.g. ("title", "description")),
+    which are joined with newlines. By default every other non-null field
+    becomes metadata.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield _record_of(json.loads(line), text_field, id_field, metadata_fields)
+
+
+def iter_csv(
+    path: str,
+    *,
+    text_field: str | Sequence[str] = "text",
+    id_field: Optional[str] = "id",
+    metadata_fields: Optional[Sequence[str]] = None,
+) -> Iterator[Record]:
+    """
+    Lazily read records from a CSV export with a header row.
+    """
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            yield _record_of(row, text_field, id_field, metadata_fields)
+
+
+def _batches(records: Iterable[Record], size: int) -> Iterator[List[Record]]:
+    """
+    Batches of about ``size`` records; consecutive records with the same
+    doc_id are never split across two batches.
+    """
+    batch: List[Record] = []
+    for record in records:
+        if len(batch) >= size and (record[2] is None or record[2] != batch[-1][2]):
+            yield batch
+            batch = []
+        batch.append(record)
+    if batch:
+        yield batch
+
+
+def stream_ingest(
+    rag: Any,
+    records: Iterable[Record],
+    *,
+    batch_size: int = 256,
+    workers: int = 2,
+    max_pending: Optional[int] = None,
+    chunk_size: int = 800,
+    chunk_overlap: int = 200,
+    checkpoint_every: int = 64,
+    progress: Optional[Callable[[IngestStats], None]] = None,
+) -> IngestStats:
+    """
+    Pipeline records through split -> embed -> upsert in bounded batches.
+
+    - Splitting runs in a process pool of ``workers`` (0 = inline).
+    - At most ``max_pending`` split batches are in flight; the input iterator
+      is only advanced when a slot frees up, so slow embedding/upserts apply
+      backpressure and the pipeline holds at most batch_size * max_pending
+      records at a time.
+    - Embedding + upsert of batch N overlaps with splitting of later batches.
+    - The vector store is persisted every ``checkpoint_every`` batches (0 =
+      only at the end), which flushes the in-memory tail of the mmap
+      backend, and once more at the end if anything changed since.
+    - BM25 is not updated per batch: it is rebuilt from the persisted chunks
+      once the stream ends, so until then hybrid retrieval sees the old
+      lexical index.
+    - Documents seen in the run are tracked as 64-bit ``doc_key`` digests.
+
+    Consecutive records of one doc_id stay in one batch. A doc_id seen again
+    in a later batch only adds chunks; its stale chunks were already deleted
+    when it was first seen.
+    """
+    stats = IngestStats()
+    batches = _batches(records, batch_size)
+    seen_docs: Set[int] = set()
+    # (written, deleted) as of the last persist.
+    persisted = (0, 0)
+
+    def _checkpoint() -> None:
+        nonlocal persisted
+        if (stats.written, stats.deleted) != persisted:
+            rag._persist(stats, lexical=False)
+            persisted = (stats.written, stats.deleted)
+
+    def _consume(chunks: List[Document], n_docs: int, index: int) -> None:
+        stats.docs += n_docs
+        rag._sync_chunks(chunks, stats, seen_docs=seen_docs, lexical=False)
+        if checkpoint_every and index % checkpoint_every == 0:
+            _checkpoint()
+        logger.info(
+            "RAG stream ingest: %d docs, %d chunks (%d written) in %.1fs — %.1f docs/s, %.1f chunks/s",
+            stats.docs,
+            stats.chunks,
+            stats.written,
+            stats.elapsed,
+            stats.docs_per_second,
+            stats.chunks_per_second,
+        )
+        if progress is not None:
+            progress(stats)
+
+    if workers <= 0:
+        for i, batch in enumerate(batches, start=1):
+            _consume(split_records(batch, chunk_size, chunk_overlap), len(batch), i)
+    else:
+        max_pending = max_pending or workers * 2
+        pending: Deque[Tuple[Future, int]] = deque()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            done = 0
+            for batch in batches:
+                if len(pending) >= max_pending:
+                    fut, n = pending.popleft()
+                    done += 1
+                    _consume(fut.result(), n, done)
+                pending.append(
+                    (pool.submit(split_records, batch, chunk_size, chunk_overlap), len(batch))
+                )
+            while pending:
+                fut, n = pending.popleft()
+                done += 1
+                _consume(fut.result(), n, done)
+
+    _checkpoint()
+    rag._rebuild_lexical(stats)
+    return stats
@@ -1,14 +1,24 @@
 # rag_struct/main.py
 
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 
-from .agents import build_search_agent
+from .pool import get_agent_pool, warm_rag
+from .search_routes import get_search_agent, router as search_router, stream_with_pooled_agent
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the SearchAgent pool and warm RAG/Chroma before taking traffic.
+    await get_agent_pool().start(warmups=[warm_rag])
+    yield
 
-app = FastAPI()
 
-# Create a single SearchAgent instance for the whole server
-search_agent = build_search_agent()
+app = FastAPI(lifespan=lifespan)
+app.include_router(search_router)
 
 
 class SearchRequest(BaseModel):
@@ -16,20 +26,40 @@ class SearchRequest(BaseModel):
     query: str
 
 
-@app.post("/search")
-async def search_endpoint(payload: SearchRequest):
-    """
-    Main API endpoint for external callers (e.g. B2C app).
-    Calls the SearchAgent with user_id + query.
-    """
-
-    # Construct the agent prompt
-    prompt = (
+def _build_prompt(payload: SearchRequest) -> str:
+    return (
         f"User id: {payload.user_id}. "
         f"User query: {payload.query}. "
         "Use tools (RAG, user history, filters) if needed. "
         "Return a helpful, concise answer and list any found products."
     )
 
-    result = search_agent.run(prompt)
+
+@app.get("/readyz")
+async def readyz():
+    """
+    Readiness probe: 200 once the agent pool is built and RAG is warm.
+    """
+    pool = get_agent_pool()
+    if not pool.ready:
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    return {"status": "ready", "agents_available": pool.available, "pool_size": pool.size}
+
+
+@app.post("/search")
+async def search_endpoint(payload: SearchRequest, search_agent = Depends(get_search_agent)):
+    """
+    Main API endpoint for external callers (e.g. B2C app).
+    Calls the SearchAgent with user_id + query.
+    """
+    # arun keeps the event loop free while the agent and its tools run.
+    result = await search_agent.arun(_build_prompt(payload))
     return {"answer": result}
+
+
+@app.post("/search/stream")
+async def search_stream_endpoint(payload: SearchRequest):
+    """
+    Same as /search, but streams answer tokens as plain text while they are generated.
+    """
+    return await stream_with_pooled_agent(_build_prompt(payload))
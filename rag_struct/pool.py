@@ -0,0 +1,115 @@
+# rag_struct/pool.py
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, List, Optional
+
+from .concurrency import run_sync
+
+logger = logging.getLogger(__name__)
+
+
+class AgentPoolExhausted(RuntimeError):
+    """Raised when no agent could be checked out within the timeout."""
+
+
+class AgentPool:
+    """
+    Fixed-size pool of pre-built agent executors.
+
+    Agents are built once at startup (off the event loop) and checked out
+    per request, so requests never pay LLM-client/agent construction cost.
+    The pool size is also the concurrency bound: at most ``size`` requests
+    run an agent at a time, the rest wait up to ``checkout_timeout``.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        *,
+        size: int = 4,
+        checkout_timeout: float = 30.0,
+    ) -> None:
+        self.factory = factory
+        self.size = size
+        self.checkout_timeout = checkout_timeout
+        self._queue: "asyncio.Queue[Any]" = asyncio.Queue()
+        self._ready = False
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    @property
+    def available(self) -> int:
+        return self._queue.qsize()
+
+    async def start(self, warmups: Optional[List[Callable[[], Any]]] = None) -> None:
+        """
+        Build all agents concurrently, run the (sync) warm-up hooks, then mark ready.
+        Warm-up failures are logged but don't block startup.
+        """
+        t0 = time.perf_counter()
+        agents = await asyncio.gather(*(run_sync(self.factory) for _ in range(self.size)))
+        for agent in agents:
+            self._queue.put_nowait(agent)
+
+        for warm in warmups or []:
+            try:
+                await run_sync(warm)
+            except Exception:
+                logger.exception("Agent pool warm-up step %r failed", warm)
+
+        self._ready = True
+        logger.info(
+            "Agent pool ready: %d agents in %.2fs", self.size, time.perf_counter() - t0
+        )
+
+    async def acquire(self) -> Any:
+        """Take an agent, waiting up to ``checkout_timeout``; pair with ``release``."""
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout=self.checkout_timeout)
+        except asyncio.TimeoutError as exc:
+            raise AgentPoolExhausted(
+                f"No search agent available within {self.checkout_timeout}s"
+            ) from exc
+
+    def release(self, agent: Any) -> None:
+        self._queue.put_nowait(agent)
+
+    @asynccontextmanager
+    async def checkout(self) -> AsyncIterator[Any]:
+        agent = await self.acquire()
+        try:
+            yield agent
+        finally:
+            self.release(agent)
+
+
+_pool: Optional[AgentPool] = None
+
+
+def get_agent_pool() -> AgentPool:
+    global _pool
+    if _pool is None:
+        from .agents import build_search_agent
+
+        _pool = AgentPool(
+            build_search_agent,
+            size=int(os.getenv("SEARCH_AGENT_POOL_SIZE", "4")),
+            checkout_timeout=float(os.getenv("SEARCH_AGENT_CHECKOUT_TIMEOUT", "30")),
+        )
+    return _pool
+
+
+def warm_rag() -> None:
+    """
+    Open the vector store and run one retrieval so the first real query
+    doesn't pay for lazy initialization or cold connections.
+    """
+    from .tools import get_rag
+
+    rag = get_rag()
+    rag.retriever.invoke(os.getenv("RAG_WARMUP_QUERY", "warmup"))
@@ -1,8 +1,12 @@
 # api/search_routes.py
-from fastapi import APIRouter, Depends
+from typing import Any, AsyncIterator
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from starlette.background import BackgroundTask
 
-from .agents import build_search_agent
+from .pool import AgentPoolExhausted, get_agent_pool
 
 router = APIRouter(prefix="/search", tags=["search"])
 
@@ -11,23 +15,79 @@ class SearchQuery(BaseModel):
     query: str
 
 
-def get_search_agent():
-    # you may want to make this a singleton in real app
-    return build_search_agent()
+async def get_search_agent() -> AsyncIterator[Any]:
+    """
+    Check out a pre-built SearchAgent from the pool for the duration of the request.
+    """
+    try:
+        async with get_agent_pool().checkout() as agent:
+            yield agent
+    except AgentPoolExhausted as exc:
+        raise HTTPException(status_code=503, detail=str(exc)) from exc
 
 
-@router.post("/ask")
-async def search_ask(payload: SearchQuery, search_agent = Depends(get_search_agent)):
+async def stream_with_pooled_agent(prompt: str) -> StreamingResponse:
     """
-    Main entry point from B2C app.
+    StreamingResponse of answer tokens from a pooled agent.
+
+    The agent is checked out before the response starts, so an exhausted pool
+    is a 503 like the non-streaming route rather than a truncated 200. It is
+    held for the whole stream (a yield-dependency could hand it back before
+    streaming ends) and released exactly once, even if the client disconnects
+    before the body starts.
     """
+    from .agents import astream_answer
+
+    pool = get_agent_pool()
+    try:
+        agent = await pool.acquire()
+    except AgentPoolExhausted as exc:
+        raise HTTPException(status_code=503, detail=str(exc)) from exc
+
+    released = False
+
+    def release() -> None:
+        nonlocal released
+        if not released:
+            released = True
+            pool.release(agent)
+
+    async def tokens() -> AsyncIterator[str]:
+        try:
+            async for token in astream_answer(agent, prompt):
+                yield token
+        finally:
+            release()
+
+    return StreamingResponse(
+        tokens(),
+        media_type="text/plain; charset=utf-8",
+        background=BackgroundTask(release),
+    )
+
+
+def _combined_query(payload: SearchQuery) -> str:
     # 1) You can inject user_id into the prompt so tools know what to do
-    combined_query = (
+    return (
         f"User id: {payload.user_id}. "
         f"User query: {payload.query}. "
         "If needed, call tools to fetch user's previous product views/events, "
         "then filter for black jeans and return only those products."
     )
 
-    result = search_agent.run(combined_query)
+
+@router.post("/ask")
+async def search_ask(payload: SearchQuery, search_agent = Depends(get_search_agent)):
+    """
+    Main entry point from B2C app.
+    """
+    result = await search_agent.arun(_combined_query(payload))
     return {"answer": result}
+
+
+@router.post("/ask/stream")
+async def search_ask_stream(payload: SearchQuery):
+    """
+    Streaming variant of /ask: answer tokens are sent as plain text as they arrive.
+    """
+    return await stream_with_pooled_agent(_combined_query(payload))
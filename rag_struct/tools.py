@@ -1,42 +1,61 @@
 # agentic_ai_sdk/tools.py
+import threading
 from typing import List, Dict, Any
-from langchain.tools import tool
+from langchain.tools import StructuredTool, tool
 
 from .core import RAG
 
 
 # Singleton-ish RAG instance (configure properly in your app)
 _rag: RAG | None = None
+_rag_lock = threading.Lock()
 
 
 def get_rag() -> RAG:
     global _rag
     if _rag is None:
-        import os
-        _rag = RAG(
-            openai_api_key=os.environ["OPENAI_API_KEY"],
-            openai_base_url=os.getenv("OPENAI_BASE_URL"),
-            persist_directory="./.rag_db",
-            collection_name="agentic_rag",
-        )
+        # Pool warm-up and tool calls may race to create it from executor threads.
+        with _rag_lock:
+            if _rag is None:
+                import os
+                _rag = RAG(
+                    openai_api_key=os.environ["OPENAI_API_KEY"],
+                    openai_base_url=os.getenv("OPENAI_BASE_URL"),
+                    persist_directory="./.rag_db",
+                    collection_name="agentic_rag",
+                )
     return _rag
 
 
 # ---------- RAG tool (SearchAgent will use this) ----------
 
-@tool("product_rag_search")
-def product_rag_search(query: str) -> str:
-    """
-    Semantic search over product descriptions, categories, and other text.
-    Use this when the user describes products in natural language
-    (e.g. 'black jeans I saw last time', 'stretchable slim denim').
-    Returns a textual summary of relevant items.
-    """
+def _product_rag_search(query: str) -> str:
     rag = get_rag()
     result = rag.ask(query)
     return result["answer"]
 
 
+async def _aproduct_rag_search(query: str) -> str:
+    rag = get_rag()
+    result = await rag.aask(query)
+    return result["answer"]
+
+
+# Sync + async implementations: async agent runs (arun/astream) use the
+# coroutine, so RAG retrieval and generation never block the event loop.
+product_rag_search = StructuredTool.from_function(
+    func=_product_rag_search,
+    coroutine=_aproduct_rag_search,
+    name="product_rag_search",
+    description=(
+        "Semantic search over product descriptions, categories, and other text. "
+        "Use this when the user describes products in natural language "
+        "(e.g. 'black jeans I saw last time', 'stretchable slim denim'). "
+        "Returns a textual summary of relevant items."
+    ),
+)
+
+
 # ---------- UserAgent-related tools (stubs for now) ----------
 
 @tool("get_user_previous_product_views")
@@ -75,20 +94,19 @@ def search_products_by_filters(
     """
     Search products via structured filters (color, category) from your product service.
     Use when filters are clear like color='black' and category='jeans'.
-    CURRENTLY STUB: replace with real product search API.
+    Served by the local catalog index (core.product_search): bitset facet
+    filters, no network call.
     """
-    # This is where you'd call Warehouse Manager's search endpoint.
+    from core.product_search import get_product_search
+
+    hits = get_product_search().search(filters={"color": color, "category": category}, k=20)
     return [
         {
-            "product_id": "JEANS-BLACK-001",
-            "name": "SuperSoft Black Jeans",
-            "color": "black",
-            "category": "jeans",
-        },
-        {
-            "product_id": "JEANS-BLACK-002",
-            "name": "UltraStretch Black Jeans",
-            "color": "black",
-            "category": "jeans",
-        },
-    ]
\ No newline at end of file
+            "product_id": hit["id"],
+            "name": hit.get("title"),
+            "color": hit.get("color"),
+            "category": hit.get("category"),
+            "price": hit.get("price"),
+        }
+        for hit in hits
+    ]
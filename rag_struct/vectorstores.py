@@ -0,0 +1,688 @@
+# rag_struct/vectorstores.py
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from .chunk_ids import DOC_ID_KEY
+
+logger = logging.getLogger(__name__)
+
+# (ids, texts, metadatas) columns of MmapVectorStore, indexed by row.
+_Table = Tuple[List[str], List[str], List[Dict[str, Any]]]
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+if hasattr(np, "bitwise_count"):
+    _popcount = np.bitwise_count
+else:  # numpy < 2.0
+    _POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def _popcount(bits: np.ndarray) -> np.ndarray:
+        return _POPCOUNT_TABLE[bits]
+
+
+def _gather(base: Optional[np.ndarray], tail: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """Gather (sorted) rows across a memory-mapped base matrix and an in-memory tail."""
+    nb = 0 if base is None else base.shape[0]
+    parts = []
+    base_rows = rows[rows < nb]
+    if len(base_rows):
+        parts.append(base[base_rows])
+    tail_rows = rows[rows >= nb] - nb
+    if len(tail_rows):
+        parts.append(tail[tail_rows])
+    if not parts:
+        return np.empty((0, tail.shape[1]), dtype=np.float32)
+    return np.vstack(parts) if len(parts) > 1 else parts[0]
+
+
+def _top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Row-wise top-k of a (queries, candidates) score matrix, sorted descending.
+    Uses argpartition so cost is O(n) per query instead of a full sort.
+    """
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        empty = np.empty((scores.shape[0], 0), dtype=np.int64)
+        return empty, empty.astype(np.float32)
+    idx = np.argpartition(-scores, kth=k - 1, axis=1)[:, :k]
+    part = np.take_along_axis(scores, idx, axis=1)
+    order = np.argsort(-part, axis=1)
+    return np.take_along_axis(idx, order, axis=1), np.take_along_axis(part, order, axis=1)
+
+
+class ChromaIndexAdapter:
+    """
+    Exposes the write operations RAG.ingest needs on top of LangChain's Chroma,
+    so Chroma and MmapVectorStore are interchangeable backends.
+    """
+
+    def __init__(self, store: Any) -> None:
+        self.store = store
+
+    def ids_where_in(self, key: str, values: Sequence[Any]) -> Set[str]:
+        found = self.store.get(where={key: {"$in": list(values)}}, include=[])
+        return set(found["ids"])
+
+    def upsert(
+        self,
+        ids: List[str],
+        embeddings: List[List[float]],
+        metadatas: List[Dict[str, Any]],
+        documents: List[str],
+    ) -> None:
+        self.store._collection.upsert(
+            ids=ids, embeddings=embeddings, metadatas=metadatas, documents=documents
+        )
+
+    def delete(self, ids: List[str]) -> None:
+        self.store.delete(ids=ids)
+
+    def persist(self) -> None:
+        self.store.persist()
+
+    def chunk_ids(self) -> Set[str]:
+        return set(self.store.get(include=[])["ids"])
+
+    def iter_chunks(self, page_size: int = 1024) -> Iterator[_Table]:
+        """(ids, texts, metadatas) of every stored chunk, one page at a time."""
+        offset = 0
+        while True:
+            page = self.store.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                return
+            yield page["ids"], page["documents"], page["metadatas"]
+            offset += len(page["ids"])
+
+
+class MmapVectorStore(VectorStore):
+    """
+    In-process vector store backed by a memory-mapped NumPy matrix.
+
+    Files inside ``directory``:
+      - embeddings.npy : L2-normalized float32 matrix, opened with mmap_mode="r"
+      - table.json     : side table with ids / texts / metadatas columns
+      - ivf.npz        : optional IVF coarse quantizer (centroids + inverted lists)
+      - quantized_<kind>.npy + <kind>_params.npy : optional quantized copy of
+        embeddings.npy (fully loaded into RAM) and its int8 scales / binary centre
+
+    Loading is a memory map plus one JSON read, so startup is near-instant and
+    pages are only faulted in when searched. Writes go to an in-memory tail and
+    tombstones until ``persist()`` compacts everything into a fresh matrix.
+
+    Search is exact cosine similarity (brute-force matmul + argpartition) unless
+    ``ivf_lists`` is set and the corpus has at least ``ivf_min_rows`` rows, in
+    which case only the ``ivf_nprobe`` closest lists are scanned.
+
+    With ``quantization="int8"`` (per-dimension scalar, 4x smaller) or
+    ``"binary"`` (sign bits of the mean-centred vectors + Hamming distance,
+    32x smaller), the first pass
+    runs over the in-RAM quantized matrix and only the best
+    ``k * rescore_factor`` candidates are re-scored exactly against the float
+    rows, which stay on disk behind the memory map.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        embedding: Embeddings,
+        *,
+        ivf_lists: int = 0,
+        ivf_nprobe: int = 8,
+        ivf_min_rows: int = 50_000,
+        quantization: str = "none",
+        rescore_factor: int = 8,
+    ) -> None:
+        if quantization not in ("none", "int8", "binary"):
+            raise ValueError(f"Unknown quantization: {quantization!r}")
+        self.directory = directory
+        self.embedding = embedding
+        self.ivf_lists = ivf_lists
+        self.ivf_nprobe = ivf_nprobe
+        self.ivf_min_rows = ivf_min_rows
+        self.quantization = quantization
+        self.rescore_factor = rescore_factor
+
+        os.makedirs(directory, exist_ok=True)
+        self._matrix_path = os.path.join(directory, "embeddings.npy")
+        self._table_path = os.path.join(directory, "table.json")
+        self._ivf_path = os.path.join(directory, "ivf.npz")
+        self._quantized_path = os.path.join(directory, f"quantized_{quantization}.npy")
+        self._params_path = os.path.join(directory, f"{quantization}_params.npy")
+
+        self._lock = threading.RLock()
+        self._dim: Optional[int] = None
+        self._base: Optional[np.ndarray] = None
+        self._tail: List[np.ndarray] = []
+        self._tail_matrix: Optional[np.ndarray] = None
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metas: List[Dict[str, Any]] = []
+        self._alive = np.zeros(0, dtype=bool)
+        self._row_of: Dict[str, int] = {}
+        # Source document -> live chunk ids, so ingest diffs don't scan every row.
+        self._doc_chunks: Dict[Any, Set[str]] = {}
+        self._columns: Dict[str, np.ndarray] = {}
+        self._ivf: Optional[Dict[str, np.ndarray]] = None
+        self._quantized: Optional[np.ndarray] = None
+        # int8: per-dimension scales; binary: per-dimension centre.
+        self._params: Optional[np.ndarray] = None
+
+        self._load()
+
+    # ---------- persistence ----------
+
+    def _load(self) -> None:
+        if not os.path.exists(self._table_path):
+            return
+
+        with open(self._table_path, "r", encoding="utf-8") as f:
+            table = json.load(f)
+        self._ids = table["ids"]
+        self._texts = table["texts"]
+        self._metas = table["metadatas"]
+        self._row_of = {cid: i for i, cid in enumerate(self._ids)}
+        self._alive = np.ones(len(self._ids), dtype=bool)
+        self._index_doc_chunks()
+
+        if self._ids:
+            self._base = np.load(self._matrix_path, mmap_mode="r")
+            self._dim = int(self._base.shape[1])
+
+        if os.path.exists(self._ivf_path):
+            with np.load(self._ivf_path) as ivf:
+                self._ivf = {name: ivf[name] for name in ivf.files}
+
+        if self._base is not None and self.quantization != "none":
+            if os.path.exists(self._quantized_path):
+                self._quantized = np.load(self._quantized_path)
+                self._params = np.load(self._params_path)
+            if self._quantized is None or self._quantized.shape[0] != self._base.shape[0]:
+                self._build_quantized()
+
+    def persist(self) -> None:
+        """
+        Compact live rows into a new embeddings.npy / table.json (written to temp
+        files and swapped in atomically) and rebuild the IVF index if enabled.
+        """
+        with self._lock:
+            live = np.flatnonzero(self._alive)
+            ids = [self._ids[i] for i in live]
+            texts = [self._texts[i] for i in live]
+            metas = [self._metas[i] for i in live]
+
+            if ids:
+                tmp_matrix = self._matrix_path + ".tmp.npy"
+                out = np.lib.format.open_memmap(
+                    tmp_matrix, mode="w+", dtype=np.float32, shape=(len(ids), self._dim)
+                )
+                for start in range(0, len(live), 8192):
+                    out[start : start + 8192] = self._rows(live[start : start + 8192])
+                out.flush()
+                del out
+                os.replace(tmp_matrix, self._matrix_path)
+
+            tmp_table = self._table_path + ".tmp"
+            with open(tmp_table, "w", encoding="utf-8") as f:
+                json.dump({"ids": ids, "texts": texts, "metadatas": metas}, f)
+            os.replace(tmp_table, self._table_path)
+
+            self._base = np.load(self._matrix_path, mmap_mode="r") if ids else None
+            self._tail = []
+            self._tail_matrix = None
+            self._ids, self._texts, self._metas = ids, texts, metas
+            self._row_of = {cid: i for i, cid in enumerate(ids)}
+            self._alive = np.ones(len(ids), dtype=bool)
+            self._columns = {}
+            self._index_doc_chunks()
+
+            self._build_ivf()
+            self._build_quantized()
+
+    def _index_doc_chunks(self) -> None:
+        self._doc_chunks = {}
+        for row in np.flatnonzero(self._alive):
+            doc = self._metas[row].get(DOC_ID_KEY)
+            if doc is not None:
+                self._doc_chunks.setdefault(doc, set()).add(self._ids[row])
+
+    def _build_ivf(self, iterations: int = 10) -> None:
+        n = 0 if self._base is None else self._base.shape[0]
+        if not self.ivf_lists or n < self.ivf_min_rows:
+            self._ivf = None
+            if os.path.exists(self._ivf_path):
+                os.remove(self._ivf_path)
+            return
+
+        # Spherical k-means on a sample, then assign every row to its closest list.
+        rng = np.random.default_rng(0)
+        lists = min(self.ivf_lists, n)
+        sample = self._base[np.sort(rng.choice(n, size=min(n, lists * 64), replace=False))]
+        centroids = sample[rng.choice(sample.shape[0], size=lists, replace=False)].copy()
+        for _ in range(iterations):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(lists):
+                members = sample[assign == c]
+                if len(members):
+                    centroids[c] = members.sum(axis=0)
+            centroids = _normalize(centroids)
+
+        assign = np.empty(n, dtype=np.int32)
+        for start in range(0, n, 8192):
+            block = self._base[start : start + 8192]
+            assign[start : start + 8192] = np.argmax(block @ centroids.T, axis=1)
+
+        order = np.argsort(assign, kind="stable").astype(np.int64)
+        offsets = np.searchsorted(assign[order], np.arange(lists + 1)).astype(np.int64)
+        self._ivf = {"centroids": centroids, "order": order, "offsets": offsets}
+        np.savez(self._ivf_path, **self._ivf)
+
+    def _build_quantized(self, block: int = 8192) -> None:
+        self._quantized = None
+        self._params = None
+        # Drop codes from other settings so they can never go stale on disk.
+        for kind in ("int8", "binary"):
+            path = os.path.join(self.directory, f"quantized_{kind}.npy")
+            params = os.path.join(self.directory, f"{kind}_params.npy")
+            if kind != self.quantization:
+                for stale in (path, params):
+                    if os.path.exists(stale):
+                        os.remove(stale)
+        if self.quantization == "none" or self._base is None:
+            return
+
+        n, dim = self._base.shape
+        if self.quantization == "int8":
+            # Per-dimension symmetric scale so each column uses the full int8 range.
+            max_abs = np.zeros(dim, dtype=np.float32)
+            for start in range(0, n, block):
+                np.maximum(max_abs, np.abs(self._base[start : start + block]).max(axis=0), out=max_abs)
+            scales = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype(np.float32)
+            codes = np.empty((n, dim), dtype=np.int8)
+            for start in range(0, n, block):
+                rows = self._base[start : start + block] / scales
+                codes[start : start + block] = np.clip(np.rint(rows), -127, 127)
+            params = scales
+        else:
+            # Centre before taking signs so every bit splits the corpus roughly in half.
+            centre = np.zeros(dim, dtype=np.float64)
+            for start in range(0, n, block):
+                centre += self._base[start : start + block].sum(axis=0)
+            params = (centre / n).astype(np.float32)
+            codes = np.empty((n, (dim + 7) // 8), dtype=np.uint8)
+            for start in range(0, n, block):
+                codes[start : start + block] = np.packbits(
+                    self._base[start : start + block] > params, axis=1
+                )
+
+        np.save(self._params_path, params)
+        np.save(self._quantized_path, codes)
+        self._params = params
+        self._quantized = codes
+
+    def _approx_scores(self, query: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        """
+        First-pass scores from the quantized matrix for ``rows`` (None = all base
+        rows). Higher is better; only the ranking matters.
+        """
+        codes = self._quantized
+        n = codes.shape[0] if rows is None else len(rows)
+        out = np.empty(n, dtype=np.float32)
+        # ~4M elements per block keeps the float32 working copy around 16 MB.
+        block = max(1024, (1 << 22) // codes.shape[1])
+
+        if self.quantization == "int8":
+            scaled_query = query * self._params
+        else:
+            query_bits = np.packbits(query > self._params)
+
+        for start in range(0, n, block):
+            part = codes[start : start + block] if rows is None else codes[rows[start : start + block]]
+            if self.quantization == "int8":
+                out[start : start + block] = part.astype(np.float32) @ scaled_query
+            else:
+                # Fewer differing sign bits == more similar.
+                distance = _popcount(np.bitwise_xor(part, query_bits)).sum(axis=1, dtype=np.int32)
+                out[start : start + block] = -distance
+        return out
+
+    def _search_quantized(self, query: np.ndarray, k: int, mask: np.ndarray) -> List[Tuple[int, float]]:
+        """Quantized first pass over base rows, then exact re-scoring of the shortlist (+ tail)."""
+        nb = self._n_base()
+        if self._ivf is not None:
+            base_rows = self._ivf_rows(query)
+            base_rows = base_rows[mask[base_rows]]
+        elif mask[:nb].all():
+            base_rows = None
+        else:
+            base_rows = np.flatnonzero(mask[:nb])
+
+        approx = self._approx_scores(query, base_rows)
+        shortlist = min(len(approx), max(k, k * self.rescore_factor))
+        if shortlist:
+            best = np.argpartition(-approx, shortlist - 1)[:shortlist]
+            candidates = best if base_rows is None else base_rows[best]
+        else:
+            candidates = np.empty(0, dtype=np.int64)
+
+        tail = np.arange(nb, len(self._ids))
+        rows = np.sort(np.concatenate([candidates, tail[mask[nb:]]]).astype(np.int64))
+        if not len(rows):
+            return []
+        idx, scores = _top_k((self._rows(rows) @ query)[None, :], k)
+        return list(zip(rows[idx[0]].tolist(), scores[0].tolist()))
+
+    # ---------- matrix access ----------
+
+    def _n_base(self) -> int:
+        return 0 if self._base is None else self._base.shape[0]
+
+    def _tail_rows(self) -> np.ndarray:
+        if self._tail_matrix is None:
+            if self._tail:
+                self._tail_matrix = np.vstack(self._tail)
+            else:
+                self._tail_matrix = np.empty((0, self._dim or 0), dtype=np.float32)
+        return self._tail_matrix
+
+    def _rows(self, rows: np.ndarray) -> np.ndarray:
+        """Gather (sorted) rows across the memory-mapped base and the in-memory tail."""
+        return _gather(self._base, self._tail_rows(), rows)
+
+    # ---------- metadata filtering ----------
+
+    def _column(self, key: str) -> np.ndarray:
+        col = self._columns.get(key)
+        if col is None or len(col) != len(self._metas):
+            col = np.empty(len(self._metas), dtype=object)
+            col[:] = [m.get(key) for m in self._metas]
+            self._columns[key] = col
+        return col
+
+    def _filter_mask(self, filter: Optional[Dict[str, Any]]) -> np.ndarray:
+        """
+        Boolean row mask for a Chroma-style metadata filter:
+        {"color": "black", "category": {"$in": ["jeans", "denim"]}} (keys are ANDed).
+        """
+        mask = self._alive.copy()
+        for key, cond in (filter or {}).items():
+            col = self._column(key)
+            if isinstance(cond, dict) and "$in" in cond:
+                allowed = set(cond["$in"])
+                mask &= np.fromiter((v in allowed for v in col), dtype=bool, count=len(col))
+            elif isinstance(cond, dict) and "$eq" in cond:
+                mask &= col == cond["$eq"]
+            else:
+                mask &= col == cond
+        return mask
+
+    # ---------- writes ----------
+
+    def ids_where_in(self, key: str, values: Sequence[Any]) -> Set[str]:
+        with self._lock:
+            if key == DOC_ID_KEY:
+                found: Set[str] = set()
+                for value in values:
+                    found |= self._doc_chunks.get(value, set())
+                return found
+            rows = np.flatnonzero(self._filter_mask({key: {"$in": list(values)}}))
+            return {self._ids[i] for i in rows}
+
+    def upsert(
+        self,
+        ids: List[str],
+        embeddings: List[List[float]],
+        metadatas: List[Dict[str, Any]],
+        documents: List[str],
+    ) -> None:
+        if not ids:
+            return
+        block = _normalize(np.asarray(embeddings, dtype=np.float32))
+        with self._lock:
+            if self._dim is None:
+                self._dim = int(block.shape[1])
+            elif block.shape[1] != self._dim:
+                raise ValueError(f"Embedding dim {block.shape[1]} != index dim {self._dim}")
+
+            self.delete(ids)
+            start = len(self._ids)
+            metas = [dict(m or {}) for m in metadatas]
+            self._tail.append(block)
+            self._tail_matrix = None
+            self._ids.extend(ids)
+            self._texts.extend(documents)
+            self._metas.extend(metas)
+            self._alive = np.concatenate([self._alive, np.ones(len(ids), dtype=bool)])
+            for i, cid in enumerate(ids):
+                self._row_of[cid] = start + i
+                doc = metas[i].get(DOC_ID_KEY)
+                if doc is not None:
+                    self._doc_chunks.setdefault(doc, set()).add(cid)
+            # Extend cached filter columns instead of rebuilding them from scratch.
+            for key, col in list(self._columns.items()):
+                extra = np.empty(len(metas), dtype=object)
+                extra[:] = [m.get(key) for m in metas]
+                self._columns[key] = np.concatenate([col, extra])
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        *,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        if ids is None:
+            from uuid import uuid4
+
+            ids = [str(uuid4()) for _ in texts]
+        self.upsert(list(ids), self.embedding.embed_documents(texts), metadatas, texts)
+        return list(ids)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        with self._lock:
+            for cid in ids or []:
+                row = self._row_of.pop(cid, None)
+                if row is not None:
+                    self._alive[row] = False
+                    chunks = self._doc_chunks.get(self._metas[row].get(DOC_ID_KEY))
+                    if chunks is not None:
+                        chunks.discard(cid)
+                        if not chunks:
+                            del self._doc_chunks[self._metas[row].get(DOC_ID_KEY)]
+        return True
+
+    def chunk_ids(self) -> Set[str]:
+        with self._lock:
+            return set(self._row_of)
+
+    def iter_chunks(self, page_size: int = 1024) -> Iterator[_Table]:
+        """(ids, texts, metadatas) of every live chunk, one page at a time."""
+        with self._lock:
+            live = np.flatnonzero(self._alive)
+            table = (self._ids, self._texts, self._metas)
+        # Writes replace these lists wholesale (persist) or append to them, so
+        # the rows captured above stay valid without holding the lock.
+        ids, texts, metas = table
+        for start in range(0, len(live), page_size):
+            rows = live[start : start + page_size]
+            yield [ids[i] for i in rows], [texts[i] for i in rows], [metas[i] for i in rows]
+
+    def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
+        rows = [self._row_of[i] for i in ids if i in self._row_of]
+        return [self._document(r) for r in rows]
+
+    def __len__(self) -> int:
+        return int(self._alive.sum())
+
+    # ---------- search ----------
+
+    def _document(self, row: int, table: Optional[_Table] = None) -> Document:
+        ids, texts, metas = table or (self._ids, self._texts, self._metas)
+        return Document(id=ids[row], page_content=texts[row], metadata=metas[row])
+
+    def _ivf_rows(self, query: np.ndarray) -> np.ndarray:
+        """Base rows in the ``ivf_nprobe`` lists closest to the query (sorted)."""
+        ivf = self._ivf
+        order, offsets = ivf["order"], ivf["offsets"]
+        probes = np.argsort(-(ivf["centroids"] @ query))[: self.ivf_nprobe]
+        return np.sort(np.concatenate([order[offsets[p] : offsets[p + 1]] for p in probes]))
+
+    def _candidates(self, query: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        """Rows to score for one query: probed IVF lists + unpersisted tail, pre-filtered."""
+        rows = np.concatenate([self._ivf_rows(query), np.arange(self._n_base(), len(self._ids))])
+        return rows[mask[rows]]
+
+    def _search(
+        self,
+        vectors: np.ndarray,
+        k: int,
+        filter: Optional[Dict[str, Any]],
+    ) -> Tuple[_Table, List[List[Tuple[int, float]]]]:
+        """
+        Top-k (row, score) per query, plus the (ids, texts, metadatas) columns
+        those rows index into. The columns are only ever extended in place or
+        replaced by ``persist``, so rows stay valid for the caller.
+        """
+        queries = _normalize(np.atleast_2d(vectors))
+        with self._lock:
+            table = (self._ids, self._texts, self._metas)
+            if not self._ids:
+                return table, [[] for _ in range(len(queries))]
+
+            mask = self._filter_mask(filter)
+
+            # Approximate paths read several index structures; keep them under the lock.
+            if self._quantized is not None:
+                return table, [self._search_quantized(q, k, mask) for q in queries]
+
+            if self._ivf is not None:
+                results = []
+                for q in queries:
+                    rows = self._candidates(q, mask)
+                    idx, scores = _top_k((self._rows(rows) @ q)[None, :], k)
+                    results.append(list(zip(rows[idx[0]].tolist(), scores[0].tolist())))
+                return table, results
+
+            # Consistent snapshot for the exact scan, which runs without the lock.
+            base = self._base
+            tail = self._tail_rows()
+
+        live = int(mask.sum())
+        if not live:
+            return table, [[] for _ in range(len(queries))]
+
+        if live * 8 < len(mask):
+            # Very selective filter: scoring just the matching rows is cheaper.
+            rows = np.flatnonzero(mask)
+            idx, top = _top_k(queries @ _gather(base, tail, rows).T, k)
+            return table, [list(zip(rows[i].tolist(), s.tolist())) for i, s in zip(idx, top)]
+
+        # Score the whole matrix in place and drop dead/filtered rows from the
+        # scores, rather than fancy-indexing a copy of the memory map.
+        parts = []
+        if base is not None and base.shape[0]:
+            parts.append(queries @ base.T)
+        if len(tail):
+            parts.append(queries @ tail.T)
+        scores = np.hstack(parts) if len(parts) > 1 else parts[0]
+        if live < len(mask):
+            scores[:, ~mask] = -np.inf
+        idx, top = _top_k(scores, min(k, live))
+        return table, [list(zip(i.tolist(), s.tolist())) for i, s in zip(idx, top)]
+
+    def search_by_vectors(
+        self,
+        vectors: np.ndarray,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> List[List[Tuple[int, float]]]:
+        """
+        Batched top-k: returns, per query vector, a list of (row, cosine score).
+        """
+        return self._search(vectors, k, filter)[1]
+
+    def similarity_search_by_vector_with_score(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        table, hits = self._search(np.asarray([embedding]), k, filter)
+        return [(self._document(row, table), score) for row, score in hits[0]]
+
+    def similarity_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        return [d for d, _ in self.similarity_search_by_vector_with_score(embedding, k, filter)]
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(
+            self.embedding.embed_query(query), k=k, filter=filter
+        )
+
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        return [d for d, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
+
+    def batch_similarity_search(
+        self,
+        queries: List[str],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+    ) -> List[List[Document]]:
+        """Embed and search many queries with one matrix multiply."""
+        vectors = np.asarray([self.embedding.embed_query(q) for q in queries])
+        table, hits = self._search(vectors, k, filter)
+        return [[self._document(row, table) for row, _ in per_query] for per_query in hits]
+
+    def _select_relevance_score_fn(self):
+        # Scores are already cosine similarities in [-1, 1]; map to [0, 1].
+        return lambda score: (score + 1.0) / 2.0
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        *,
+        directory: str = "./.rag_db/mmap",
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> "MmapVectorStore":
+        store = cls(directory, embedding, **kwargs)
+        store.add_texts(texts, metadatas, ids=ids)
+        store.persist()
+        return store
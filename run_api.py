@@ -1,8 +1,100 @@
+import argparse
+import os
+
 import uvicorn
 
+import config
+
+
+def _preload() -> None:
+    """
+    Import (not construct) the heavy modules in the gunicorn master, so
+    forked workers share those pages copy-on-write. Clients, agents, caches
+    and thread pools are still built per worker in the app lifespan.
+    """
+    import agents.search_agent  # noqa: F401
+    import core.llm  # noqa: F401
+
+
+def _worker_class() -> str:
+    try:
+        import uvicorn_worker  # noqa: F401
+
+        return "uvicorn_worker.UvicornWorker"
+    except ImportError:
+        return "uvicorn.workers.UvicornWorker"
+
+
+def _run_gunicorn(host: str, port: int, workers: int) -> bool:
+    """
+    gunicorn master + uvicorn workers: preloading, worker supervision and
+    graceful shutdown on SIGTERM. Returns False if gunicorn isn't installed.
+    """
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        return False
+
+    options = {
+        "bind": f"{host}:{port}",
+        "workers": workers,
+        "worker_class": _worker_class(),
+        "preload_app": True,
+        "graceful_timeout": int(config.API_GRACEFUL_TIMEOUT),
+        "timeout": max(120, int(config.API_GRACEFUL_TIMEOUT) * 2),
+        "keepalive": 5,
+    }
+
+    class _Application(BaseApplication):
+        def load_config(self) -> None:
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            _preload()
+            from api.main import app
+
+            return app
+
+    _Application().run()
+    return True
+
+
+def run_production(host: str, port: int, workers: int) -> None:
+    """
+    Multi-worker serving: one process per core by default. Caches that must
+    be shared across workers (LLM, plan, analytics) use core.shared_cache.
+    """
+    if _run_gunicorn(host, port, workers):
+        return
+    # Without gunicorn: uvicorn's own supervisor (spawned workers, no preload).
+    uvicorn.run(
+        "api.main:app",
+        host=host,
+        port=port,
+        workers=workers,
+        timeout_graceful_shutdown=int(config.API_GRACEFUL_TIMEOUT),
+        log_level="info",
+    )
+
+
 if __name__ == "__main__":
     """
     This script starts the FastAPI application using Uvicorn.
     It's the entry point for our API service container.
+
+      python run_api.py                 # development: single process, auto-reload
+      python run_api.py --prod          # production: one worker per core
+      python run_api.py --prod --workers 4
     """
-    uvicorn.run("api.main:app", host="0.0.0.0", port=8000, reload=True)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--prod", action="store_true", help="multi-worker production mode")
+    parser.add_argument("--workers", type=int, default=config.API_WORKERS)
+    parser.add_argument("--host", default=config.API_HOST)
+    parser.add_argument("--port", type=int, default=config.API_PORT)
+    args = parser.parse_args()
+
+    if args.prod:
+        run_production(args.host, args.port, args.workers or os.cpu_count() or 1)
+    else:
+        uvicorn.run("api.main:app", host="0.0.0.0", port=8000, reload=True)
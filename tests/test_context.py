@@ -0,0 +1,36 @@
+# tests/test_context.py
+from __future__ import annotations
+
+from langchain_core.documents import Document
+
+from rag_struct.chunk_ids import DOC_ID_KEY
+from rag_struct.context import dedupe
+
+
+def _doc(text: str, source: str) -> Document:
+    return Document(page_content=text, metadata={DOC_ID_KEY: source})
+
+
+def test_dedupe_keeps_templated_sentences_of_other_products():
+    docs = [
+        _doc("Black Jeans. Color: black. Machine washable.", "p1"),
+        _doc("Denim Jacket. Color: black. Machine washable.", "p2"),
+    ]
+    assert [d.page_content for d in dedupe(docs)] == [
+        "Black Jeans. Color: black. Machine washable.",
+        "Denim Jacket. Color: black. Machine washable.",
+    ]
+
+
+def test_dedupe_drops_repeats_within_a_product():
+    docs = [
+        _doc("Denim Jacket. Color: black.", "p2"),
+        _doc("Color: black. Button front.", "p2"),
+        _doc("Denim Jacket. Color: black.", "p3"),
+        _doc("Denim Jacket. Color: black.", "p3"),
+    ]
+    assert [d.page_content for d in dedupe(docs)] == [
+        "Denim Jacket. Color: black.",
+        "Button front.",
+        "Denim Jacket. Color: black.",
+    ]
@@ -0,0 +1,35 @@
+# tests/test_embedding_cache.py
+from __future__ import annotations
+
+import numpy as np
+
+from rag_struct.embedding_cache import DiskEmbeddingStore
+
+
+def _vec(value: float) -> np.ndarray:
+    return np.full(4, value, dtype=np.float32)
+
+
+def test_orphan_row_is_truncated(tmp_path):
+    store = DiskEmbeddingStore(str(tmp_path))
+    store.put_many({"a": _vec(1.0)})
+    # Simulate a crash between the vector append and the index append.
+    with open(tmp_path / "vectors.f32", "ab") as f:
+        f.write(_vec(9.0).tobytes())
+
+    store.put_many({"b": _vec(2.0)})
+    reloaded = DiskEmbeddingStore(str(tmp_path)).get_many(["a", "b"])
+    assert reloaded["a"].tolist() == [1.0] * 4
+    assert reloaded["b"].tolist() == [2.0] * 4
+
+
+def test_two_writers_share_a_directory(tmp_path):
+    p1 = DiskEmbeddingStore(str(tmp_path))
+    p2 = DiskEmbeddingStore(str(tmp_path))
+    p1.put_many({"x": _vec(1.0)})
+    p2.put_many({"y": _vec(2.0)})
+    p1.put_many({"z": _vec(3.0)})
+
+    for store in (p1, p2, DiskEmbeddingStore(str(tmp_path))):
+        got = store.get_many(["x", "y", "z"])
+        assert {k: v[0] for k, v in got.items()} == {"x": 1.0, "y": 2.0, "z": 3.0}
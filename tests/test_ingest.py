@@ -0,0 +1,44 @@
+# tests/test_ingest.py
+from __future__ import annotations
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from rag_struct.core import RAG
+
+
+def _rag(tmp_path) -> RAG:
+    return RAG(
+        openai_api_key="test",
+        persist_directory=str(tmp_path),
+        embeddings=DeterministicFakeEmbedding(size=8),
+        embedding_model="fake8",
+        vector_backend="mmap",
+    )
+
+
+def _records(n: int):
+    return [(f"product {i} in black", {}, str(i)) for i in range(n)]
+
+
+def test_stream_ingest_rebuilds_bm25_from_the_store(tmp_path):
+    rag = _rag(tmp_path)
+    rag.ingest_stream(_records(50), batch_size=10, workers=0, checkpoint_every=2)
+    assert rag.bm25.ids() == rag.index.chunk_ids()
+    assert len(rag.bm25) == 50
+
+    stats = rag.ingest_stream([("a red hat", {}, "7")], workers=0)
+    assert (stats.written, stats.deleted) == (1, 1)
+    assert rag.bm25.ids() == rag.index.chunk_ids()
+    assert rag.bm25.search("hat", k=1)[0][0] in rag.index.chunk_ids()
+
+
+def test_unchanged_stream_skips_persist(tmp_path):
+    rag = _rag(tmp_path)
+    rag.ingest_stream(_records(20), batch_size=10, workers=0)
+
+    persisted = []
+    rag.index.persist = lambda: persisted.append(True)
+    rag.bm25.persist = lambda: persisted.append(True)
+    stats = rag.ingest_stream(_records(20), batch_size=10, workers=0)
+    assert stats.unchanged == 20
+    assert persisted == []
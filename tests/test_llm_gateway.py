@@ -0,0 +1,102 @@
+# tests/test_llm_gateway.py
+from __future__ import annotations
+
+import asyncio
+import time
+
+import pytest
+
+from core.llm import GatewayRejected, LLMGateway, Priority
+
+
+def test_interactive_not_blocked_by_held_back_background_waiter():
+    async def scenario():
+        gateway = LLMGateway(max_concurrency=4, background_limit=1)
+
+        release_background = asyncio.Event()
+
+        async def background_call():
+            async with gateway.slot("m", Priority.BACKGROUND):
+                await release_background.wait()
+
+        running = asyncio.create_task(background_call())
+        await asyncio.sleep(0)
+        # Held back by background_limit while a slot is taken.
+        queued = asyncio.create_task(background_call())
+        await asyncio.sleep(0)
+        assert gateway.stats()["in_flight"] == 1
+        assert gateway.stats()["queued"] == 1
+
+        async def interactive_call():
+            async with gateway.slot("m", Priority.INTERACTIVE):
+                return gateway.stats()["in_flight"]
+
+        in_flight = await asyncio.wait_for(interactive_call(), timeout=1.0)
+        assert in_flight == 2
+
+        release_background.set()
+        await asyncio.gather(running, queued)
+        stats = gateway.stats()
+        assert stats["in_flight"] == 0
+        assert stats["queued"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_is_removed_and_counted():
+    async def scenario():
+        gateway = LLMGateway(max_concurrency=1)
+        hold = asyncio.Event()
+
+        async def call():
+            async with gateway.slot("m"):
+                await hold.wait()
+
+        running = asyncio.create_task(call())
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(call())
+        await asyncio.sleep(0)
+        assert gateway.stats()["queued"] == 1
+
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        stats = gateway.stats()
+        assert stats["queued"] == 0
+        assert stats["cancelled"] == 1
+        assert stats["timed_out"] == 0
+
+        hold.set()
+        await running
+        assert gateway.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_wait_estimate_uses_the_calls_own_model():
+    async def scenario():
+        gateway = LLMGateway(max_concurrency=4, model_limits={"slow": 1, "fast": 2})
+        gateway._service_ema.update({"slow": 30.0, "fast": 0.5})
+        hold = asyncio.Event()
+
+        async def slow_call():
+            async with gateway.slot("slow"):
+                await hold.wait()
+
+        tasks = [asyncio.create_task(slow_call()) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert gateway.stats()["queued_by_model"] == {"slow": 2}
+
+        # The slow model's backlog must not get a fast call rejected.
+        deadline = time.monotonic() + 2.0
+        async with gateway.slot("fast", deadline=deadline):
+            assert gateway.stats()["in_flight_by_model"]["fast"] == 1
+
+        with pytest.raises(GatewayRejected):
+            async with gateway.slot("slow", deadline=deadline):
+                pass
+
+        hold.set()
+        await asyncio.gather(*tasks)
+        assert gateway.stats()["queued_by_model"] == {}
+
+    asyncio.run(scenario())
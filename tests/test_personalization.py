@@ -0,0 +1,23 @@
+# tests/test_personalization.py
+from __future__ import annotations
+
+from core.personalization import AffinityStore
+
+
+def _record(store: AffinityStore, ts: float) -> None:
+    store.record_event("u", "view", category="jeans", product_id="p", ts=ts)
+
+
+def test_late_event_matches_in_order_result():
+    in_order = AffinityStore(half_life_seconds=100.0)
+    _record(in_order, 900.0)
+    _record(in_order, 1000.0)
+
+    late = AffinityStore(half_life_seconds=100.0)
+    _record(late, 1000.0)
+    _record(late, 900.0)
+
+    vector, last = late._users["u"]
+    assert last == 1000.0
+    assert vector.tolist() == in_order._users["u"][0].tolist()
+    assert late._items["p"] == in_order._items["p"]
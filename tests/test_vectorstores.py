@@ -0,0 +1,42 @@
+# tests/test_vectorstores.py
+from __future__ import annotations
+
+import numpy as np
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from rag_struct.chunk_ids import DOC_ID_KEY
+from rag_struct.vectorstores import MmapVectorStore
+
+
+def _store(tmp_path, n: int = 60, dim: int = 8):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(n, dim)).astype(np.float32)
+    store = MmapVectorStore(str(tmp_path), DeterministicFakeEmbedding(size=dim))
+    store.upsert(
+        [f"c{i}" for i in range(n)],
+        vectors.tolist(),
+        [{DOC_ID_KEY: f"d{i // 3}"} for i in range(n)],
+        [f"text {i}" for i in range(n)],
+    )
+    return store, vectors
+
+
+def test_ids_where_in_tracks_upserts_deletes_and_persist(tmp_path):
+    store, _ = _store(tmp_path)
+    assert store.ids_where_in(DOC_ID_KEY, ["d0", "d1"]) == {"c0", "c1", "c2", "c3", "c4", "c5"}
+    store.delete(["c1"])
+    store.persist()
+    assert store.ids_where_in(DOC_ID_KEY, ["d0"]) == {"c0", "c2"}
+    reloaded = MmapVectorStore(str(tmp_path), store.embedding)
+    assert reloaded.ids_where_in(DOC_ID_KEY, ["d0"]) == {"c0", "c2"}
+
+
+def test_search_skips_tombstoned_rows(tmp_path):
+    store, vectors = _store(tmp_path)
+    store.persist()
+    store.delete(["c7"])
+    hits = store.search_by_vectors(vectors[7], k=3)[0]
+    assert 7 not in [row for row, _ in hits]
+    assert len(hits) == 3
+    docs = store.similarity_search_by_vector(vectors[8].tolist(), k=1)
+    assert docs[0].id == "c8"
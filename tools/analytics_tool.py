@@ -1,12 +1,21 @@
 # tools/analytics_tool.py
 from __future__ import annotations
 
+import asyncio
+import json
 import logging
-from typing import Any, Dict, List
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
 
 import httpx
 
+import config
+from core import deadline
+from core.metrics import DOWNSTREAM_REQUESTS, DOWNSTREAM_SECONDS
 from core.planning import StructuredQuery
+from core.shared_cache import SharedCache, hash_key
+from core.tracing import propagation_headers, tracer
 from tools.http_client import get_http_client
 
 logger = logging.getLogger(__name__)
@@ -16,6 +25,16 @@ class AnalyticsServiceError(RuntimeError):
     """Raised when the analytics (Next.js) service is unavailable or returns an error."""
 
 
+@lru_cache()
+def _analytics_cache() -> Optional[SharedCache]:
+    """
+    Cross-worker cache of analytics responses (ANALYTICS_CACHE_TTL_SECONDS > 0).
+    """
+    if config.ANALYTICS_CACHE_TTL_SECONDS <= 0:
+        return None
+    return SharedCache("analytics", ttl_seconds=config.ANALYTICS_CACHE_TTL_SECONDS)
+
+
 async def run_analytics_query(
     structured_query: StructuredQuery,
     user_context: Dict[str, Any],
@@ -26,6 +45,10 @@ async def run_analytics_query(
     This is the TEXT-TO-API boundary:
       - Python never builds SQL.
       - It only sends structured JSON describing the query.
+
+    The HTTP timeout is the request's remaining budget (core.deadline),
+    which is also forwarded to Next.js; running out raises DeadlineExceeded
+    rather than AnalyticsServiceError.
     """
 
     payload = {
@@ -33,22 +56,59 @@ async def run_analytics_query(
         "user_context": user_context,
     }
 
-    try:
-        async with get_http_client() as client:
-            resp = await client.post("/api/internal/analytics/query", json=payload)
-            resp.raise_for_status()
-    except httpx.RequestError as exc:
-        logger.exception("Error calling analytics service: %s", exc)
-        raise AnalyticsServiceError("Analytics service unavailable") from exc
-    except httpx.HTTPStatusError as exc:
-        logger.exception(
-            "Analytics service returned HTTP %s: %s", exc.response.status_code, exc
-        )
-        raise AnalyticsServiceError(
-            f"Analytics service error (status {exc.response.status_code})"
-        ) from exc
-
-    data = resp.json()
+    cache = _analytics_cache()
+    if cache is not None:
+        key = hash_key(payload)
+        cached = await asyncio.to_thread(cache.get, key)
+        if cached is not None:
+            return json.loads(cached)
+
+    deadline.check("analytics query")
+    timeout = deadline.timeout_for(config.HTTP_TIMEOUT_SECONDS)
+    t0 = time.perf_counter()
+    with tracer.span(
+        "http POST /api/internal/analytics/query", entity=structured_query.entity
+    ) as span:
+        try:
+            async with get_http_client() as client:
+                resp = await client.post(
+                    "/api/internal/analytics/query",
+                    json=payload,
+                    headers={**propagation_headers(), **deadline.propagation_headers()},
+                    timeout=timeout,
+                )
+                DOWNSTREAM_REQUESTS.inc(service="analytics", status=str(resp.status_code))
+                if span is not None:
+                    span.set(status_code=resp.status_code)
+                resp.raise_for_status()
+        except httpx.TimeoutException as exc:
+            DOWNSTREAM_REQUESTS.inc(service="analytics", status="timeout")
+            if timeout < config.HTTP_TIMEOUT_SECONDS:
+                # Cut short by the request budget, not a slow service.
+                raise deadline.DeadlineExceeded("Deadline exceeded during analytics query") from exc
+            logger.exception("Analytics service timed out: %s", exc)
+            raise AnalyticsServiceError("Analytics service timed out") from exc
+        except httpx.RequestError as exc:
+            DOWNSTREAM_REQUESTS.inc(service="analytics", status="error")
+            logger.exception("Error calling analytics service: %s", exc)
+            raise AnalyticsServiceError("Analytics service unavailable") from exc
+        except httpx.HTTPStatusError as exc:
+            logger.exception(
+                "Analytics service returned HTTP %s: %s", exc.response.status_code, exc
+            )
+            raise AnalyticsServiceError(
+                f"Analytics service error (status {exc.response.status_code})"
+            ) from exc
+        finally:
+            DOWNSTREAM_SECONDS.observe(time.perf_counter() - t0, service="analytics")
+
+    events = _extract_events(resp.json())
+    if cache is not None:
+        await asyncio.to_thread(cache.set, key, json.dumps(events, default=str))
+    return events
+
+
+def _extract_events(data: Any) -> List[Dict[str, Any]]:
     # Convention: for user_event queries, Next.js returns { "events": [...] }
     if isinstance(data, dict) and "events" in data:
         return data["events"]
@@ -2,12 +2,45 @@
 from __future__ import annotations
 
 from contextlib import asynccontextmanager
-from typing import AsyncIterator
+from typing import AsyncIterator, Optional
 
 import httpx
 
 import config
 
+# Process-wide pooled client, opened at service startup (see open_http_client).
+_shared_client: Optional[httpx.AsyncClient] = None
+
+
+def _build_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=config.NEXTJS_BASE_URL,
+        timeout=config.HTTP_TIMEOUT_SECONDS,
+        limits=httpx.Limits(
+            max_connections=config.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=config.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        ),
+    )
+
+
+async def open_http_client() -> httpx.AsyncClient:
+    """
+    Open the shared pooled client. Called once from the API lifespan so
+    requests reuse warm keep-alive connections instead of a new client
+    (and TCP/TLS handshake) per call.
+    """
+    global _shared_client
+    if _shared_client is None or _shared_client.is_closed:
+        _shared_client = _build_client()
+    return _shared_client
+
+
+async def close_http_client() -> None:
+    global _shared_client
+    if _shared_client is not None:
+        await _shared_client.aclose()
+        _shared_client = None
+
 
 @asynccontextmanager
 async def get_http_client() -> AsyncIterator[httpx.AsyncClient]:
@@ -17,9 +50,12 @@ async def get_http_client() -> AsyncIterator[httpx.AsyncClient]:
     Uses:
       - base_url from config.NEXTJS_BASE_URL
       - timeout from config.HTTP_TIMEOUT_SECONDS
+
+    Yields the pooled client when the service opened one; otherwise (scripts,
+    consumers) a short-lived client for this call.
     """
-    async with httpx.AsyncClient(
-        base_url=config.NEXTJS_BASE_URL,
-        timeout=config.HTTP_TIMEOUT_SECONDS,
-    ) as client:
+    if _shared_client is not None and not _shared_client.is_closed:
+        yield _shared_client
+        return
+    async with _build_client() as client:
         yield client